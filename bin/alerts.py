@@ -0,0 +1,229 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy", "scikit-learn"]
+# ///
+"""
+New Match Alerts
+
+取り込みで追加・変更された候補者だけを、すべての求人に対して適合度で採点し、
+適合度の高い組み合わせ（新着マッチ）をダイジェストにまとめる。
+計算量は変更された候補者数 × 求人数で、候補者全体の件数にはよらない
+（求人ベクトルと関連度の順位の基準は、取り込みで jobs_for.py が差分更新したものを使う）。
+
+- 前回の通知時点の候補者ハッシュ（workspace/index/alerts/candidate_hashes.json）と比較して差分を取る
+- 同じ企業で選考中の候補者と、ALERT_REPEAT_DAYS 日以内に通知済みの組み合わせは除く
+- ダイジェストは workspace/index/alerts/digest.md に書き、bot.py がデータ取り込みの後に
+  SLACK_CH へ投稿して消す
+
+Usage:
+    uv run bin/alerts.py run
+    uv run bin/alerts.py show
+"""
+
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import fit
+import graph_index
+import jobs_for
+import shortlists
+from incremental import diff, load_snapshot
+from records import INDEX_DIR, pick_field
+
+ALERTS_DIR = INDEX_DIR / "alerts"
+HASHES_FILE = "candidate_hashes.json"
+ALERTED_FILE = "alerted.json"
+DIGEST_FILE = "digest.md"
+
+# 通知する適合度の下限・求人ごとの件数・ダイジェスト全体の件数
+ALERT_MIN_FIT = float(os.environ.get("ALERT_MIN_FIT", "0.75"))
+ALERT_PER_JOB = int(os.environ.get("ALERT_PER_JOB", "3"))
+ALERT_MAX_PAIRS = int(os.environ.get("ALERT_MAX_PAIRS", "30"))
+
+# 同じ組み合わせを再び通知しない期間（日数）
+ALERT_REPEAT_DAYS = 30
+
+# ダイジェストに載せる内訳（表示名）
+PART_LABELS = {
+    "skill": "スキル",
+    "salary": "年収",
+    "location": "勤務地",
+    "remote": "働き方",
+}
+
+
+def _read_json(path: Path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def _excluded(jobs: dict) -> dict:
+    """求人ID → 同じ企業で選考中の候補者ID"""
+    if not graph_index.exists():
+        return {}
+    graph = graph_index.load()
+    excluded = {}
+    for jid in jobs:
+        company = graph_index.job_company(graph, jid)
+        if company:
+            excluded[jid] = set(graph_index.in_process_candidates(graph, company))
+    return excluded
+
+
+def find_matches(table: dict, jobs: dict, candidate_ids, alerted=None) -> list:
+    """候補者 × 全求人の新着マッチ [{"job_id", "id", "row", "total", "fit", "parts"}, ...]（良い順）
+
+    alerted: 求人ID → 通知済みの候補者ID
+    """
+    alerted = alerted or {}
+    rows = np.flatnonzero(np.isin(table["ids"], list(candidate_ids)))
+    if len(rows) == 0:
+        return []
+    ids = np.asarray(table["ids"])[rows].astype(str)
+    excluded = _excluded(jobs)
+    # 求人ベクトルと関連度の順位の基準は jobs_for.refresh() で差分更新済みのものを使う
+    score = shortlists.scorer(table, jobs, rows, jobs_for.load())
+
+    matches = []
+    for block in shortlists._blocks(list(jobs)):
+        total, breakdown = score(block, rows)
+        fit_total = sum(fit.FIT_WEIGHTS[n] * breakdown[n] for n in fit.FIT_WEIGHTS)
+        for j, jid in enumerate(block):
+            skip = excluded.get(jid, set()) | alerted.get(jid, set())
+            keep = np.flatnonzero(
+                (fit_total[j] >= ALERT_MIN_FIT) & ~np.isin(ids, list(skip))
+            )
+            parts = {n: v[j][keep] for n, v in breakdown.items()}
+            for entry in shortlists._ranked(
+                table, rows[keep], total[j][keep], parts, ALERT_PER_JOB
+            ):
+                matches.append(
+                    {"job_id": jid, **entry, "fit": fit.weighted(entry["parts"])}
+                )
+    matches.sort(key=lambda m: -m["total"])
+    return matches[:ALERT_MAX_PAIRS]
+
+
+def digest_text(matches: list, jobs: dict, table: dict, n_changed: int) -> str:
+    """Slack に投稿するダイジェスト（求人ごとにまとめる）"""
+    by_job = {}
+    for match in matches:
+        by_job.setdefault(match["job_id"], []).append(match)
+    records = dict(
+        zip(
+            [m["row"] for m in matches],
+            columnar.records_at(table, [m["row"] for m in matches]),
+        )
+    )
+
+    lines = [
+        f"🆕 *新着マッチ* {date.today().isoformat()}"
+        f"（追加・変更された候補者 {n_changed}名 × 求人 {len(jobs)}件 → {len(matches)}組）",
+        "",
+    ]
+    for jid, job_matches in by_job.items():
+        job = jobs[jid]
+        title = pick_field(job, ("求人名", "タイトル")) or ""
+        company = pick_field(job, ("企業名", "取引先名")) or ""
+        lines.append(f"*{jid}* {title}（{company}）")
+        for match in job_matches:
+            record = records[match["row"]]
+            name = pick_field(record, ("氏名", "名前")) or match["id"]
+            role = pick_field(record, ("希望職種",)) or ""
+            detail = " / ".join(
+                f"{label} {match['parts'][key]:.1f}"
+                for key, label in PART_LABELS.items()
+            )
+            lines.append(
+                f"• `{match['id']}` {name}（{role}）適合度 {match['fit']:.2f}（{detail}）"
+            )
+        lines.append("")
+    lines.append("詳しいマッチング: `@bot candidate <求人ID>`")
+    return "\n".join(lines) + "\n"
+
+
+def run(alerts_dir: Path = ALERTS_DIR) -> int:
+    """前回からの差分で新着マッチを探してダイジェストを書く（Returns: 組み合わせの数）"""
+    if not columnar.exists("candidates"):
+        print("  ⚠️ 新着マッチ: 列ファイルがないためスキップ")
+        return 0
+    hashes = load_snapshot().get("candidates", {}).get("hashes", {})
+    old_hashes = _read_json(alerts_dir / HASHES_FILE)
+    if old_hashes is None:
+        _write_json(alerts_dir / HASHES_FILE, hashes)
+        print("  ✨ 新着マッチ: 初回のため基準のみ保存（次回の取り込みから通知）")
+        return 0
+    upserts, _ = diff(old_hashes, hashes)
+    if not upserts:
+        _write_json(alerts_dir / HASHES_FILE, hashes)
+        print("  ✨ 新着マッチ: 追加・変更された候補者なし")
+        return 0
+
+    # 通知済みの組み合わせ（期限切れは忘れる）
+    since = (date.today() - timedelta(days=ALERT_REPEAT_DAYS)).isoformat()
+    alerted = {
+        key: day
+        for key, day in (_read_json(alerts_dir / ALERTED_FILE) or {}).items()
+        if day >= since
+    }
+
+    table = columnar.attach("candidates")
+    jobs = shortlists.active_jobs()
+    by_job = {}
+    for key in alerted:
+        jid, cid = key.split("|", 1)
+        by_job.setdefault(jid, set()).add(cid)
+    matches = find_matches(table, jobs, upserts, by_job)
+    if matches:
+        text = digest_text(matches, jobs, table, len(upserts))
+        (alerts_dir / DIGEST_FILE).write_text(text, encoding="utf-8")
+        today = date.today().isoformat()
+        for match in matches:
+            alerted[f"{match['job_id']}|{match['id']}"] = today
+
+    _write_json(alerts_dir / ALERTED_FILE, alerted)
+    _write_json(alerts_dir / HASHES_FILE, hashes)
+    n_jobs = len({m["job_id"] for m in matches})
+    print(
+        f"  🆕 新着マッチ: 追加・変更 {len(upserts)}名 × 求人 {len(jobs)}件 → "
+        f"{len(matches)}組（{n_jobs}求人）"
+    )
+    return len(matches)
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="新着マッチの通知")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="前回からの差分で新着マッチを探す")
+    sub.add_parser("show", help="未投稿のダイジェストを表示")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print("🆕 新着マッチを検索中...")
+        run()
+        return
+
+    path = ALERTS_DIR / DIGEST_FILE
+    if not path.exists():
+        print("未投稿のダイジェストはありません")
+        return
+    print(path.read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ Slackボット: レコメンド機能（メンション型）
      @ボット名 company U-12345
 """
 
+import csv
 import os
 import sys
 import subprocess
@@ -27,6 +28,9 @@ from dotenv import load_dotenv
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 
+import preflight
+import render
+
 # ジョブキュー（1件ずつ順番に処理）
 job_queue = queue.Queue()
 is_processing = False
@@ -49,6 +53,11 @@ bot_start_time = datetime.now()
 # スレッド管理
 SESSIONS_FILE = Path(__file__).parent.parent / "workspace" / "sessions.json"
 
+# 新着マッチのダイジェスト（download.py の alerts.py が書く）
+ALERTS_DIGEST = (
+    Path(__file__).parent.parent / "workspace" / "index" / "alerts" / "digest.md"
+)
+
 
 def load_sessions():
     if SESSIONS_FILE.exists():
@@ -134,71 +143,56 @@ def handle_choice_selection(choice_id, thread_ts, channel_id, user_id, client, s
 
         print(f"✅ 選択肢: {selected}")
 
+        # 選択内容を記録（スクリプト側で絞り込みを適用する）
+        choices_data["selected"] = choice_id
+        with open(choices_file, "w") as f:
+            json.dump(choices_data, f, ensure_ascii=False, indent=2)
+
+        query = choices_data.get("query", "")
+
         # 選択肢のタイプに応じて処理
         if selected["type"] == "filter":
             # フィルタリング継続
-            pattern = selected.get("pattern", "")
-            query = choices_data.get("query", "")
-
-            print(f"🔍 フィルタリング: {pattern}")
-
-            # スレッドで返信として処理開始
-            client.chat_postMessage(
-                channel=channel_id,
-                thread_ts=thread_ts,
-                text=f"🔍 `{selected['text']}` で絞り込みます...\n\n⏰ 開始時刻: {datetime.now().strftime('%H:%M:%S')}",
-            )
-
-            # キューに追加して処理開始
-            if choices_file.parent.name.startswith("job"):
-                # job検索
-                job_queue.put(
-                    {
-                        "func": process_job_search,
-                        "args": (
-                            f"{query} ({selected['text']})",
-                            user_id,
-                            say,
-                            client,
-                            channel_id,
-                            thread_ts,
-                        ),
-                        "kwargs": {},
-                    }
-                )
-            else:
-                # company検索
-                job_queue.put(
-                    {
-                        "func": process_company_search,
-                        "args": (
-                            f"{query} ({selected['text']})",
-                            user_id,
-                            say,
-                            client,
-                            channel_id,
-                            thread_ts,
-                        ),
-                        "kwargs": {},
-                    }
-                )
-
+            print(f"🔍 フィルタリング: {selected.get('pattern', '')}")
+            message = f"🔍 `{selected['text']}` で絞り込みます..."
         elif selected["type"] == "show":
             # そのままレポート作成
-            count = selected.get("count", 10)
-            query = choices_data.get("query", "")
+            print(f"📊 レポート作成: {selected.get('count', 10)}件")
+            message = f"📊 上位{selected.get('count', 10)}件を表示します..."
+        else:
+            print(f"❌ 不明な選択肢タイプ: {selected['type']}")
+            return
 
-            print(f"📊 レポート作成: {count}件")
+        # スレッドで返信として処理開始
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=f"{message}\n\n⏰ 開始時刻: {datetime.now().strftime('%H:%M:%S')}",
+        )
 
-            client.chat_postMessage(
-                channel=channel_id,
-                thread_ts=thread_ts,
-                text=f"📊 上位{count}件を表示します...\n\n⏰ 開始時刻: {datetime.now().strftime('%H:%M:%S')}",
-            )
+        # キューに追加して処理開始（choices.json の kind で検索種別を判定）
+        kind = choices_data.get("kind")
+        if kind == "jobs" or (
+            kind is None and choices_file.parent.name.startswith("job")
+        ):
+            search_func = process_job_search
+        else:
+            search_func = process_company_search
 
-            # ここはもうスクリプトが実行済みなので、単に結果ファイルを確認して表示
-            # 実際の処理はスクリプト側で行われているはず
-            pass
+        job_queue.put(
+            {
+                "func": search_func,
+                "args": (
+                    f"{query} ({selected['text']})",
+                    user_id,
+                    say,
+                    client,
+                    channel_id,
+                    thread_ts,
+                ),
+                "kwargs": {},
+            }
+        )
 
     except Exception as e:
         print(f"❌ 選択肢処理でエラー: {e}")
@@ -213,7 +207,16 @@ def handle_choice_selection(choice_id, thread_ts, channel_id, user_id, client, s
 
 
 def process_job_search(
-    search_query, user_id, say, client, channel_id, thread_ts, count=10, pattern=None
+    search_query,
+    user_id,
+    say,
+    client,
+    channel_id,
+    thread_ts,
+    count=10,
+    pattern=None,
+    fresh=False,
+    narrate=False,
 ):
     """求人検索処理（キーワード型）"""
     start_time = time.time()
@@ -268,6 +271,10 @@ def process_job_search(
         cmd = ["uv", "run", str(job_script), search_query, str(count)]
         if is_continuation and session_ulid:
             cmd.extend(["--continue", session_ulid])
+        if fresh:
+            cmd.append("--fresh")
+        if narrate:
+            cmd.append("--narrate")
         print(f"🚀 実行コマンド: {' '.join(cmd)}")
 
         # 検索実行（標準出力・標準エラーをログファイルに保存）
@@ -350,8 +357,8 @@ def process_job_search(
                     summary_text = f.read()
 
                 # CSV行数をカウント（ヘッダー除く）
-                with open(latest_csv, "r", encoding="utf-8") as f:
-                    job_count = sum(1 for line in f) - 1
+                with open(latest_csv, "r", encoding="utf-8-sig", newline="") as f:
+                    job_count = max(sum(1 for _ in csv.reader(f)) - 1, 0)
 
                 canvas_title = f"【求人検索】{search_query} - 結果"
 
@@ -378,6 +385,15 @@ def process_job_search(
 
                 print(f"📊 Canvas URL: {canvas_url}")
 
+                # AIを使わずに作ったレポートなら、説明文つきでの再実行を案内
+                narrate_hint = ""
+                if render.is_keyword_result(latest_summary.parent):
+                    bot_mention = f"@{BOT_NAME}" if BOT_NAME else "@bot"
+                    narrate_hint = (
+                        f"\n\n⚡ 件数が少ないため、AIを使わずにデータから作成しました\n"
+                        f"🤖 AIの説明文つきにするには `{bot_mention} job {search_query} narrate`"
+                    )
+
                 # メッセージ更新（完了）
                 client.chat_update(
                     channel=channel_id,
@@ -390,6 +406,7 @@ def process_job_search(
                         f"⏰ 完了時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
                         f"📄 詳細はCanvasとCSVをご確認ください\n"
                         f"{canvas_url}"
+                        f"{narrate_hint}"
                     ),
                 )
 
@@ -524,7 +541,15 @@ def process_job_search(
 
 
 def process_company_search(
-    search_query, user_id, say, client, channel_id, thread_ts, count=10
+    search_query,
+    user_id,
+    say,
+    client,
+    channel_id,
+    thread_ts,
+    count=10,
+    fresh=False,
+    narrate=False,
 ):
     """企業探索処理（検索クエリ型）"""
     start_time = time.time()
@@ -579,6 +604,10 @@ def process_company_search(
         cmd = ["uv", "run", str(company_script), search_query, str(count)]
         if is_continuation and session_ulid:
             cmd.extend(["--continue", session_ulid])
+        if fresh:
+            cmd.append("--fresh")
+        if narrate:
+            cmd.append("--narrate")
         print(f"🚀 実行コマンド: {' '.join(cmd)}")
 
         # 企業探索実行（標準出力・標準エラーをログファイルに保存）
@@ -661,8 +690,8 @@ def process_company_search(
                     summary_text = f.read()
 
                 # CSV行数をカウント（ヘッダー除く）
-                with open(latest_csv, "r", encoding="utf-8") as f:
-                    company_count = sum(1 for line in f) - 1
+                with open(latest_csv, "r", encoding="utf-8-sig", newline="") as f:
+                    company_count = max(sum(1 for _ in csv.reader(f)) - 1, 0)
 
                 canvas_title = f"【企業探索】{search_query} - 結果"
 
@@ -689,6 +718,15 @@ def process_company_search(
 
                 print(f"📊 Canvas URL: {canvas_url}")
 
+                # AIを使わずに作ったレポートなら、説明文つきでの再実行を案内
+                narrate_hint = ""
+                if render.is_keyword_result(latest_summary.parent):
+                    bot_mention = f"@{BOT_NAME}" if BOT_NAME else "@bot"
+                    narrate_hint = (
+                        f"\n\n⚡ 件数が少ないため、AIを使わずにデータから作成しました\n"
+                        f"🤖 AIの説明文つきにするには `{bot_mention} company {search_query} narrate`"
+                    )
+
                 # メッセージ更新（完了）
                 client.chat_update(
                     channel=channel_id,
@@ -701,6 +739,7 @@ def process_company_search(
                         f"⏰ 完了時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
                         f"📄 詳細はCanvasとCSVをご確認ください\n"
                         f"{canvas_url}"
+                        f"{narrate_hint}"
                     ),
                 )
 
@@ -834,7 +873,9 @@ def process_company_search(
         print(f"{'=' * 60}\n")
 
 
-def process_candidate_matching(job_id, user_id, say, client, channel_id, thread_ts):
+def process_candidate_matching(
+    job_id, user_id, say, client, channel_id, thread_ts, fresh=False
+):
     """候補者マッチング処理（求人IDから候補者を探す）"""
     start_time = time.time()
     print(f"\n{'=' * 60}")
@@ -877,10 +918,14 @@ def process_candidate_matching(job_id, user_id, say, client, channel_id, thread_
         print(f"OpenCode 実行ログ:")
         print(f"{'=' * 60}\n")
 
+        cmd = ["uv", "run", str(candidate_script), job_id]
+        if fresh:
+            cmd.append("--fresh")
+
         # マッチング実行（標準出力・標準エラーをログファイルに保存）
         with open(log_file, "w", encoding="utf-8") as f:
             result = subprocess.run(
-                ["uv", "run", str(candidate_script), job_id],
+                cmd,
                 cwd=str(project_dir),
                 stdout=f,
                 stderr=subprocess.STDOUT,
@@ -959,8 +1004,8 @@ def process_candidate_matching(job_id, user_id, say, client, channel_id, thread_
                     job_title = "求人"
 
                 # CSV行数をカウント（ヘッダー除く）
-                with open(latest_csv, "r", encoding="utf-8") as f:
-                    candidate_count = sum(1 for line in f) - 1
+                with open(latest_csv, "r", encoding="utf-8-sig", newline="") as f:
+                    candidate_count = max(sum(1 for _ in csv.reader(f)) - 1, 0)
 
                 canvas_title = f"【{job_id}】{job_title} - マッチング結果"
 
@@ -1099,6 +1144,295 @@ def process_candidate_matching(job_id, user_id, say, client, channel_id, thread_
         print(f"{'=' * 60}\n")
 
 
+def process_candidate_batch(
+    job_ids, user_id, say, client, channel_id, thread_ts, fresh=False
+):
+    """候補者マッチングのバッチ処理（複数の求人IDをまとめて実行し、求人ごとのCSVを投稿）"""
+    start_time = time.time()
+    print(f"\n{'=' * 60}")
+    print(f"👥 候補者マッチング（バッチ）処理開始")
+    print(f"{'=' * 60}")
+    print(f"   求人ID: {', '.join(job_ids)}")
+    print(f"   依頼者: {user_id}")
+    print(f"   スレッド: {thread_ts}")
+    print(f"   開始時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # 処理開始メッセージ（スレッド内に投稿）
+    status_msg = client.chat_postMessage(
+        channel=channel_id,
+        thread_ts=thread_ts,
+        text=(
+            f"👥 候補者マッチング（{len(job_ids)}求人）を開始しました\n\n"
+            f"求人ID: {' '.join(f'`{job_id}`' for job_id in job_ids)}\n"
+            f"⏰ 開始時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
+            f"処理には数分かかります。このスレッドで結果をお知らせしますね"
+        ),
+    )
+
+    status_ts = status_msg["ts"]
+
+    try:
+        project_dir = Path(__file__).parent.parent.resolve()
+        candidate_script = project_dir / "bin" / "candidate.py"
+
+        # ログファイルの準備
+        import ulid
+
+        logs_dir = project_dir / "workspace" / "logs"
+        logs_dir.mkdir(exist_ok=True)
+        log_file = logs_dir / f"candidate_batch_{ulid.new()}.log"
+
+        print(f"📝 スクリプト実行中: {candidate_script}")
+        print(f"📄 ログファイル: {log_file}")
+
+        cmd = ["uv", "run", str(candidate_script), *job_ids]
+        if fresh:
+            cmd.append("--fresh")
+
+        with open(log_file, "w", encoding="utf-8") as f:
+            result = subprocess.run(
+                cmd,
+                cwd=str(project_dir),
+                stdout=f,
+                stderr=subprocess.STDOUT,
+            )
+
+        elapsed_time = time.time() - start_time
+        elapsed_str = f"{int(elapsed_time // 60)}分{int(elapsed_time % 60)}秒"
+        print(f"⏱️  処理時間: {elapsed_str}")
+
+        # 最新のバッチ（batch.json のある ULID directory）を探す
+        results_dir = project_dir / "workspace" / "output"
+        batch_dirs = sorted(
+            [d for d in results_dir.iterdir() if (d / "batch.json").exists()],
+            reverse=True,
+        )
+        if result.returncode != 0 or not batch_dirs:
+            print(f"❌ エラー発生（終了コード: {result.returncode}）")
+            client.chat_update(
+                channel=channel_id,
+                ts=status_ts,
+                text=(
+                    f"❌ 候補者マッチング（{len(job_ids)}求人）でエラーが発生しました\n\n"
+                    f"⏱️ 処理時間: {elapsed_str}\n\n"
+                    f"申し訳ございません。求人IDをご確認の上、もう一度お試しください"
+                ),
+            )
+            return
+
+        import json
+
+        with open(batch_dirs[0] / "batch.json", "r", encoding="utf-8") as f:
+            batch = json.load(f)
+
+        lines = []
+        for item in batch["jobs"]:
+            mark = "✅" if item["count"] >= 0 else "⚠️"
+            count = f"{item['count']}名" if item["count"] >= 0 else "結果なし"
+            lines.append(f"{mark} `{item['job_id']}` {item['title']}: *{count}*")
+        found = {item["job_id"] for item in batch["jobs"]}
+        for job_id in batch["job_ids"]:
+            if job_id not in found:
+                lines.append(f"❌ `{job_id}`: 求人が見つかりません")
+
+        client.chat_update(
+            channel=channel_id,
+            ts=status_ts,
+            text=(
+                f"✅ 候補者マッチング（{len(job_ids)}求人）が完了しました\n\n"
+                + "\n".join(lines)
+                + f"\n\n⏱️ 処理時間: {elapsed_str}\n"
+                f"⏰ 完了時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
+                f"📊 求人ごとのCSVをこのスレッドに投稿します"
+            ),
+        )
+
+        # 求人ごとのCSVをアップロード（スレッド内）
+        for item in batch["jobs"]:
+            csv_file = results_dir / item["session"] / "matching.csv"
+            if not csv_file.exists():
+                continue
+            print(f"📤 CSVファイルアップロード中: {item['job_id']}")
+            client.files_upload_v2(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                file=str(csv_file),
+                title=f"【{item['job_id']}】{item['title']} ({item['count']}名)",
+                initial_comment=f"📊 `{item['job_id']}` {item['title']}: 全{item['count']}名（CSV形式）",
+            )
+
+        print(f"✅ Slack投稿完了")
+
+    except Exception as e:
+        print(f"❌ 予期しないエラー: {e}")
+        import traceback
+
+        traceback.print_exc()
+
+        client.chat_update(
+            channel=channel_id,
+            ts=status_ts,
+            text=(
+                f"❌ 予期しないエラーが発生しました\n\n"
+                f"申し訳ございません。もう一度お試しいただくか、\n"
+                f"管理者にお問い合わせください"
+            ),
+        )
+    finally:
+        print(f"{'=' * 60}\n")
+
+
+def process_jobs_for(
+    candidate_id, user_id, say, client, channel_id, thread_ts, fresh=False
+):
+    """候補者に合う求人を探す処理（計算済みの特徴量で絞ってから上位だけをAIが説明）"""
+    start_time = time.time()
+    print(f"\n{'=' * 60}")
+    print(f"🔁 候補者→求人マッチング処理開始")
+    print(f"{'=' * 60}")
+    print(f"   候補者ID: {candidate_id}")
+    print(f"   依頼者: {user_id}")
+    print(f"   スレッド: {thread_ts}")
+    print(f"   開始時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # 処理開始メッセージ（スレッド内に投稿）
+    status_msg = client.chat_postMessage(
+        channel=channel_id,
+        thread_ts=thread_ts,
+        text=(
+            f"🔁 候補者に合う求人を探しています\n\n"
+            f"候補者ID: `{candidate_id}`\n"
+            f"⏰ 開始時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
+            f"このスレッドで結果をお知らせしますね"
+        ),
+    )
+
+    status_ts = status_msg["ts"]
+
+    try:
+        project_dir = Path(__file__).parent.parent.resolve()
+        jobs_for_script = project_dir / "bin" / "jobs_for.py"
+
+        # ログファイルの準備
+        import ulid
+
+        logs_dir = project_dir / "workspace" / "logs"
+        logs_dir.mkdir(exist_ok=True)
+        log_file = logs_dir / f"jobs_for_{ulid.new()}.log"
+
+        print(f"📝 スクリプト実行中: {jobs_for_script}")
+        print(f"📄 ログファイル: {log_file}")
+
+        cmd = ["uv", "run", str(jobs_for_script), candidate_id]
+        if fresh:
+            cmd.append("--fresh")
+
+        with open(log_file, "w", encoding="utf-8") as f:
+            result = subprocess.run(
+                cmd,
+                cwd=str(project_dir),
+                stdout=f,
+                stderr=subprocess.STDOUT,
+            )
+
+        elapsed_time = time.time() - start_time
+        elapsed_str = f"{int(elapsed_time // 60)}分{int(elapsed_time % 60)}秒"
+        print(f"⏱️  処理時間: {elapsed_str}")
+
+        # 最新の結果ファイルを探す（ULID directory内）
+        results_dir = project_dir / "workspace" / "output"
+        ulid_dirs = sorted(
+            [d for d in results_dir.iterdir() if d.is_dir()], reverse=True
+        )
+        latest_summary = latest_csv = None
+        if ulid_dirs:
+            latest_summary = ulid_dirs[0] / "jobs_summary.md"
+            latest_csv = ulid_dirs[0] / "jobs.csv"
+
+        if (
+            result.returncode != 0
+            or latest_summary is None
+            or not latest_summary.exists()
+            or not latest_csv.exists()
+        ):
+            print(f"❌ エラー発生（終了コード: {result.returncode}）")
+            client.chat_update(
+                channel=channel_id,
+                ts=status_ts,
+                text=(
+                    f"❌ 候補者に合う求人の検索でエラーが発生しました\n\n"
+                    f"候補者ID: `{candidate_id}`\n"
+                    f"⏱️ 処理時間: {elapsed_str}\n\n"
+                    f"申し訳ございません。候補者IDをご確認の上、もう一度お試しください"
+                ),
+            )
+            return
+
+        with open(latest_summary, "r", encoding="utf-8") as f:
+            summary_text = f.read()
+            f.seek(0)
+            title = f.readline().strip().lstrip("# ")
+
+        # CSV行数をカウント（ヘッダー除く）
+        with open(latest_csv, "r", encoding="utf-8-sig", newline="") as f:
+            job_count = max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+        # Canvas作成・チャンネルに共有
+        canvas_response = client.canvases_create(
+            title=title,
+            document_content={"type": "markdown", "markdown": summary_text},
+        )
+        canvas_id = canvas_response["canvas_id"]
+        client.canvases_access_set(
+            canvas_id=canvas_id, access_level="read", channel_ids=[channel_id]
+        )
+        auth = client.auth_test()
+        canvas_url = f"{auth['url']}docs/{auth['team_id']}/{canvas_id}"
+
+        client.chat_update(
+            channel=channel_id,
+            ts=status_ts,
+            text=(
+                f"✅ 候補者に合う求人が見つかりました\n\n"
+                f"{title}\n"
+                f"見つかった求人: *{job_count}件*\n"
+                f"⏱️ 処理時間: {elapsed_str}\n"
+                f"⏰ 完了時刻: {datetime.now().strftime('%H:%M:%S')}\n\n"
+                f"📄 詳細はCanvasとCSVをご確認ください\n"
+                f"{canvas_url}"
+            ),
+        )
+
+        # CSVファイルをアップロード（スレッド内）
+        client.files_upload_v2(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            file=str(latest_csv),
+            title=f"候補者に合う求人 ({job_count}件)",
+            initial_comment=f"📊 全{job_count}件の詳細データ（CSV形式）",
+        )
+
+        print(f"✅ Slack投稿完了")
+
+    except Exception as e:
+        print(f"❌ 予期しないエラー: {e}")
+        import traceback
+
+        traceback.print_exc()
+
+        client.chat_update(
+            channel=channel_id,
+            ts=status_ts,
+            text=(
+                f"❌ 予期しないエラーが発生しました\n\n"
+                f"申し訳ございません。もう一度お試しいただくか、\n"
+                f"管理者にお問い合わせください"
+            ),
+        )
+    finally:
+        print(f"{'=' * 60}\n")
+
+
 def job_worker():
     """キュー内のジョブを1件ずつ処理するワーカー"""
     global is_processing
@@ -1182,6 +1516,41 @@ def handle_reload_signal(signum, frame):
                 pass
 
 
+def post_match_alerts():
+    """新着マッチのダイジェストがあれば SLACK_CH に投稿して消す"""
+    if not ADMIN_CHANNEL or not ALERTS_DIGEST.exists():
+        return
+    text = ALERTS_DIGEST.read_text(encoding="utf-8")
+    if BOT_NAME:
+        text = text.replace("`@bot ", f"`@{BOT_NAME} ")
+    app.client.chat_postMessage(channel=ADMIN_CHANNEL, text=text)
+    ALERTS_DIGEST.unlink()
+    print("🆕 新着マッチを通知しました")
+
+
+def start_summaries():
+    """候補者サマリーの作成を別プロセスで始める（取り込みの後）
+
+    OpenCode を最大 SUMMARY_MAX_BATCHES 回呼ぶので、ダウンロードの制限時間に含めず、
+    ワーカーも塞がないように完了を待たない。同時に2つは動かない（summaries.py のロック）。
+    """
+    import ulid
+
+    project_dir = Path(__file__).parent.parent.resolve()
+    logs_dir = project_dir / "workspace" / "logs"
+    logs_dir.mkdir(exist_ok=True)
+    log_file = logs_dir / f"summaries_{ulid.new()}.log"
+    with open(log_file, "w") as log:
+        subprocess.Popen(
+            ["uv", "run", str(project_dir / "bin" / "summaries.py"), "run"],
+            cwd=str(project_dir),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    print(f"📝 候補者サマリーの作成を開始しました（ログ: {log_file}）")
+
+
 def run_download():
     """download.pyを定期実行してSlack通知"""
     start_time = time.time()
@@ -1221,6 +1590,8 @@ def run_download():
                         f"⏱️ 処理時間: {elapsed_str}"
                     ),
                 )
+            post_match_alerts()
+            start_summaries()
         else:
             # 失敗
             print(f"❌ データダウンロード失敗")
@@ -1302,6 +1673,8 @@ def run_download_with_reply(client, channel_id, thread_ts):
                     f"⏱️ 処理時間: {elapsed_str}"
                 ),
             )
+            post_match_alerts()
+            start_summaries()
         else:
             # 失敗
             print(f"❌ データダウンロード失敗")
@@ -1356,6 +1729,47 @@ def job_scheduler():
         time.sleep(60)  # 1分ごとにチェック
 
 
+def preflight_rejects(command, args, client, channel_id, thread_ts):
+    """キューに積む前に依頼が成立するか確かめ、成立しなければ理由を返信する
+
+    存在しないIDや0件の検索でワーカーを塞がないため（preflight.py、1秒未満）。
+    """
+    try:
+        message, suggestion = preflight.check(command, args)
+    except Exception as e:
+        # 判定できないときは通す（本処理側で従来どおり扱う）
+        print(f"⚠️ 事前チェックに失敗: {e}")
+        return False
+    if not message:
+        return False
+    if suggestion:
+        bot_mention = f"@{BOT_NAME}" if BOT_NAME else "@bot"
+        message += f"\n例: `{bot_mention} {command} {suggestion}`"
+    client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=message)
+    print(f"🚫 事前チェックで却下: {command} {' '.join(args)}")
+    return True
+
+
+def preflight_job_ids(job_ids, client, channel_id, thread_ts) -> list:
+    """求人IDを1件ずつ確かめ、見つからないIDを返信して残りのIDを返す
+
+    1件の誤りでまとめた依頼全体を断らないため（preflight.py、1秒未満）。
+    """
+    try:
+        found, message = preflight.split_job_ids(job_ids)
+    except Exception as e:
+        # 判定できないときは通す（本処理側で従来どおり扱う）
+        print(f"⚠️ 事前チェックに失敗: {e}")
+        return job_ids
+    if message:
+        if found:
+            message += f"\n➡️ 残りの{len(found)}件で実行します"
+        client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=message)
+        rejected = [i for i in job_ids if i not in found]
+        print(f"🚫 事前チェックで除外: candidate {' '.join(rejected)}")
+    return found
+
+
 @app.event("app_mention")
 def handle_mention(event, say, logger, client):
     """ボットがメンションされた時"""
@@ -1389,6 +1803,12 @@ def handle_mention(event, say, logger, client):
 
     # コマンドをパース
     parts = command_text.split()
+    # rerun / --fresh: 結果キャッシュを使わずに実行
+    fresh = any(p.lower() in ("rerun", "--fresh") for p in parts[1:])
+    # narrate / --narrate: 件数が少なくてもAIに説明文を書かせる（job / company）
+    narrate = any(p.lower() in ("narrate", "--narrate") for p in parts[1:])
+    flags = ("rerun", "--fresh", "narrate", "--narrate")
+    parts = parts[:1] + [p for p in parts[1:] if p.lower() not in flags]
     print(f"🔍 パース結果: {parts}")
 
     # キューの状態を確認
@@ -1410,13 +1830,17 @@ def handle_mention(event, say, logger, client):
                 "こんにちは！マッチング・検索機能が使えます 👋\n\n"
                 "*使い方:*\n"
                 f"• `{bot_mention} candidate J-XXXXXXX` - 求人IDから候補者を探す\n"
+                f"• `{bot_mention} candidate J-XXXXXXX J-YYYYYYY ...` - 複数の求人をまとめて実行\n"
+                f"• `{bot_mention} jobs-for 003XXXXXXXXXXXX` - 候補者IDから合う求人を探す\n"
                 f"• `{bot_mention} job Pythonエンジニア` - キーワードから求人を探す\n"
                 f"• `{bot_mention} company SaaS系スタートアップ` - キーワードから企業を探す\n"
                 f"• `{bot_mention} ping` - Bot稼働状況確認\n"
                 f"• `{bot_mention} version` - バージョン情報確認\n"
                 f"• `{bot_mention} test` - OpenCode疎通テスト\n"
                 f"• `{bot_mention} reload` - コードをリロード\n"
-                f"• `{bot_mention} download` - データを手動ダウンロード\n\n"
+                f"• `{bot_mention} download` - データを手動ダウンロード\n"
+                "（同じ依頼の結果は24時間キャッシュされます。末尾に `rerun` を付けると再実行）\n"
+                "（job / company は件数が少なければAIを使わずにすぐ返します。末尾に `narrate` を付けるとAIの説明文つき）\n\n"
                 "*例:*\n"
                 f"• `{bot_mention} candidate J-0000024062`\n"
                 f"• `{bot_mention} job フルリモート`\n"
@@ -1440,7 +1864,36 @@ def handle_mention(event, say, logger, client):
             )
             return
 
-        job_id = parts[1]
+        # 複数の求人IDはバッチで実行（事前フィルタを共有し、LLM の評価をまとめる）
+        job_ids = list(dict.fromkeys(p.strip(",") for p in parts[1:] if p.strip(",")))
+        job_ids = preflight_job_ids(job_ids, client, channel_id, thread_ts)
+        if not job_ids:
+            return
+        if len(job_ids) > 1:
+            client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                text=(
+                    f"📋 リクエストを受け付けました\n\n"
+                    f"求人ID: {len(job_ids)}件（まとめて実行）\n"
+                    + (
+                        f"⏳ 現在{queue_size}件処理中です\n\n順番が来たらこのスレッドで通知します"
+                        if queue_size > 0
+                        else "⚡ すぐに処理を開始します"
+                    )
+                ),
+            )
+            job_queue.put(
+                {
+                    "func": process_candidate_batch,
+                    "args": (job_ids, user_id, say, client, channel_id, thread_ts),
+                    "kwargs": {"fresh": fresh},
+                }
+            )
+            print(f"✅ ジョブをキューに追加（キュー: {job_queue.qsize()}件）")
+            return
+
+        job_id = job_ids[0]
         bot_mention = f"@{BOT_NAME}" if BOT_NAME else "@bot"
 
         # まず受付メッセージ（スレッド内に即座に表示）
@@ -1472,12 +1925,49 @@ def handle_mention(event, say, logger, client):
             {
                 "func": process_candidate_matching,
                 "args": (job_id, user_id, say, client, channel_id, thread_ts),
-                "kwargs": {},
+                "kwargs": {"fresh": fresh},
             }
         )
 
         print(f"✅ ジョブをキューに追加（キュー: {job_queue.qsize()}件）")
 
+    elif command == "jobs-for":
+        # 候補者に合う求人を探す（候補者IDから求人を探す）
+        if len(parts) < 2:
+            bot_mention = f"@{BOT_NAME}" if BOT_NAME else "@bot"
+            client.chat_postMessage(
+                channel=channel_id,
+                thread_ts=thread_ts,
+                text=f"❌ 候補者IDを指定してください\n例: `{bot_mention} jobs-for 003P00000000000`",
+            )
+            return
+
+        candidate_id = parts[1]
+        if preflight_rejects("jobs-for", [candidate_id], client, channel_id, thread_ts):
+            return
+
+        client.chat_postMessage(
+            channel=channel_id,
+            thread_ts=thread_ts,
+            text=(
+                f"📋 リクエストを受け付けました\n\n"
+                f"候補者ID: `{candidate_id}`\n"
+                + (
+                    f"⏳ 現在{queue_size}件処理中です\n\n順番が来たらこのスレッドで通知します"
+                    if queue_size > 0
+                    else "⚡ すぐに処理を開始します"
+                )
+            ),
+        )
+        job_queue.put(
+            {
+                "func": process_jobs_for,
+                "args": (candidate_id, user_id, say, client, channel_id, thread_ts),
+                "kwargs": {"fresh": fresh},
+            }
+        )
+        print(f"✅ ジョブをキューに追加（キュー: {job_queue.qsize()}件）")
+
     elif command == "job":
         # 求人検索（キーワードから求人を探す）
         if len(parts) < 2:
@@ -1497,6 +1987,8 @@ def handle_mention(event, say, logger, client):
 
         # 検索クエリを抽出（2番目以降の全ての単語を結合）
         search_query = " ".join(parts[1:])
+        if preflight_rejects("job", parts[1:], client, channel_id, thread_ts):
+            return
 
         # まず受付メッセージ（スレッド内に即座に表示）
         if queue_size > 0:
@@ -1527,7 +2019,7 @@ def handle_mention(event, say, logger, client):
             {
                 "func": process_job_search,
                 "args": (search_query, user_id, say, client, channel_id, thread_ts),
-                "kwargs": {},
+                "kwargs": {"fresh": fresh, "narrate": narrate},
             }
         )
 
@@ -1552,6 +2044,8 @@ def handle_mention(event, say, logger, client):
 
         # 検索クエリを抽出（2番目以降の全ての単語を結合）
         search_query = " ".join(parts[1:])
+        if preflight_rejects("company", parts[1:], client, channel_id, thread_ts):
+            return
 
         # まず受付メッセージ（スレッド内に即座に表示）
         if queue_size > 0:
@@ -1582,7 +2076,7 @@ def handle_mention(event, say, logger, client):
             {
                 "func": process_company_search,
                 "args": (search_query, user_id, say, client, channel_id, thread_ts),
-                "kwargs": {},
+                "kwargs": {"fresh": fresh, "narrate": narrate},
             }
         )
 
@@ -1864,7 +2358,8 @@ def handle_mention(event, say, logger, client):
             text=(
                 f"❌ 不明なコマンド: `{command}`\n\n"
                 "*使えるコマンド:*\n"
-                f"• `{bot_mention} candidate J-XXXXXXX` - 求人IDから候補者を探す\n"
+                f"• `{bot_mention} candidate J-XXXXXXX` - 求人IDから候補者を探す（複数指定でまとめて実行）\n"
+                f"• `{bot_mention} jobs-for <候補者ID>` - 候補者IDから合う求人を探す\n"
                 f"• `{bot_mention} job <キーワード>` - キーワードから求人を探す\n"
                 f"• `{bot_mention} company <キーワード>` - キーワードから企業を探す\n"
                 f"• `{bot_mention} ping` - Bot稼働状況確認\n"
@@ -1941,6 +2436,12 @@ if __name__ == "__main__":
     print()
     print("📖 使い方:")
     print(f"   @{BOT_NAME} candidate J-0000023845          # 求人IDから候補者を探す")
+    print(
+        f"   @{BOT_NAME} candidate J-0000023845 J-0000023846  # 複数の求人をまとめて実行"
+    )
+    print(
+        f"   @{BOT_NAME} jobs-for 003P00000000000        # 候補者IDから合う求人を探す"
+    )
     print(f"   @{BOT_NAME} job Pythonエンジニア            # キーワードから求人を探す")
     print(f"   @{BOT_NAME} company SaaS系スタートアップ    # キーワードから企業を探す")
     print(f"   @{BOT_NAME} ping                            # ヘルスチェック")
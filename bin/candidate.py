@@ -1,61 +1,626 @@
 #!/usr/bin/env -S uv run
 # /// script
-# dependencies = ["python-ulid", "typing-extensions"]
+# dependencies = ["python-ulid", "typing-extensions", "numpy", "scikit-learn"]
 # ///
 """
 Candidate Matching Interface
 
 求人IDに対して候補者をマッチングする。
+複数の求人IDを渡すとバッチモードで、事前フィルタを共有し LLM の評価を複数求人ずつまとめて実行する。
 
 Usage:
     uv run candidate.py J-0000023845
     uv run candidate.py 23845
+    uv run candidate.py 23845 --dry-run
+    uv run candidate.py 23845 --map-reduce
+    uv run candidate.py 23845 --fresh       # 結果キャッシュを使わずに実行
+    uv run candidate.py 23845 23846 23847   # バッチモード（複数の求人をまとめて実行）
+    uv run candidate.py --file job_ids.txt  # バッチモード（ファイルから。- で標準入力）
 """
 
+import json
 import os
+import re
 import sys
 import subprocess
+from datetime import datetime
 from pathlib import Path
 from ulid import ULID
 
+import columnar
+import fit
+import graph_index
+import job_profiles
+import ltr
+import mapreduce
+import planner
+import preflight
+import render
+import result_cache
+import shortlists
+import summaries
+import vector_index
+from records import (
+    find_record,
+    iter_records,
+    pick_field,
+    read_ndjson,
+    record_id,
+    select_records,
+    write_ndjson,
+)
+from ranking import fuse_rankings, rank_records
+
+# LLMに渡す候補者の上限
+MAX_CANDIDATES = 500
+
+# プロンプトのバージョン（プロンプト・出力形式を変えたら上げる。結果キャッシュのキーに使う）
+PROMPT_VERSION = 1
+
 
 def normalize_job_id(job_id: str) -> str:
     """求人IDを正規化"""
-    # 数字のみの場合は J- プレフィックスを追加
-    if job_id.isdigit():
-        return f"J-{int(job_id):010d}"
+    normalized = preflight.normalize_job_id(job_id)
+    if normalized is None:
+        print(f"❌ 不明なID形式: {job_id}")
+        print("対応形式: J-0000023845 / 23845 / 006RA00000HzHwb")
+        sys.exit(1)
+    return normalized
+
+
+def fields_note() -> str:
+    """filtered_candidates.ndjson の計算済みフィールドの説明（プロンプトの一部）"""
+    return f"""- `_score`: 求人の職種・スキル・要件に対するBM25スコア（職種・スキル欄を重視、登録時ランクと最終更新日で加点。夜間に計算済みのリストを使った場合はなし）
+- `_semantic`: 求人との意味的な類似度（0〜1、表記揺れ・類義語も考慮。夜間に計算済みのリストを使った場合はなし）
+- `_fit`: 求人への適合度（0〜1、計算済み）。ファイルはこの順に並んでいます（`_ltr` があればその順）
+- `_ltr`: 過去のマッチング結果から学習した A+/A 判定の見込み（0〜1）
+- `_fit_breakdown`: 適合度の内訳（各0〜1）: relevance=検索の関連度, skill=求人スキルの充足率, salary=希望年収が上限内か, location=勤務地, remote=働き方, recency=更新日の新しさ
+- 求人の企業ですでに選考中の候補者は除外済み（重複推薦を防ぐため）
+- `_summary`: 長い自由記述（職務経歴・メモなど）の要約。{summaries.LONG_FIELD_CHARS}文字を超えるフィールドはこの要約に置き換えてある。根拠に全文が必要な候補者だけ MCP の get(id) で読むこと
+- `_map_rank` / `_map_score` / `_map_reason`: 並列評価（map）でのチャンク内の一次評価（ある場合）。ファイルはこの順に並んでいます。一次評価のない候補者はその評価が失敗したチャンクの上位です"""
+
+
+def read_job_ids(args: list) -> list:
+    """引数・ファイル（--file ids.txt）・標準入力（-）から求人IDを読む（正規化して重複を除く）"""
+    tokens = []
+    rest = iter(args)
+    for arg in rest:
+        if arg == "--file":
+            path = next(rest, None)
+            if path is None or not Path(path).exists():
+                print(f"❌ 求人IDのファイルが見つかりません: {path}")
+                sys.exit(1)
+            tokens.extend(re.split(r"[\s,]+", Path(path).read_text(encoding="utf-8")))
+        elif arg == "-":
+            tokens.extend(re.split(r"[\s,]+", sys.stdin.read()))
+        elif not arg.startswith("--"):
+            tokens.append(arg)
+    return list(dict.fromkeys(normalize_job_id(t) for t in tokens if t))
+
+
+def shortlist_records(table: dict, entries: list, excluded, llm_rows: int) -> list:
+    """夜間に計算済みの上位（shortlists.py）から LLM に渡す候補者を作る
+
+    計算済みの relevance は類似度ではなく順位の点数なので、_semantic は付けない
+    （関連度は _fit_breakdown の relevance で渡す）。
+    """
+    rescored = ltr.exists()
+    limit = min(llm_rows, ltr.load()["shortlist"]) if rescored else llm_rows
+    entries = [e for e in entries if e["id"] not in excluded][:limit]
+    results = []
+    for entry, record in zip(
+        entries, columnar.records_at(table, [e["row"] for e in entries])
+    ):
+        record = {**record, "_fit": fit.weighted(entry["parts"])}
+        record["_fit_breakdown"] = entry["parts"]
+        if rescored:
+            record["_ltr"] = entry["total"]
+        results.append(record)
+    return results
+
+
+def save_shortlist_pool(chunks_dir: Path, entries: list, excluded):
+    """計算済みの上位（除外を除く）を事前フィルタのプールとして保存する（ltr.py の学習用）"""
+    pool = [e for e in entries if e["id"] not in excluded]
+    ltr.save_pool(
+        chunks_dir, [e["id"] for e in pool], [e["parts"]["relevance"] for e in pool]
+    )
+
+
+def write_candidates(results: list, chunks_dir: Path, output_name: str) -> int:
+    """候補者を chunks/ に書き出す（長い自由記述は作成済みのサマリーに置き換える）"""
+    # 全文は MCP の get で引ける
+    n_summarized = summaries.apply(results)
+    if n_summarized:
+        print(f"📝 サマリーに置き換え: {n_summarized}/{len(results)}名")
+
+    write_ndjson(results, chunks_dir / output_name)
+    print(f"✅ 事前フィルタ完了: {len(results)}件")
+    print()
+    return len(results)
+
+
+def prefilter_candidates(
+    job_id: str,
+    chunks_dir: Path,
+    top_k: int = MAX_CANDIDATES,
+    llm_rows: int = fit.LLM_CANDIDATES,
+    output_name: str = "filtered_candidates.ndjson",
+) -> int:
+    """対象求人を抽出し、スコア上位の候補者だけを chunks/ に書き出す
+
+    BM25（キーワード）と意味ベクトル検索の結果を RRF で統合する。
+    ベクトルインデックスがなければ BM25 のみ。
+    同じ企業ですでに選考中の候補者はグラフで引いて除外する。
+    列ファイルがあれば全候補者の適合度（fit.py）を計算し、上位だけを内訳つきで渡す。
+    過去の判定から学習したモデル（ltr.py）があれば、その確率で並べて件数をさらに絞る。
+    夜間に計算済みの上位（shortlists.py）があれば、これらの計算を省いてそこから始める。
+    """
+    job = find_record("jobs", job_id)
+    if job is None:
+        print(f"❌ 求人が見つかりません: {job_id}")
+        sys.exit(1)
+
+    write_ndjson([job], chunks_dir / "target_job.ndjson")
+    profile = job_profiles.get(job)
+
+    excluded = set()
+    if graph_index.exists():
+        graph = graph_index.load()
+        company = graph_index.job_company(graph, record_id(job, "jobs"))
+        if company:
+            excluded = set(graph_index.in_process_candidates(graph, company))
+            print(f"🚫 同じ企業で選考中のため除外: {len(excluded)}名")
+
+    table = columnar.attach("candidates") if columnar.exists("candidates") else None
+    if table is not None and llm_rows <= shortlists.SHORTLIST_K:
+        entries = shortlists.load(job, table)
+        if entries is not None:
+            save_shortlist_pool(chunks_dir, entries, excluded)
+            results = shortlist_records(table, entries, excluded, llm_rows)
+            print(f"⚡ 計算済みの候補者リストを使用: 上位{len(results)}名")
+            return write_candidates(results, chunks_dir, output_name)
+
+    print(f"🔍 候補者をBM25でランキング中... (上位{top_k}件)")
+    ranked = rank_records(
+        iter_records("candidates"), profile["query"], "candidates", top_k
+    )
+    by_id = {}
+    bm25_scores = {}
+    for score, record in ranked:
+        rid = record_id(record, "candidates")
+        by_id.setdefault(rid, record)
+        bm25_scores.setdefault(rid, score)
+    rankings = [list(bm25_scores)]
+
+    semantic_scores = {}
+    if vector_index.exists("candidates"):
+        print("🧭 意味ベクトル検索中...")
+        hits = vector_index.search("candidates", vector_index.index_text(job), top_k)[0]
+        semantic_scores = dict(hits)
+        rankings.append([rid for rid, _ in hits])
+
+    fused = [rid for rid in fuse_rankings(rankings) if rid not in excluded]
+    selected = fused[:top_k]
+
+    # 適合度（スキル・年収・勤務地・働き方・更新日・関連度）で LLM に渡す候補者を絞る
+    fit_scores = {}
+    rescore = None
+    if table is not None and table["skills"] is not None:
+        print("🧮 適合度を計算中...")
+        relevance = fit.rank_relevance(table, selected)
+        ltr.save_pool(chunks_dir, selected, fit.rank_points(len(selected)))
+        limit = min(top_k, llm_rows)
+        if ltr.exists():
+            model = ltr.load()
+            rescore = ltr.rescorer(model)
+            # map-reduce（llm_rows = top_k）では件数は絞らず、並べ替えだけに使う
+            if llm_rows < top_k:
+                limit = min(limit, model["shortlist"])
+            print(f"🎓 学習済みモデルで並べ替え（上位{limit}名）")
+        top = fit.top_candidates(
+            table, profile["fit"], limit, relevance, excluded, rescore
+        )
+        selected = [str(table["ids"][row]) for row, _, _ in top]
+        fit_scores = {
+            rid: (total, parts) for rid, (_, total, parts) in zip(selected, top)
+        }
+        missing_rows = [
+            row for rid, (row, _, _) in zip(selected, top) if rid not in by_id
+        ]
+        for record in columnar.records_at(table, missing_rows):
+            by_id[record_id(record, "candidates")] = record
+
+    missing = [rid for rid in selected if rid not in by_id]
+    if missing:
+        for record in select_records("candidates", missing):
+            by_id[record_id(record, "candidates")] = record
+
+    results = []
+    for rid in selected:
+        if rid not in by_id:
+            continue
+        record = {**by_id[rid], "_score": round(bm25_scores.get(rid, 0.0), 4)}
+        if rid in semantic_scores:
+            record["_semantic"] = round(semantic_scores[rid], 4)
+        if rid in fit_scores:
+            total, parts = fit_scores[rid]
+            record["_fit"] = fit.weighted(parts)
+            record["_fit_breakdown"] = parts
+            if rescore is not None:
+                record["_ltr"] = total
+        results.append(record)
+
+    return write_candidates(results, chunks_dir, output_name)
+
+
+def map_prompt(job_id: str, ulid: str, source: Path, result: Path) -> str:
+    """map（1チャンクの評価）のプロンプト"""
+    return f"""求人ID「{job_id}」に対して、候補者の一部（1チャンク）を評価してください。
+
+- 求人: `output/{ulid}/chunks/target_job.ndjson`
+- 候補者: `output/{ulid}/chunks/{source.name}`（このファイルだけを評価する）
+
+このチャンクから求人に合う候補者を最大{mapreduce.MAP_PICKS}名選び、次の形式のJSON配列で
+`output/{ulid}/chunks/{result.name}` にWriteツールで保存してください。
+
+```json
+[{{"id": "個人ユーザーID", "rank": "A+", "score": 92, "reason": "1〜2文の根拠"}}]
+```
+
+- rank: A+ / A / B / C（C は見送り）
+- score: 0〜100（チャンクをまたいで比較するので、求人要件への充足度で絶対評価する）
+- `_fit_breakdown` は機械的な照合結果（スキル・年収・勤務地・働き方）なので根拠に使ってよい
+- レポートやCSVは作らない（最終レポートは別の実行でまとめる）
+- ❌ 他のチャンクや `data/` の大きなファイルを読まないこと
+"""
+
+
+def map_candidates(job_id: str, ulid: str, workspace_dir: Path, opencode_cmd: list):
+    """shortlist を推定トークン数でチャンクに分けて並列に評価し、上位を filtered_candidates.ndjson にまとめる
+
+    Returns: まとめた候補者数
+    """
+    chunks_dir = workspace_dir / "output" / ulid / "chunks"
+    records = read_ndjson(chunks_dir / "shortlist.ndjson")
+    chunks = mapreduce.pack(records)
+    paths = mapreduce.write_chunks(chunks, chunks_dir)
+    print(
+        f"🗂️  map: {len(records)}名 → {len(chunks)}チャンク"
+        f"（最大{mapreduce.MAP_CHUNK_TOKENS}トークン、同時{mapreduce.MATCH_CONCURRENCY}件）"
+    )
+
+    commands = [
+        [*opencode_cmd, map_prompt(job_id, ulid, source, result)]
+        for source, result in paths
+    ]
+    mapreduce.run_parallel(commands, workspace_dir)
+
+    results = [mapreduce.read_result(result) for _, result in paths]
+    merged, failed = mapreduce.merge(chunks, results, "candidates", fit.LLM_CANDIDATES)
+    if failed:
+        print(
+            f"⚠️  評価できなかったチャンク: {failed}/{len(chunks)}（事前フィルタの上位で補完）"
+        )
+    write_ndjson(merged, chunks_dir / "filtered_candidates.ndjson")
+    print(f"✅ reduce: 上位{len(merged)}名を最終評価へ")
+    print()
+    return len(merged)
+
+
+# バッチモードで1回の OpenCode セッションにまとめて評価する求人数
+BATCH_JOBS_PER_SESSION = int(os.environ.get("BATCH_JOBS_PER_SESSION", "4"))
+
+
+def batch_prompt(sessions: list) -> str:
+    """複数の求人をまとめて評価するプロンプト（結果は求人ごとのセッションに保存する）"""
+    sections = []
+    for session in sessions:
+        ulid = session["ulid"]
+        sections.append(f"""## 求人ID「{session["job_id"]}」
+
+- 対象求人: `output/{ulid}/chunks/target_job.ndjson`
+- 候補者: `output/{ulid}/chunks/filtered_candidates.ndjson`（{session["count"]}件）
+- 保存先: `output/{ulid}/{render.RESULT_FILE}`
+
+{job_profiles.prompt_section(session["profile"], ulid)}""")
+    jobs_list = "、".join(session["job_id"] for session in sessions)
+    sections_text = "\n".join(sections)
+    return f"""次の{len(sessions)}件の求人（{jobs_list}）について、それぞれに合う候補者をマッチングしてください。
+
+求人ごとに作業ディレクトリ（`output/<ULID>/`）が分かれています。求人ごとに別々に評価し、
+結果はその求人の保存先にだけ書くこと（他の求人の候補者・評価を混ぜない）。
+
+{render.result_prompt("candidates", "<ULID>")}
+**評価の原則:**
+- 各候補者について「なぜマッチするのか」を、求人要件と候補者の経験・スキルの対応関係で示すこと
+- 抽象的な表現ではなく、具体的な事実に基づいて記述すること
+- 読み手（CAやRAコンサルタント）が即座に理解できる短い文にすること
+
+## 事前処理（実行済み）
+
+求人ごとの `target_job.ndjson` と `filtered_candidates.ndjson` はPython側で作成済みです。grepでの再抽出は不要です。
+`filtered_candidates.ndjson` は関連度の高い順に並んでいます。
+
+{fields_note()}
 
-    # J- で始まる場合はそのまま
-    if job_id.startswith("J-"):
-        return job_id
+スキルタグ・年収・勤務地・働き方の機械的な照合は `_fit_breakdown` で計算済みです。
+照合をやり直す必要はなく、内訳を根拠に使いながら職務経歴・メモなどの文脈を読んで説明文とランクを決めてください。
 
-    # 006で始まる場合は求人票ID（そのまま）
-    if job_id.startswith("006"):
-        return job_id
+{sections_text}
+## 手順（求人ごとに繰り返す）
 
-    print(f"❌ 不明なID形式: {job_id}")
-    print("対応形式: J-0000023845 / 23845 / 006RA00000HzHwb")
-    sys.exit(1)
+1. 求人要件を確認（抽出済みの要件があればそれを使う。なければ `target_job.ndjson` を読んで抽出・保存）
+2. `filtered_candidates.ndjson` を読んで各候補者を評価（必須スキル・希望条件・キャリアの方向性・即戦力性）
+3. 上位10-20名を選出し、ランク付け（A+, A, B）して、その求人の保存先に result.json を保存する
+
+**禁止事項:**
+- ❌ `data/` の `jobs.ndjson` や `candidates.ndjson` を直接Readツールで読み込むこと
+- ❌ Taskツールで並列処理 → 今回は不要（求人ごとのファイルは十分小さい）
+- ❌ 親ディレクトリ（../）へのアクセス
+
+**⚠️ 重要: すべての求人について最終ファイルを必ず作成してください**
+保存先の result.json がない求人は、Slackに結果を投稿できません。
+"""
+
+
+def prefilter_batch(jobs: dict, workspace_dir: Path, llm_rows: int) -> list:
+    """求人ごとのセッションを作り、候補者の事前フィルタをまとめて行う
+
+    列ファイルがあれば候補者を1回だけ読み込み、計算済みの上位（shortlists.py）がない求人は
+    まとめて採点する。列ファイルがなければ求人ごとに prefilter_candidates を使う。
+    Returns: [{"job_id", "ulid", "job", "profile", "count"}, ...]
+    """
+    table = columnar.attach("candidates") if columnar.exists("candidates") else None
+    shared = table is not None and llm_rows <= shortlists.SHORTLIST_K
+    entries = {}
+    if shared:
+        for jid, job in jobs.items():
+            saved = shortlists.load(job, table)
+            if saved is not None:
+                entries[jid] = saved
+        missing = {jid: job for jid, job in jobs.items() if jid not in entries}
+        if missing:
+            print(f"🧮 適合度をまとめて計算中...（{len(missing)}求人）")
+            entries.update(shortlists.compute(table, missing))
+        print(f"⚡ 計算済みの候補者リストを使用: {len(jobs) - len(missing)}求人")
+
+    graph = graph_index.load() if graph_index.exists() else None
+    sessions = []
+    for jid, job in jobs.items():
+        ulid = str(ULID())
+        work_dir = workspace_dir / "output" / ulid
+        chunks_dir = work_dir / "chunks"
+        chunks_dir.mkdir(parents=True, exist_ok=True)
+        print(f"🎯 {jid} → {ulid}")
+        if shared:
+            excluded = set()
+            company = graph_index.job_company(graph, jid) if graph else None
+            if company:
+                excluded = set(graph_index.in_process_candidates(graph, company))
+            write_ndjson([job], chunks_dir / "target_job.ndjson")
+            save_shortlist_pool(chunks_dir, entries[jid], excluded)
+            results = shortlist_records(table, entries[jid], excluded, llm_rows)
+            count = write_candidates(results, chunks_dir, "filtered_candidates.ndjson")
+        else:
+            count = prefilter_candidates(jid, chunks_dir, MAX_CANDIDATES, llm_rows)
+        sessions.append(
+            {
+                "job_id": jid,
+                "ulid": ulid,
+                "job": job,
+                "profile": job_profiles.get(job),
+                "count": count,
+            }
+        )
+    return sessions
+
+
+def run_batch(job_ids: list, workspace_dir: Path, fresh: bool = False) -> int:
+    """複数の求人をまとめてマッチングする（Returns: 終了コード）
+
+    求人は1回の走査で読み、候補者の事前フィルタは列ファイルを共有してまとめて行う。
+    LLM の評価は BATCH_JOBS_PER_SESSION 件ずつ1つのセッションにまとめ、セッションは並列に実行する。
+    結果は求人ごとのセッション（output/<ULID>/）に作り、一覧を output/<バッチのULID>/batch.json に書く。
+    """
+    batch_id = str(ULID())
+    batch_dir = workspace_dir / "output" / batch_id
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    print(f"📍 Working directory: {workspace_dir}")
+    print(f"🎯 Job IDs: {len(job_ids)}件")
+    print(f"🆔 Batch ULID: {batch_id}")
+    print()
+
+    jobs = {record_id(job, "jobs"): job for job in select_records("jobs", job_ids)}
+    for jid in job_ids:
+        if jid not in jobs:
+            job = find_record("jobs", jid)
+            if job is None:
+                print(f"❌ 求人が見つかりません: {jid}")
+            else:
+                jobs[jid] = job
+
+    manifest = []
+    pending = {}
+    for jid, job in jobs.items():
+        key = result_cache.cache_key(
+            {"type": "candidate", "job_id": jid, "map_reduce": False}, PROMPT_VERSION
+        )
+        if not fresh:
+            ulid = str(ULID())
+            cached = result_cache.lookup(key, workspace_dir / "output" / ulid)
+            if cached:
+                print(f"⚡ {jid}: キャッシュから応答")
+                count = render.rendered_count(
+                    workspace_dir / "output" / ulid, "candidates"
+                )
+                manifest.append(
+                    {"job_id": jid, "session": ulid, "cached": True, "count": count}
+                )
+                continue
+        pending[jid] = (job, key)
+
+    plan_rows = fit.LLM_CANDIDATES
+    if planner.exists("candidates"):
+        plan_rows = planner.plan_matching(
+            MAX_CANDIDATES,
+            vector_index.exists("candidates"),
+            columnar.exists("candidates"),
+        )["llm_rows"]
+
+    sessions = []
+    if pending:
+        sessions = prefilter_batch(
+            {jid: job for jid, (job, _) in pending.items()}, workspace_dir, plan_rows
+        )
+    for session in sessions:
+        request = {
+            "type": "candidate",
+            "job_id": session["job_id"],
+            "batch": batch_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        (workspace_dir / "output" / session["ulid"] / "request.json").write_text(
+            json.dumps(request, ensure_ascii=False), encoding="utf-8"
+        )
+
+    opencode_model = os.getenv("OPENCODE_MODEL", "opencode/grok-code")
+    opencode_cmd = ["opencode", "run", "--model", opencode_model]
+    groups = [
+        sessions[i : i + BATCH_JOBS_PER_SESSION]
+        for i in range(0, len(sessions), BATCH_JOBS_PER_SESSION)
+    ]
+    if groups:
+        print(f"🤖 OpenCode Model: {opencode_model}")
+        print(
+            f"🗂️  {len(sessions)}求人 → {len(groups)}セッション"
+            f"（1セッション最大{BATCH_JOBS_PER_SESSION}求人、同時{mapreduce.MATCH_CONCURRENCY}件）"
+        )
+    returncodes = mapreduce.run_parallel(
+        [[*opencode_cmd, batch_prompt(group)] for group in groups], workspace_dir
+    )
+
+    for group, returncode in zip(groups, returncodes):
+        for session in group:
+            jid, job = session["job_id"], session["job"]
+            work_dir = workspace_dir / "output" / session["ulid"]
+            if not session["profile"]["requirements"]:
+                job_profiles.learn(work_dir, job)
+            job_title = pick_field(job, ("求人名", "職種"), "求人")
+            n_rendered = render.render(work_dir, "candidates", f"{jid} ({job_title})")
+            if n_rendered >= 0 and returncode == 0:
+                result_cache.store(pending[jid][1], work_dir)
+            # 件数はデータにないIDを除いた render の値（batch.json と Slack の表示に使う）
+            manifest.append(
+                {"job_id": jid, "session": session["ulid"], "count": n_rendered}
+            )
+
+    order = {jid: i for i, jid in enumerate(job_ids)}
+    manifest.sort(key=lambda item: order[item["job_id"]])
+    n_done = 0
+    print()
+    for item in manifest:
+        job = jobs[item["job_id"]]
+        item["title"] = pick_field(job, ("求人名", "職種"), "")
+        n_done += item["count"] >= 0
+        mark = "✅" if item["count"] >= 0 else "❌"
+        print(f"{mark} {item['job_id']} {item['title']}: {max(item['count'], 0)}名")
+    (batch_dir / "batch.json").write_text(
+        json.dumps(
+            {"batch": batch_id, "job_ids": job_ids, "jobs": manifest},
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    print(f"📦 バッチ完了: {n_done}/{len(job_ids)}求人（output/{batch_id}/batch.json）")
+    return 0 if n_done else 1
 
 
 def main():
     """メイン処理"""
-    if len(sys.argv) < 2:
-        print("Usage: uv run candidate.py <JOB_ID>")
+    job_ids = read_job_ids(sys.argv[1:])
+    if not job_ids:
+        print(
+            "Usage: uv run candidate.py <JOB_ID>... [--file ids.txt | -] [--dry-run] [--map-reduce] [--fresh]"
+        )
         print("Example: uv run candidate.py J-0000023845")
         print("Example: uv run candidate.py 23845")
+        print("Example: uv run candidate.py 23845 23846 23847   # バッチモード")
         sys.exit(1)
 
-    job_id = normalize_job_id(sys.argv[1])
+    # 存在しない求人はセッションを作る前に除く（preflight.py。データの文字列検索のみ）
+    missing = preflight.missing_ids("jobs", job_ids)
+    if missing:
+        print(f"❌ 求人が見つかりません: {', '.join(missing)}")
+        job_ids = [jid for jid in job_ids if jid not in missing]
+        if not job_ids:
+            sys.exit(1)
+
     project_root = Path(__file__).parent.parent
     workspace_dir = project_root / "workspace"
 
+    # 複数の求人はバッチモード（事前フィルタを共有し、LLM の評価をまとめる）
+    if len(job_ids) > 1:
+        if "--map-reduce" in sys.argv or "--dry-run" in sys.argv:
+            print("❌ --map-reduce / --dry-run は求人1件のときだけ使えます")
+            sys.exit(1)
+        sys.exit(run_batch(job_ids, workspace_dir, "--fresh" in sys.argv))
+
+    job_id = job_ids[0]
+
+    # 実行計画（候補者のトークン予算から事前フィルタ・LLMに渡す件数を決める）
+    top_k = MAX_CANDIDATES
+    llm_rows = fit.LLM_CANDIDATES
+    map_reduce = "--map-reduce" in sys.argv
+    plan = None
+    if planner.exists("candidates") and not map_reduce:
+        plan = planner.plan_matching(
+            MAX_CANDIDATES,
+            vector_index.exists("candidates"),
+            columnar.exists("candidates"),
+        )
+        top_k = plan["top_k"]
+        llm_rows = plan["llm_rows"]
+    if "--dry-run" in sys.argv:
+        if not plan:
+            print(
+                "❌ 語の統計がありません。uv run bin/planner.py build を実行してください"
+            )
+            sys.exit(1)
+        planner.print_plan(plan)
+        sys.exit(0)
+
     # ULID生成とディレクトリ作成
     ulid = str(ULID())
     work_dir = workspace_dir / "output" / ulid
     chunks_dir = work_dir / "chunks"
+
+    # 同じ依頼・同じデータ・同じモデルの結果があれば OpenCode を実行せずに返す
+    cache_key = result_cache.cache_key(
+        {"type": "candidate", "job_id": job_id, "map_reduce": map_reduce},
+        PROMPT_VERSION,
+    )
+    if "--fresh" not in sys.argv:
+        cached = result_cache.lookup(cache_key, work_dir)
+        if cached:
+            created = datetime.fromtimestamp(cached["created_at"]).strftime("%H:%M")
+            print(f"⚡ キャッシュから応答（{created} の結果、--fresh で再実行）")
+            print(f"🆔 Session ULID: {ulid}")
+            sys.exit(0)
+
     chunks_dir.mkdir(parents=True, exist_ok=True)
 
+    # リクエスト内容（事前フィルタの学習で求人と結果を結びつけるため）
+    request = {
+        "type": "candidate",
+        "job_id": job_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    (work_dir / "request.json").write_text(
+        json.dumps(request, ensure_ascii=False), encoding="utf-8"
+    )
+
     # workspace ディレクトリに移動
     print(f"📍 Working directory: {workspace_dir}")
     print(f"🎯 Job ID: {job_id}")
@@ -70,10 +635,21 @@ def main():
     opencode_cmd.extend(["--model", opencode_model])
     print(f"🤖 OpenCode Model: {opencode_model}")
 
-    # Salesforce URL を環境変数から取得
-    salesforce_base_url = os.getenv(
-        "SALESFORCE_BASE_URL", "https://your-org.lightning.force.com"
-    )
+    # 候補者の事前フィルタ（Python側でスコア順に絞り込む）
+    if map_reduce:
+        # 多めに残して map で並列に評価し、reduce（最終レポート）には上位だけを渡す
+        prefilter_candidates(
+            job_id, chunks_dir, MAX_CANDIDATES, MAX_CANDIDATES, "shortlist.ndjson"
+        )
+        n_candidates = map_candidates(job_id, ulid, workspace_dir, opencode_cmd)
+    else:
+        n_candidates = prefilter_candidates(job_id, chunks_dir, top_k, llm_rows)
+
+    # 求人要件（同じ求人で抽出済みならキャッシュを渡して読み直しを省く）
+    job = read_ndjson(chunks_dir / "target_job.ndjson")[0]
+    profile = job_profiles.get(job)
+    if profile["requirements"]:
+        print("📌 求人要件: キャッシュを使用")
 
     # OpenCode 実行
     prompt = f"""求人ID「{job_id}」に合う候補者をマッチングしてください。
@@ -83,93 +659,35 @@ def main():
 **重要: すべての出力は output/{ulid}/ ディレクトリに保存してください**
 
 - 作業用チャンクファイル: `output/{ulid}/chunks/` に配置
-- 最終成果物: `output/{ulid}/matching_summary.md` と `output/{ulid}/matching.csv`
-
-## 出力形式の要件
-
-### サマリーファイル（matching_summary.md）について
-このサマリーは **Slack Canvas で最終成果物として表示される** ため、読みやすく詳細なレポート形式で作成してください。
-
-**必須セクション:**
-
-1. **マッチング概要**
-   - 求人情報（求人ID、企業名、職種、勤務地など）
-   - マッチング日時
-   - 候補者総数
-   - 処理時間
-
-2. **候補者一覧**（各候補者について以下を記載）
-   
-   ### [候補者名]（ランク: A+）
-   
-   **基本情報**
-   - 現職: [現在の会社・役職]
-   - 年齢: XX歳
-   - 希望年収: XXX万円
-   - 最終更新日: YYYY-MM-DD
-   
-   **なぜこの候補者が該当するのか**
-   この候補者は[具体的な経験・スキル]を持ち、求人の要件である[要件1、要件2]と高い親和性があります。
-   特に[特筆すべきポイント]は、求人が求める[ニーズ]と完全に一致しています。
-   [その他の強み・経験]も考慮すると、即戦力として活躍できる可能性が高いと判断しました。
-   
-   **マッチポイント**
-   ✅ [技術スキルのマッチ点]
-   ✅ [業界・業務経験のマッチ点]
-   ✅ [志向性のマッチ点]
-   ✅ [その他のプラス要素]
-   
-   **懸念点・要確認事項**
-   ⚠️ [あれば記載、なければ「特になし」]
-   
-    **詳細情報**
-    - Salesforce: [候補者を開く]({salesforce_base_url}/...)
-   
-   ---
-
-3. **統計情報**
-   - マッチ度分布（A+: X人, A: Y人, B: Z人）
-   - 平均年齢、希望年収レンジ
-   - 現職の業種分布
-
-**重要な原則:**
-- 各候補者について「なぜマッチするのか」を具体的に説明すること
-- 求人要件と候補者の経験・スキルの対応関係を明確に示すこと
+- 最終成果物: `output/{ulid}/{render.RESULT_FILE}`（サマリー・CSV・Salesforceリンクはここから自動で作成）
+
+{render.result_prompt("candidates", ulid)}
+**評価の原則:**
+- 各候補者について「なぜマッチするのか」を、求人要件と候補者の経験・スキルの対応関係で示すこと
 - 抽象的な表現ではなく、具体的な事実に基づいて記述すること
-- 読み手（CAやRAコンサルタント）が即座に理解できる文章にすること
+- 読み手（CAやRAコンサルタント）が即座に理解できる短い文にすること
 
 ## 🔍 2段階処理戦略
 
 このタスクは大きなファイル（jobs.ndjson: 65MB、candidates.ndjson: 80MB）を効率的に処理するため、2段階で行います：
 
-### Step 1: Bashで事前処理（高速・機械的）
-
-```bash
-# 1-1. 対象求人を抽出（求人ID: {job_id}）
-grep "{job_id}" jobs.ndjson > output/{ulid}/chunks/target_job.ndjson
+### Step 1: 事前処理（実行済み）
 
-# 1-2. 求人の必須スキル・キーワードを抽出してgrepパターンを作成
-# 例: 求人が「Python, Django, AWS経験者」を求めているなら
-#     → "python|Python|django|Django|aws|AWS|バックエンド|backend" など
-# 例: 求人が「営業経験3年以上」を求めているなら
-#     → "営業|sales|法人営業|新規開拓" など
+以下のファイルはPython側で作成済みです。grepでの再抽出は不要です。
 
-# 1-3. 候補者データを粗フィルタリング（数千件→数百件に削減）
-grep -iE "関連キーワード1|関連キーワード2|スキル1|スキル2|..." candidates.ndjson > output/{ulid}/chunks/filtered_candidates.ndjson
-
-# 件数確認
-wc -l output/{ulid}/chunks/filtered_candidates.ndjson
-```
+- `output/{ulid}/chunks/target_job.ndjson` - 対象求人（求人ID: {job_id}）
+- `output/{ulid}/chunks/filtered_candidates.ndjson` - 候補者（{n_candidates}件）
 
+`filtered_candidates.ndjson` は関連度の高い順に並んでいます。
+{fields_note()}
 **重要:** 
 - `candidates.ndjson` (80MB) は**絶対に直接読み込まない**こと
-- フィルタリングは緩めに（後でAIが精密評価するので多めに取る）
-- フィルタリング後は**必ず500件以下に制限**してください（例: `head -500`）
-- 500件超の場合、処理がタイムアウトする可能性があります
+- `filtered_candidates.ndjson` の並び順（スコア）は参考値です。最終判断は内容を読んで行ってください
 
+{job_profiles.prompt_section(profile, ulid)}
 ### Step 2: OpenCodeで精密マッチング（AI判断・文脈理解）
 
-1. `target_job.ndjson` を読んで求人要件を理解
+1. 求人要件を確認（抽出済みの要件があればそれを使う。なければ `target_job.ndjson` を読んで抽出・保存）
 2. `filtered_candidates.ndjson` を読んで各候補者を評価
 3. 以下の観点でマッチング：
    - 必須スキル・経験の充足度
@@ -177,7 +695,10 @@ wc -l output/{ulid}/chunks/filtered_candidates.ndjson
    - キャリアの方向性・志向性
    - 即戦力性 vs ポテンシャル
 
-上位10-20名を選出し、ランク付け（A+, A, B）して最終レポートを作成してください。
+スキルタグ・年収・勤務地・働き方の機械的な照合は `_fit_breakdown` で計算済みです。
+照合をやり直す必要はなく、内訳を根拠に使いながら職務経歴・メモなどの文脈を読んで説明文とランクを決めてください。
+
+上位10-20名を選出し、ランク付け（A+, A, B）して result.json に保存してください。
 
 ## 📋 処理上の重要な注意点
 
@@ -188,24 +709,34 @@ wc -l output/{ulid}/chunks/filtered_candidates.ndjson
 - ❌ 親ディレクトリ（../）へのアクセス
 
 **必須事項:**
-- ✅ Step 1: Bashでgrepフィルタリング → 500件以下に制限
+- ✅ Step 1: 事前フィルタ済みファイルを確認（grep不要）
 - ✅ Step 2: フィルタリング後のファイルをReadツールで読み込む
 - ✅ Step 3: マッチング評価・ランク付け
-- ✅ **Step 4: 必ず最終成果物を作成** → `output/{ulid}/matching_summary.md` と `output/{ulid}/matching.csv`
+- ✅ **Step 4: 必ず最終成果物を作成** → `output/{ulid}/{render.RESULT_FILE}`
 - ✅ 作業ディレクトリ: `workspace/` 内のみ
+- ✅ 候補者の全文は MCPツール（openmatching）の get(id)、似た候補者は similar(id)、追加の検索は search(query, kind="candidates", filters, k) で引く（1回最大50件）
 
 **⚠️ 重要: 最終ファイルを必ず作成してください**
-処理が完了したら、必ずWriteツールで以下の2ファイルを作成すること：
-1. `output/{ulid}/matching_summary.md`
-2. `output/{ulid}/matching.csv`
-
-これらのファイルがないと、Slackに結果を投稿できません。
+処理が完了したら、必ずWriteツールで `output/{ulid}/{render.RESULT_FILE}` を作成すること。
+このファイルがないと、Slackに結果を投稿できません。
 """
 
     opencode_cmd.append(prompt)
 
     result = subprocess.run(opencode_cmd, cwd=workspace_dir, check=False)
 
+    # 初回に抽出された求人要件をキャッシュに取り込む
+    if not profile["requirements"] and job_profiles.learn(work_dir, job):
+        print("📌 求人要件をキャッシュに保存しました")
+
+    # 評価（result.json）からサマリーと CSV を作成
+    job_title = pick_field(job, ("求人名", "職種"), "求人")
+    n_rendered = render.render(work_dir, "candidates", f"{job_id} ({job_title})")
+    if n_rendered >= 0:
+        print(f"📝 レポート作成: {n_rendered}名")
+    if result.returncode == 0:
+        result_cache.store(cache_key, work_dir)
+
     sys.exit(result.returncode)
 
 
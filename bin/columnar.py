@@ -0,0 +1,399 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Columnar Dataset
+
+候補者・求人・企業の ID・数値・カテゴリ・スキルタグ・検索用テキストを列ごとの NumPy ファイルに書き出し、
+ワーカープロセスが JSON を再パースせずに mmap で読み込めるようにする（ゼロコピー共有）。
+ページキャッシュ上の同じファイルを共有するため、ワーカーを増やしてもメモリは増えない。
+
+workspace/index/columns/<kind>/<version>/ に作成し、CURRENT を差し替えて公開する。
+読み込み中のワーカーは古いバージョンを使い続けられる。元のレコード（NDJSON の行）も
+バージョンごとに records.bin にコピーするので、取り込みでデータファイルが書き換わっても
+古いバージョンの行番号のまま正しいレコードを読める。
+
+行番号が連続した1つの配列として使う（fit.py・scan.py などが行番号で直接参照する）ため、
+差分セグメントにはせず、変更があれば新しいバージョンとして全行を書き出す。ただし内容の変わらない
+行（NDJSON の行が同じもの）は前のバージョンの値をコピーし、パース・スキル抽出などをするのは
+追加・変更された行だけにする（書き出しはデータ量に比例、抽出は変更件数に比例）。
+
+Usage:
+    uv run bin/columnar.py build
+    uv run bin/columnar.py info candidates
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from records import (
+    INDEX_DIR,
+    KINDS,
+    SKILL_TAGS,
+    STATUS_FIELD,
+    data_files,
+    employee_band,
+    find_record,
+    pick_field,
+    record_desired_salary,
+    record_id,
+    record_industry,
+    record_locations,
+    record_rank,
+    record_remote,
+    record_salary,
+    record_skills,
+    record_stage,
+    record_text,
+    record_updated_at,
+)
+
+COLUMN_DIR = INDEX_DIR / "columns"
+
+# 列の抽出方法のバージョン（抽出のしかたを変えたら上げる。前のバージョンの値をコピーしなくなる）
+COLUMNS_VERSION = 1
+
+# 残しておく古いバージョン数（読み込み中のワーカー用）
+KEEP_VERSIONS = 2
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _number(value):
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(str(value).replace(",", "").split()[0])
+    except ValueError:
+        return np.nan
+
+
+def _salary(record: dict, index: int):
+    salary = record_salary(record)
+    return salary[index] if salary else np.nan
+
+
+def _desired_salary(record: dict):
+    desired = record_desired_salary(record)
+    return np.nan if desired is None else desired
+
+
+def _updated_days(record: dict):
+    updated_at = record_updated_at(record)
+    if not updated_at:
+        return np.nan
+    return float((np.datetime64(updated_at.date(), "D") - _EPOCH).astype(int))
+
+
+# 数値列（float32、欠損は NaN）
+NUMERIC_COLUMNS = {
+    "salary_min": lambda r: _salary(r, 0),
+    "salary_max": lambda r: _salary(r, 1),
+    "desired_salary": _desired_salary,
+    "age": lambda r: _number(pick_field(r, ("年齢",))),
+    "employees": lambda r: _number(pick_field(r, ("従業員",))),
+    "updated_days": _updated_days,
+}
+
+# カテゴリ列（int16 のコード + ラベル一覧、欠損は空文字）
+CATEGORICAL_COLUMNS = {
+    "rank": lambda r, kind: record_rank(r, kind),
+    "industry": lambda r, kind: record_industry(r),
+    "remote": lambda r, kind: record_remote(r) or "",
+    "location": lambda r, kind: next(iter(record_locations(r)), ""),
+    "stage": lambda r, kind: record_stage(r) or "",
+    "size": lambda r, kind: employee_band(r) or "",
+    "status": lambda r, kind: str(r.get(STATUS_FIELD) or "").strip(),
+}
+
+# スキルタグのビット位置（skills 列は uint32 のビット集合）
+SKILL_BITS = {tag: 1 << i for i, tag in enumerate(SKILL_TAGS)}
+
+
+def skill_mask(tags) -> int:
+    """スキルタグ一覧をビット集合にする"""
+    return sum(SKILL_BITS[tag] for tag in set(tags) if tag in SKILL_BITS)
+
+
+def _kind_dir(kind: str, column_dir: Path = COLUMN_DIR) -> Path:
+    return column_dir / kind
+
+
+def _line_key(line: bytes) -> bytes:
+    return hashlib.blake2b(line, digest_size=16).digest()
+
+
+def _reusable(kind: str, column_dir: Path):
+    """値をコピーできる前のバージョン（同じ列構成・抽出方法のもの。なければ None）"""
+    if not exists(kind, column_dir):
+        return None
+    try:
+        previous = attach(kind, column_dir)
+    except (OSError, ValueError):
+        return None
+    if (
+        previous["records"] is None
+        or previous["schema"] != COLUMNS_VERSION
+        or list(previous["numeric"]) != list(NUMERIC_COLUMNS)
+        or list(previous["categories"]) != list(CATEGORICAL_COLUMNS)
+        or previous["skills"] is None
+    ):
+        return None
+    offsets = previous["record_offsets"]
+    records = previous["records"]
+    previous["rows"] = {
+        _line_key(bytes(records[offsets[row] : offsets[row + 1]])): row
+        for row in range(previous["size"])
+    }
+    return previous
+
+
+def _parse_row(kind: str, line: bytes) -> tuple:
+    """1行の (ID, 数値列, カテゴリ列のラベル, スキルタグ, 検索用テキスト) をレコードから抽出する"""
+    record = json.loads(line)
+    return (
+        record_id(record, kind),
+        {name: extract(record) for name, extract in NUMERIC_COLUMNS.items()},
+        {name: extract(record, kind) for name, extract in CATEGORICAL_COLUMNS.items()},
+        skill_mask(record_skills(record)),
+        record_text(record).lower().encode("utf-8"),
+    )
+
+
+def _copy_row(previous: dict, row: int) -> tuple:
+    """_parse_row() と同じ値を前のバージョンの行からコピーする"""
+    start, end = previous["text_offsets"][row], previous["text_offsets"][row + 1]
+    return (
+        str(previous["ids"][row]),
+        {name: float(values[row]) for name, values in previous["numeric"].items()},
+        {
+            name: previous["categories"][name][int(codes[row])]
+            for name, codes in previous["codes"].items()
+        },
+        int(previous["skills"][row]),
+        bytes(previous["text"][start:end]),
+    )
+
+
+def build(kind: str, column_dir: Path = COLUMN_DIR) -> Path:
+    """列ファイルを新しいバージョンとして作成し、CURRENT を差し替える"""
+    kind_dir = _kind_dir(kind, column_dir)
+    previous = _reusable(kind, column_dir)
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    version_dir = kind_dir / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+
+    files = data_files(kind)
+    ids = []
+    numeric = {name: [] for name in NUMERIC_COLUMNS}
+    categories = {name: {"": 0} for name in CATEGORICAL_COLUMNS}
+    codes = {name: [] for name in CATEGORICAL_COLUMNS}
+    skills = []
+    text_offsets = [0]
+    record_offsets = [0]
+    reused = 0
+
+    with (
+        open(version_dir / "text.bin", "wb") as text_file,
+        open(version_dir / "records.bin", "wb") as records_file,
+    ):
+        for path in files:
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    line = line.rstrip(b"\r\n")
+                    row = previous["rows"].get(_line_key(line)) if previous else None
+                    if row is None:
+                        rid, values, labels, skill, text = _parse_row(kind, line)
+                    else:
+                        rid, values, labels, skill, text = _copy_row(previous, row)
+                        reused += 1
+
+                    ids.append(rid)
+                    records_file.write(line)
+                    record_offsets.append(record_offsets[-1] + len(line))
+                    for name, value in values.items():
+                        numeric[name].append(value)
+                    for name, label in labels.items():
+                        codes[name].append(
+                            categories[name].setdefault(label, len(categories[name]))
+                        )
+                    skills.append(skill)
+                    text_file.write(text)
+                    text_offsets.append(text_offsets[-1] + len(text))
+
+    width = max((len(rid) for rid in ids), default=1)
+    np.save(version_dir / "ids.npy", np.array(ids, dtype=f"<U{width}"))
+    np.save(
+        version_dir / "record_offsets.npy", np.array(record_offsets, dtype=np.int64)
+    )
+    np.save(version_dir / "text_offsets.npy", np.array(text_offsets, dtype=np.int64))
+    for name, values in numeric.items():
+        np.save(version_dir / f"num_{name}.npy", np.array(values, dtype=np.float32))
+    for name, values in codes.items():
+        np.save(version_dir / f"cat_{name}.npy", np.array(values, dtype=np.int16))
+    np.save(version_dir / "skills.npy", np.array(skills, dtype=np.uint32))
+
+    meta = {
+        "kind": kind,
+        "size": len(ids),
+        "files": [str(p) for p in files],
+        "numeric": list(NUMERIC_COLUMNS),
+        "categories": {name: list(labels) for name, labels in categories.items()},
+        "skill_tags": list(SKILL_BITS),
+        "schema": COLUMNS_VERSION,
+    }
+    (version_dir / "meta.json").write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+
+    # CURRENT をアトミックに差し替えて公開
+    current = kind_dir / "CURRENT"
+    tmp = kind_dir / f"CURRENT.{os.getpid()}"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, current)
+
+    versions = sorted(p for p in kind_dir.iterdir() if p.is_dir())
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+
+    print(
+        f"  🧱 {kind}: {len(ids)}行 × {len(NUMERIC_COLUMNS) + len(codes) + 1}列"
+        f"（変更なしの行 {reused}行は前のバージョンからコピー）"
+    )
+    return version_dir
+
+
+def build_all(column_dir: Path = COLUMN_DIR):
+    for kind in KINDS:
+        build(kind, column_dir)
+
+
+def exists(kind: str, column_dir: Path = COLUMN_DIR) -> bool:
+    return (_kind_dir(kind, column_dir) / "CURRENT").exists()
+
+
+def _load_text(path: Path) -> np.ndarray:
+    # 空ファイルは mmap できない
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _load_records(version_dir: Path):
+    # 旧バージョンの列ファイルにはレコードのコピーがない
+    if not (version_dir / "records.bin").exists():
+        return None
+    return _load_text(version_dir / "records.bin")
+
+
+def attach(kind: str, column_dir: Path = COLUMN_DIR) -> dict:
+    """公開中のバージョンを mmap で読み込む（JSONのパースなし）"""
+    kind_dir = _kind_dir(kind, column_dir)
+    version_dir = kind_dir / (kind_dir / "CURRENT").read_text(encoding="utf-8")
+    meta = json.loads((version_dir / "meta.json").read_text(encoding="utf-8"))
+
+    def load(name):
+        return np.load(version_dir / f"{name}.npy", mmap_mode="r")
+
+    return {
+        "kind": kind,
+        "path": str(version_dir),
+        "size": meta["size"],
+        "files": meta["files"],
+        "ids": load("ids"),
+        "numeric": {name: load(f"num_{name}") for name in meta["numeric"]},
+        "codes": {name: load(f"cat_{name}") for name in meta["categories"]},
+        "categories": meta["categories"],
+        # 旧バージョンの列ファイルにはスキル列がない
+        "skills": load("skills")
+        if meta.get("skill_tags") == list(SKILL_BITS)
+        else None,
+        "text": _load_text(version_dir / "text.bin"),
+        "text_offsets": load("text_offsets"),
+        "schema": meta.get("schema", 0),
+        "records": _load_records(version_dir),
+        "record_offsets": load("record_offsets")
+        if (version_dir / "record_offsets.npy").exists()
+        else None,
+    }
+
+
+def category_mask(table: dict, column: str, labels) -> np.ndarray:
+    """カテゴリ列がラベルのいずれかに一致する行"""
+    if isinstance(labels, str):
+        labels = [labels]
+    names = table["categories"][column]
+    wanted = [names.index(label) for label in labels if label in names]
+    return np.isin(table["codes"][column], wanted)
+
+
+def text_at(table: dict, row: int) -> str:
+    """検索用テキスト（小文字化済み）"""
+    start, end = table["text_offsets"][row], table["text_offsets"][row + 1]
+    return bytes(table["text"][start:end]).decode("utf-8")
+
+
+def record_at(table: dict, row: int) -> dict:
+    """元のレコードを1行だけ読み込む（このバージョンの records.bin から）"""
+    if table["records"] is None:
+        return find_record(table["kind"], str(table["ids"][row]))
+    start, end = table["record_offsets"][row], table["record_offsets"][row + 1]
+    return json.loads(bytes(table["records"][start:end]))
+
+
+def records_at(table: dict, rows) -> list:
+    """元のレコードを複数行読み込む（行の順序を維持）"""
+    return [record_at(table, int(row)) for row in rows]
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="列指向データセット（mmap共有）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="列ファイル作成")
+    info_parser = sub.add_parser("info", help="列の一覧と読み込み時間")
+    info_parser.add_argument("kind", choices=KINDS)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🧱 列ファイル作成中...")
+        build_all()
+        print("✅ 作成完了")
+        return
+
+    if not exists(args.kind):
+        print(f"❌ 列ファイルがありません: {args.kind}")
+        print("   uv run bin/columnar.py build を実行してください")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    table = attach(args.kind)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"📂 {table['path']}")
+    print(f"行数: {table['size']}")
+    for name, values in table["numeric"].items():
+        print(f"  {name}\t数値\t欠損 {int(np.isnan(values).sum())}")
+    for name, labels in table["categories"].items():
+        print(f"  {name}\tカテゴリ\t{len(labels)}値")
+    if table["skills"] is not None:
+        print(f"  skills\tビット集合\t{len(SKILL_BITS)}タグ")
+    print(f"⏱️  attach {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
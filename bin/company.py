@@ -1,6 +1,6 @@
 #!/usr/bin/env -S uv run
 # /// script
-# dependencies = ["python-ulid", "typing-extensions"]
+# dependencies = ["python-ulid", "typing-extensions", "numpy", "scikit-learn"]
 # ///
 """
 Company Search Interface
@@ -10,20 +10,51 @@ Company Search Interface
 Usage:
     uv run company.py "SaaS系スタートアップ" 10
     uv run company.py "週1出社" 20
+    uv run company.py "週1出社" 20 --fresh  # 結果キャッシュを使わずに実行
 """
 
 import os
 import sys
 import subprocess
+from datetime import datetime
 from pathlib import Path
 from ulid import ULID
 
+import columnar
+import facets
+import planner
+import preflight
+import render
+import result_cache
+import synonyms
+import vector_index
+from ranking import rank_records
+from records import write_ndjson
+from scan import keyword_hits
+
+# プロンプトのバージョン（プロンプト・出力形式を変えたら上げる。結果キャッシュのキーに使う）
+PROMPT_VERSION = 1
+
+
+def write_semantic_hits(query: str, chunks_dir: Path, top_k: int) -> int:
+    """意味的に近い企業を chunks/semantic_hits.ndjson に書き出す"""
+    if not vector_index.exists("companies"):
+        return 0
+
+    hits = vector_index.search_records("companies", query, top_k)
+    write_ndjson(
+        ({**record, "_semantic": round(score, 4)} for score, record in hits),
+        chunks_dir / "semantic_hits.ndjson",
+    )
+    print(f"🧭 意味検索: {len(hits)}社")
+    return len(hits)
+
 
 def main():
     """メイン処理"""
     if len(sys.argv) < 2:
         print(
-            "Usage: uv run company.py <SEARCH_QUERY> [COUNT] [--continue <session_id>]"
+            "Usage: uv run company.py <SEARCH_QUERY> [COUNT] [--continue <session_id>] [--dry-run] [--fresh] [--narrate]"
         )
         print('Example: uv run company.py "SaaS系スタートアップ" 10')
         print(
@@ -34,6 +65,21 @@ def main():
     query = sys.argv[1]
     count = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 10
 
+    # 実行計画（語の統計からヒット件数・LLM入力トークン・所要時間を見積もる）
+    plan = None
+    if planner.exists("companies"):
+        plan = planner.plan_search(
+            "companies", query, count, columnar.exists("companies")
+        )
+    if "--dry-run" in sys.argv:
+        if not plan:
+            print(
+                "❌ 語の統計がありません。uv run bin/planner.py build を実行してください"
+            )
+            sys.exit(1)
+        planner.print_plan(plan)
+        sys.exit(0)
+
     project_root = Path(__file__).parent.parent
     workspace_dir = project_root / "workspace"
 
@@ -45,20 +91,94 @@ def main():
             continue_mode = True
             break
 
+    # ヒットしない検索は OpenCode を起動する前に止める（preflight.py）
+    if not continue_mode:
+        message, _ = preflight.check_query("companies", query)
+        if message:
+            print(message)
+            sys.exit(1)
+
     if not ulid:
         ulid = str(ULID())
 
     work_dir = workspace_dir / "output" / ulid
     chunks_dir = work_dir / "chunks"
+
+    # 同じ検索・同じデータ・同じモデルの結果があれば OpenCode を実行せずに返す
+    cache_key = result_cache.cache_key(
+        {
+            "type": "companies",
+            "query": result_cache.normalize_query(query),
+            "count": count,
+            "synonyms": synonyms.dictionary_version(),
+        },
+        PROMPT_VERSION,
+    )
+    if not continue_mode and "--fresh" not in sys.argv:
+        cached = result_cache.lookup(cache_key, work_dir)
+        if cached:
+            created = datetime.fromtimestamp(cached["created_at"]).strftime("%H:%M")
+            print(f"⚡ キャッシュから応答（{created} の結果、--fresh で再実行）")
+            print(f"🆔 Session ULID: {ulid}")
+            sys.exit(0)
+
     chunks_dir.mkdir(parents=True, exist_ok=True)
 
     # workspace ディレクトリに移動
     print(f"📍 Working directory: {workspace_dir}")
     print(f"🔍 Search Query: {query}")
     print(f"📊 Count: {count}社")
+    if plan:
+        print(
+            f"🗺️ 見積もり: 約{plan['estimated_rows']}社 → {planner.PATH_LABELS[plan['path']]}"
+        )
     print(f"🆔 Session ULID: {ulid}")
     print()
 
+    # キーワード一致とファセット絞り込み（件数が多すぎればLLMを使わず選択肢を返す）
+    filtered_path = chunks_dir / "filtered_companies.ndjson"
+    selected = None
+    hits = []
+    if continue_mode:
+        selected, hits = facets.apply_selection("companies", work_dir, filtered_path)
+        if selected and selected["type"] == "show":
+            # 絞り込まずに表示: BM25上位の表示件数だけにする（全件をLLMに渡さない）
+            hits = [r for _, r in rank_records(hits, query, "companies", top_k=count)]
+        if selected:
+            write_ndjson(hits, filtered_path)
+            print(f"🏷️ 絞り込み適用: {selected['text']} → {len(hits)}社")
+    else:
+        hits = keyword_hits("companies", query)
+        print(f"🔎 キーワード一致: {len(hits)}社")
+        # LLMに渡す量がトークン予算を超える場合はBM25上位に絞る
+        cap = planner.budget_rows(planner.load("companies")) if plan else None
+        if cap and len(hits) > cap and len(hits) <= count * planner.CHOICES_RATIO:
+            hits = [r for _, r in rank_records(hits, query, "companies", top_k=cap)]
+            print(f"✂️ トークン予算に合わせて上位{cap}社に絞り込み")
+        write_ndjson(hits, filtered_path)
+
+    if (not continue_mode or (selected and selected["type"] == "filter")) and (
+        facets.propose_choices("companies", query, hits, count, work_dir)
+    ):
+        print("📋 choices.json に絞り込み候補を保存しました（LLM不使用）")
+        sys.exit(0)
+
+    # 表示件数以下ならテンプレートでレポートを作り、OpenCode は起動しない（--narrate でAIの説明文つき）
+    if (
+        hits
+        and len(hits) <= count
+        and (not continue_mode or selected)
+        and "--narrate" not in sys.argv
+    ):
+        n_rendered = render.keyword_report(
+            work_dir, "companies", query, hits, f"企業検索: {query}"
+        )
+        print(
+            f"⚡ キーワード一致が{count}社以下のため、AIを使わずにレポートを作成: {n_rendered}社"
+        )
+        print("🤖 AIの説明文が必要なら --narrate を付けて再実行してください")
+        sys.exit(0)
+
     # OpenCode設定
     opencode_cmd = ["opencode", "run"]
 
@@ -67,42 +187,76 @@ def main():
     opencode_cmd.extend(["--model", opencode_model])
     print(f"🤖 OpenCode Model: {opencode_model}")
 
-    # Salesforce URL を環境変数から取得
-    salesforce_base_url = os.getenv(
-        "SALESFORCE_BASE_URL", "https://your-org.lightning.force.com"
+    # 意味検索（キーワードで拾えない表記揺れの補完用）
+    semantic_count = 0
+    if not continue_mode:
+        semantic_count = write_semantic_hits(query, chunks_dir, count * 5)
+
+    semantic_note = ""
+    if semantic_count:
+        semantic_note = f"""
+補足: output/{ulid}/chunks/semantic_hits.ndjson に意味的に近い企業（上位{semantic_count}社、_semantic=類似度）を用意済み。
+ripgrepで漏れた表記揺れ・類義語（例: SaaS / クラウドサービス / サブスク）の補完に使うこと。
+"""
+
+    # キーワードパターン（類義語辞書で展開。LLMでの生成は不要）
+    patterns = "\n".join(
+        f"- {group[0]}: {synonyms.rg_pattern(group)}"
+        for group in synonyms.expand(query)
     )
+    rg_command = synonyms.rg_command("companies", query)
 
     # OpenCode 実行
-    if continue_mode:
+    if selected:
+        prompt = f"""前の検索結果を続けて処理してください。検索クエリ: {query}, セッションID: {ulid}
+
+1. ユーザーの選択「{selected["text"]}」は適用済みです: output/{ulid}/chunks/filtered_companies.ndjson（{len(hits)}社）
+2. filtered_companies.ndjson から条件に最も合う上位{count}社を選んでレポート作成（result.json）
+"""
+    elif continue_mode:
         prompt = f"""前の検索結果を続けて処理してください。検索クエリ: {query}, セッションID: {ulid}
 
 1. output/{ulid}/choices.json を読んでユーザーの選択を確認
-2. 条件に従って filtered_companies.ndjson をフィルタリング
-3. フィルタリング後が{count}社以下ならレポート作成（companies_summary.md, companies.csv）
+2. 条件に従って output/{ulid}/chunks/filtered_companies.ndjson をフィルタリング
+3. フィルタリング後が{count}社以下ならレポート作成（result.json）
 4. それでも{count * 5}社超なら、再度 choices.json に選択肢を保存して終了
 """
     else:
         prompt = f"""「{query}」に合う企業を検索してください。検索クエリ: {query}, セッションID: {ulid}
 
-Step 1: キーワードパターン生成（類義語・関連語含める）
-Step 2: ripgrepで件数チェック → wc -l
+Step 1: キーワードパターン（類義語辞書 v{synonyms.dictionary_version()} で展開済み。生成は不要）
+{patterns}
+Step 2: ripgrepで件数チェック → 次のコマンドをそのまま使う
+{rg_command}
 Step 3: 件数が{count}社以下ならすぐにレポート作成、{count * 5}社超なら choices.json に選択肢保存して終了
 
 choices.json の形式は：query, total_count, suggestions（id, text, type, pattern/count）, message
 
 詳細手順:
-- Step 1: キーワードパターン生成
-- Step 2: ripgrepで件数チェック
-- Step 3: 件数{count}社以下ならレポート作成（companies_summary.md, companies.csv）、{count * 5}社超ならchoices.json保存して終了
+- Step 1: 展開済みのキーワードパターンを使う（辞書にない表記揺れに気づいた場合のみ、output/{ulid}/patterns.json に {{"query": "{query}", "patterns": ["語|言い換え|..."]}} として保存）
+- Step 2: 上のコマンドで件数チェック
+- Step 3: 件数{count}社以下ならレポート作成（result.json）、{count * 5}社超ならchoices.json保存して終了
 - Step 4: 続きモードならchoices.json読んで条件に従ってフィルタリング
 
 作業ディレクトリは output/{ulid}/ 内のみ。
-"""
 
-    opencode_cmd.append(prompt)
+MCPツール（openmatching）: search(query, kind, filters, k) / get(id, fields) / facets(query, kind) / similar(id) でインデックスから直接引ける（1回最大50件）。
+data/*.ndjson を grep・Read する前にこちらを使うこと。
+
+補足: クエリの全語（類義語辞書の言い換えを含む）を含む企業（{len(hits)}社）を output/{ulid}/chunks/filtered_companies.ndjson に保存済み。件数チェックの出発点に使うこと。
+{semantic_note}"""
+
+    opencode_cmd.append(prompt + "\n" + render.result_prompt("companies", ulid))
 
     result = subprocess.run(opencode_cmd, cwd=workspace_dir, check=False)
 
+    # 評価（result.json）からサマリーと CSV を作成（choices.json で終えた場合は何もしない）
+    n_rendered = render.render(work_dir, "companies", f"企業検索: {query}")
+    if n_rendered >= 0:
+        print(f"📝 レポート作成: {n_rendered}件")
+    if result.returncode == 0 and not continue_mode:
+        result_cache.store(cache_key, work_dir)
+
     sys.exit(result.returncode)
 
 
@@ -1,12 +1,15 @@
 #!/usr/bin/env -S uv run
 # /// script
-# dependencies = ["requests", "simple-salesforce", "pandas", "python-dotenv"]
+# dependencies = ["requests", "simple-salesforce", "pandas", "python-dotenv", "numpy", "scikit-learn"]
 # ///
 """
 Data Download & Conversion Pipeline
 
 Salesforce からCSVをダウンロードし、NDJSON形式に変換して workspace/ に配置する。
 
+取り込み後に検索インデックスを差分更新する。新規・変更された候補者のサマリーは時間がかかるので
+ここでは作らず、取り込みの後に別プロセスで作る（bot.py が起動する。手動: uv run bin/summaries.py run）。
+
 Usage:
     uv run download.py
 """
@@ -23,6 +26,27 @@ from urllib.parse import urlparse
 import pandas as pd
 from dotenv import load_dotenv
 
+import alerts
+import incremental
+import jobs_for
+import result_cache
+import shortlists
+import synonyms
+from records import ACTIVE_STATUSES, COMPANY_PREFIX, STATUS_FIELD
+
+# 求人に結合する企業カラム（カラム名に含まれるキーワード）
+COMPANY_JOIN_KEYWORDS = (
+    "従業員",
+    "資金調達",
+    "ステージ",
+    "上場",
+    "設立",
+    "働き方",
+    "リモート",
+    "ランク",
+    "事業内容",
+)
+
 
 def get_report_ids() -> dict:
     """環境変数からレポートIDを取得"""
@@ -162,23 +186,16 @@ def filter_candidates(
 
     # 初回面談日 OR 選考中フィルタ
     interview_col = "個人ユーザー/企業: 初回面談日時"
-    status_col = "選考ステータス"
+    status_col = STATUS_FIELD
 
     if interview_col in df.columns:
         recent_date = datetime.now() - timedelta(days=recent_interview_days)
         df.loc[:, interview_col] = pd.to_datetime(df[interview_col], errors="coerce")
 
-        active_statuses = [
-            "書類選考中",
-            "一次面接中",
-            "二次面接中",
-            "最終面接中",
-            "オファー面談中",
-        ]
         recent_interview = df[interview_col] >= recent_date
 
         if status_col in df.columns:
-            active_selection = df[status_col].isin(active_statuses)
+            active_selection = df[status_col].isin(ACTIVE_STATUSES)
             before = len(df)
             df = df[recent_interview | active_selection].copy()
             print(
@@ -224,6 +241,52 @@ def filter_jobs(df, job_status="アクティブ"):
     return df
 
 
+def join_company_attributes(jobs_df, companies_df):
+    """求人に企業属性（規模・資金調達・働き方・ランクなど）を結合
+
+    企業ID（なければ企業名）で結合し、「企業: 従業員数」のように接頭辞付きカラムで追加する。
+    """
+    print("🔗 求人に企業属性を結合中...")
+
+    jobs_df.columns = jobs_df.columns.str.strip()
+    companies_df.columns = companies_df.columns.str.strip()
+
+    key = next(
+        (
+            col
+            for col in ("企業ID", "取引先ID", "企業名", "取引先名")
+            if col in jobs_df.columns and col in companies_df.columns
+        ),
+        None,
+    )
+    attr_cols = [
+        col
+        for col in companies_df.columns
+        if col != key and any(k in col for k in COMPANY_JOIN_KEYWORDS)
+    ]
+    if not key or not attr_cols:
+        print("  ⚠️ 結合キーまたは企業属性カラムがありません（スキップ）\n")
+        return jobs_df
+
+    company_attrs = companies_df[[key] + attr_cols].copy()
+    company_attrs["_join_key"] = company_attrs[key].astype(str).str.strip()
+    company_attrs = company_attrs.drop(columns=[key]).drop_duplicates("_join_key")
+    company_attrs = company_attrs.rename(
+        columns={col: f"{COMPANY_PREFIX}{col}" for col in attr_cols}
+    )
+
+    jobs_df = jobs_df.copy()
+    jobs_df["_join_key"] = jobs_df[key].astype(str).str.strip()
+    joined = jobs_df.merge(company_attrs, on="_join_key", how="left").drop(
+        columns=["_join_key"]
+    )
+
+    matched = joined[f"{COMPANY_PREFIX}{attr_cols[0]}"].notna().sum()
+    print(f"  結合キー: {key} / 結合カラム: {', '.join(attr_cols)}")
+    print(f"✅ 結合完了: {matched}/{len(joined)}件\n")
+    return joined
+
+
 def to_ndjson(df, output_path):
     """DataFrameをNDJSON形式で保存"""
     print(f"💾 NDJSON保存中: {output_path}")
@@ -322,6 +385,55 @@ def split_and_save_ndjson(
     print(f"✅ 分割完了\n")
 
 
+def derived_step(label: str, step) -> bool:
+    """取り込み後の派生処理を1つ実行する（失敗しても警告だけ出して続ける）
+
+    インデックスや新着マッチは次回の取り込みで差分から作り直せるので、
+    ここで失敗してもダウンロード済みのデータは取り込み成功として扱う。
+    """
+    try:
+        step()
+        return True
+    except Exception as e:
+        print(f"⚠️ {label}に失敗しました（取り込みは完了しています）: {e}")
+        import traceback
+
+        traceback.print_exc()
+        return False
+
+
+def build_indexes() -> list:
+    """取り込み済みデータとの差分で検索インデックスを更新（初回は全件作成）
+
+    Returns: 失敗した処理の名前（前の処理に依存して実行しなかったものを含む）
+    """
+    print("🧭 検索インデックス更新中...")
+    failed = []
+    if not derived_step("検索インデックス更新", incremental.refresh):
+        # スナップショットと各インデックスが揃っていないので、それを読む処理は飛ばす
+        failed += ["検索インデックス更新", "求人の特徴量", "上位候補者"]
+    # 候補者→求人の逆引き（jobs_for.py）に使う求人の特徴量（変更された求人の分だけ）。
+    # 求人ベクトルと関連度の順位の基準は計算済み候補者リスト・新着マッチでも使う
+    elif not derived_step("求人の特徴量", jobs_for.refresh):
+        failed += ["求人の特徴量", "上位候補者"]
+    # 求人ごとの上位候補者を計算し直す（変更された求人・候補者の分だけ）
+    elif not derived_step(
+        "上位候補者", lambda: shortlists.refresh(features=jobs_for.load())
+    ):
+        failed.append("上位候補者")
+    # 取り込み前のデータで作ったマッチング・検索結果は使わない
+    if not derived_step("結果キャッシュの削除", result_cache.prune):
+        failed.append("結果キャッシュの削除")
+    # 過去のセッションで LLM が作った検索パターンから類義語を学習
+    if not derived_step("類義語の学習", synonyms.learn):
+        failed.append("類義語の学習")
+    if failed:
+        print(f"⚠️ インデックス更新で失敗した処理: {', '.join(failed)}\n")
+    else:
+        print("✅ インデックス更新完了\n")
+    return failed
+
+
 def main():
     """メイン処理"""
     project_root = Path(__file__).parent.parent
@@ -411,16 +523,7 @@ def main():
         candidates_df, data_dir, "candidates", ["個人ユーザー/企業: 登録時ランク"]
     )
 
-    # 求人処理
-    jobs_csv = tmp_dir / "求人票.csv"
-    print("📖 求人RAWデータを読み込み中...")
-    jobs_df = pd.read_csv(jobs_csv, encoding="utf-8-sig")
-    jobs_df = filter_jobs(jobs_df, job_status=job_status)
-    split_and_save_ndjson(
-        jobs_df, data_dir, "jobs", ["業種", "企業ランク"], has_industry=True
-    )
-
-    # 企業処理（フィルタリングなし）
+    # 企業処理（フィルタリングなし。求人への結合に使うため先に読み込む）
     companies_csv = tmp_dir / "企業.csv"
     print("📖 企業RAWデータを読み込み中...")
     companies_df = pd.read_csv(companies_csv, encoding="utf-8-sig")
@@ -435,8 +538,42 @@ def main():
         has_industry=True,
     )
 
+    # 求人処理
+    jobs_csv = tmp_dir / "求人票.csv"
+    print("📖 求人RAWデータを読み込み中...")
+    jobs_df = pd.read_csv(jobs_csv, encoding="utf-8-sig")
+    jobs_df = filter_jobs(jobs_df, job_status=job_status)
+    jobs_df = join_company_attributes(jobs_df, companies_df)
+    split_and_save_ndjson(
+        jobs_df, data_dir, "jobs", ["業種", "企業ランク"], has_industry=True
+    )
+
+    # Step 4: 検索インデックス更新（差分）
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print("🗂️ Step 4: 検索インデックス更新")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print()
+    failed = build_indexes()
+
+    # Step 5: 新着マッチ（追加・変更された候補者 × 全求人。bot.py が SLACK_CH に投稿）
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-    print("✅ 全て完了！")
+    print("🆕 Step 5: 新着マッチ")
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    print()
+    if "上位候補者" in failed:
+        # 求人の特徴量・上位候補者の基準が古いままなので次回に回す
+        print("⏭️ インデックス更新に失敗したため新着マッチは次回に回します")
+        failed.append("新着マッチ")
+    elif not derived_step("新着マッチ", alerts.run):
+        failed.append("新着マッチ")
+    print()
+
+    print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+    if failed:
+        # データの取り込みは済んでいるので終了コードは成功のまま
+        print(f"⚠️ 取り込みは完了しました（失敗した処理: {', '.join(failed)}）")
+    else:
+        print("✅ 全て完了！")
     print("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
 
 
@@ -0,0 +1,459 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Facet Index
+
+業種・ランク・勤務地・働き方・年収帯・スキルタグ・資金調達ステージ・従業員規模ごとに
+ビットマップを作り、任意のヒット集合に対する絞り込み候補と件数をミリ秒で計算する。
+検索結果が多すぎる場合の choices.json を LLM なしで作成するために使う。
+ビットマップは workspace/index/facets/<kind>/ にセグメント単位で保存し、
+変更レコードだけを差分セグメントとして追記する（segments.py）。
+
+Usage:
+    uv run bin/facets.py build
+    uv run bin/facets.py compact
+    uv run bin/facets.py counts jobs "Python"
+"""
+
+import json
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import segments
+from records import (
+    INDEX_DIR,
+    KINDS,
+    iter_records,
+    keyword_hits,
+    employee_band,
+    record_id,
+    record_industry,
+    record_locations,
+    record_rank,
+    record_remote,
+    record_salary,
+    record_skills,
+    record_stage,
+    salary_band,
+)
+
+FACET_DIR = INDEX_DIR / "facets"
+
+FACET_LABELS = {
+    "industry": "業種",
+    "rank": "ランク",
+    "location": "勤務地",
+    "remote": "働き方",
+    "salary": "年収帯",
+    "skill": "スキル",
+    "stage": "資金調達",
+    "size": "従業員規模",
+}
+
+KIND_UNITS = {"candidates": "名", "jobs": "件", "companies": "社"}
+KIND_LABELS = {"candidates": "候補者", "jobs": "求人", "companies": "企業"}
+
+# 1ファセットあたりの提案数上限
+MAX_PER_FACET = 2
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def record_facets(record: dict, kind: str) -> dict:
+    """レコードのファセット値 {facet: [value, ...]}"""
+    values = {
+        "industry": [record_industry(record)],
+        "rank": [record_rank(record, kind)],
+        "location": record_locations(record),
+        "skill": record_skills(record),
+    }
+    remote = record_remote(record)
+    if remote:
+        values["remote"] = [remote]
+    band = salary_band(record_salary(record))
+    if band:
+        values["salary"] = [band]
+    # 企業属性（求人は download.py で結合した「企業: 」カラムから）
+    if kind != "candidates":
+        stage = record_stage(record)
+        if stage:
+            values["stage"] = [stage]
+        size = employee_band(record)
+        if size:
+            values["size"] = [size]
+    return values
+
+
+def _kind_dir(kind: str, facet_dir: Path = FACET_DIR) -> Path:
+    return facet_dir / kind
+
+
+def _write_segment(kind_dir: Path, segment: str, kind: str, records) -> list:
+    """ファセットビットマップを1セグメント分作成して保存
+
+    Returns: セグメント内のID一覧（行順）
+    """
+    ids = []
+    positions = defaultdict(list)
+    for position, record in enumerate(records):
+        ids.append(record_id(record, kind))
+        for facet, values in record_facets(record, kind).items():
+            for value in values:
+                positions[(facet, value)].append(position)
+
+    keys = sorted(positions)
+    n_docs = len(ids)
+    bitmaps = np.zeros((len(keys), (n_docs + 7) // 8), dtype=np.uint8)
+    for row, key in enumerate(keys):
+        bits = np.zeros(n_docs, dtype=bool)
+        bits[positions[key]] = True
+        bitmaps[row] = np.packbits(bits)
+
+    np.save(segments.segment_path(kind_dir, segment, ".npy"), bitmaps)
+    meta = {"size": n_docs, "ids": ids, "values": [list(k) for k in keys]}
+    segments.segment_path(kind_dir, segment, ".json").write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+    return ids
+
+
+def _read_segment(kind_dir: Path, segment: str) -> dict:
+    meta = json.loads(
+        segments.segment_path(kind_dir, segment, ".json").read_text(encoding="utf-8")
+    )
+    positions = defaultdict(list)
+    for position, rid in enumerate(meta["ids"]):
+        positions[rid].append(position)
+    return {
+        "size": meta["size"],
+        "ids": meta["ids"],
+        "positions": positions,
+        "values": [tuple(v) for v in meta["values"]],
+        "rows": {tuple(v): i for i, v in enumerate(meta["values"])},
+        "bitmaps": np.load(
+            segments.segment_path(kind_dir, segment, ".npy"), mmap_mode="r"
+        ),
+    }
+
+
+def build(kind: str, records, facet_dir: Path = FACET_DIR) -> int:
+    """ファセットビットマップを作成して保存（既存セグメントは破棄）"""
+    kind_dir = _kind_dir(kind, facet_dir)
+    kind_dir.mkdir(parents=True, exist_ok=True)
+    manifest = segments.reset(kind_dir)
+    segment = segments.next_segment(manifest)
+    ids = _write_segment(kind_dir, segment, kind, records)
+    segments.add_segment(manifest, segment, ids)
+    segments.save_manifest(kind_dir, manifest)
+
+    print(f"  🏷️ {kind}: {len(ids)}件")
+    return len(ids)
+
+
+def build_all(facet_dir: Path = FACET_DIR):
+    """全種別のファセットインデックスを作成"""
+    for kind in KINDS:
+        build(kind, iter_records(kind), facet_dir)
+
+
+def apply_delta(kind: str, records, deleted_ids=(), facet_dir: Path = FACET_DIR):
+    """変更レコードのビットマップを差分セグメントとして追記する"""
+    kind_dir = _kind_dir(kind, facet_dir)
+    manifest = segments.load_manifest(kind_dir)
+    records = list(records)
+    segment = segments.next_segment(manifest)
+    ids = _write_segment(kind_dir, segment, kind, records) if records else []
+    segments.add_segment(manifest, segment, ids, deleted_ids)
+    segments.save_manifest(kind_dir, manifest)
+    return manifest
+
+
+def compact(kind: str, force: bool = False, facet_dir: Path = FACET_DIR) -> bool:
+    """墓標を除いた有効行を1セグメントにまとめる
+
+    ファセット値の行を揃えてビット列を連結するだけなので、レコードの再読込は不要。
+    Returns: コンパクションしたかどうか
+    """
+    kind_dir = _kind_dir(kind, facet_dir)
+    manifest = segments.load_manifest(kind_dir)
+    if not manifest["segments"]:
+        return False
+    if not (force or segments.needs_compaction(manifest)):
+        return False
+
+    parts = []
+    live_ids = []
+    keys = set()
+    for segment in manifest["segments"]:
+        seg = _read_segment(kind_dir, segment)
+        mask = segments.live_mask(manifest, segment, seg["ids"])
+        parts.append((seg, mask))
+        live_ids.extend(rid for rid, live in zip(seg["ids"], mask) if live)
+        keys.update(seg["values"])
+
+    keys = sorted(keys)
+    rows = {key: i for i, key in enumerate(keys)}
+    bits = np.zeros((len(keys), len(live_ids)), dtype=bool)
+    offset = 0
+    for seg, mask in parts:
+        n_live = int(mask.sum())
+        if n_live:
+            unpacked = np.unpackbits(seg["bitmaps"], axis=1, count=seg["size"])
+            for key, row in seg["rows"].items():
+                bits[rows[key], offset : offset + n_live] = unpacked[row][mask]
+        offset += n_live
+
+    segment = segments.next_segment(manifest)
+    np.save(segments.segment_path(kind_dir, segment, ".npy"), np.packbits(bits, axis=1))
+    meta = {"size": len(live_ids), "ids": live_ids, "values": [list(k) for k in keys]}
+    segments.segment_path(kind_dir, segment, ".json").write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+    segments.replace_all(kind_dir, manifest, segment, live_ids)
+    segments.save_manifest(kind_dir, manifest)
+    print(f"  🧹 {kind}: ファセット {len(live_ids)}件に圧縮")
+    return True
+
+
+def exists(kind: str, facet_dir: Path = FACET_DIR) -> bool:
+    return segments.manifest_path(_kind_dir(kind, facet_dir)).exists()
+
+
+def load(kind: str, facet_dir: Path = FACET_DIR) -> dict:
+    """インデックスを読み込む（ビットマップはmmapで読み込み）"""
+    kind_dir = _kind_dir(kind, facet_dir)
+    manifest = segments.load_manifest(kind_dir)
+    loaded = []
+    for segment in manifest["segments"]:
+        seg = _read_segment(kind_dir, segment)
+        seg["live"] = segments.live_mask(manifest, segment, seg["ids"])
+        loaded.append(seg)
+    return {"kind": kind, "segments": loaded}
+
+
+def hit_bitmap(segment: dict, ids) -> np.ndarray:
+    """ID集合をセグメント内のビットマップに変換（墓標の行は除く）"""
+    bits = np.zeros(segment["size"], dtype=bool)
+    for rid in ids:
+        bits[segment["positions"].get(rid, [])] = True
+    return np.packbits(bits & segment["live"])
+
+
+def counts(index: dict, ids) -> dict:
+    """ID集合に対する全ファセット値の件数 {(facet, value): ID数}
+
+    同じIDの行が複数ある（候補者の選考ごとの行など）ときは、いずれかの行が
+    その値を持てば1件と数える（filter_ids と同じ基準）。
+    """
+    ids = set(ids)
+    totals = defaultdict(int)
+    for seg in index["segments"]:
+        # 1行だけのIDはビットマップの popcount、複数行のIDは行のORをとって数える
+        single, multi, sizes = [], [], []
+        for rid in ids:
+            rows = [p for p in seg["positions"].get(rid, []) if seg["live"][p]]
+            if len(rows) == 1:
+                single.append(rid)
+            elif rows:
+                multi.extend(rows)
+                sizes.append(len(rows))
+        if not single and not multi:
+            continue
+        found = np.zeros(len(seg["values"]), dtype=np.int64)
+        if single:
+            matrix = np.bitwise_and(seg["bitmaps"], hit_bitmap(seg, single))
+            found += _POPCOUNT[matrix].sum(axis=1, dtype=np.int64)
+        if multi:
+            rows = np.asarray(multi)
+            bits = (seg["bitmaps"][:, rows // 8] >> (7 - rows % 8)) & 1
+            starts = np.cumsum([0, *sizes[:-1]])
+            found += np.maximum.reduceat(bits, starts, axis=1).sum(
+                axis=1, dtype=np.int64
+            )
+        for key, c in zip(seg["values"], found):
+            if c > 0:
+                totals[key] += int(c)
+    return dict(totals)
+
+
+def filter_ids(index: dict, ids, facet: str, value: str) -> list:
+    """ID一覧のうち、ファセット値を持つものだけを返す（順序維持）"""
+    matched = set()
+    for seg in index["segments"]:
+        row = seg["rows"].get((facet, value))
+        if row is None:
+            continue
+        bits = np.unpackbits(seg["bitmaps"][row], count=seg["size"]).astype(bool)
+        bits &= seg["live"]
+        matched.update(rid for rid, hit in zip(seg["ids"], bits) if hit)
+    return [rid for rid in ids if rid in matched]
+
+
+def suggest(index: dict, ids, count: int, max_suggestions: int = 5) -> list:
+    """絞り込み候補を作る
+
+    絞り込み後の件数が表示件数（count）〜その数倍に収まる値を優先する。
+    """
+    ids = list(dict.fromkeys(ids))
+    total = len(ids)
+    facet_counts = counts(index, ids)
+    target = max(count * 2, 1)
+
+    candidates = []
+    for (facet, value), c in facet_counts.items():
+        if c >= total or value in ("other", "UNKNOWN"):
+            continue
+        candidates.append((abs(math.log(c / target)), facet, value, c))
+    candidates.sort()
+
+    unit = KIND_UNITS[index["kind"]]
+    suggestions = []
+    per_facet = defaultdict(int)
+    for _, facet, value, c in candidates:
+        if per_facet[facet] >= MAX_PER_FACET:
+            continue
+        per_facet[facet] += 1
+        suggestions.append(
+            {
+                "id": len(suggestions) + 1,
+                "text": f"{FACET_LABELS[facet]}: {value}（{c}{unit}）",
+                "type": "filter",
+                "facet": facet,
+                "value": value,
+                "pattern": value,
+                "count": c,
+            }
+        )
+        if len(suggestions) >= max_suggestions:
+            break
+
+    suggestions.append(
+        {
+            "id": len(suggestions) + 1,
+            "text": f"絞り込まずに上位{count}{unit}を表示",
+            "type": "show",
+            "count": count,
+        }
+    )
+    return suggestions
+
+
+def write_choices(path: Path, query: str, kind: str, ids, suggestions: list):
+    """choices.json を保存"""
+    total = len(dict.fromkeys(ids))
+    unit = KIND_UNITS[kind]
+    data = {
+        "query": query,
+        "kind": kind,
+        "total_count": total,
+        "suggestions": suggestions,
+        "message": (
+            f"「{query}」に該当する{KIND_LABELS[kind]}が{total}{unit}見つかりました。"
+            f"条件を絞り込みますか？"
+        ),
+    }
+    Path(path).write_text(
+        json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return data
+
+
+def propose_choices(kind: str, query: str, hits: list, count: int, work_dir: Path):
+    """ヒットが表示件数の5倍を超える場合に choices.json を作成する
+
+    Returns: 作成した choices.json の内容（作成しなかった場合は None）
+    """
+    ids = list(dict.fromkeys(record_id(r, kind) for r in hits))
+    if len(ids) <= count * 5 or not exists(kind):
+        return None
+
+    index = load(kind)
+    suggestions = suggest(index, ids, count)
+    return write_choices(Path(work_dir) / "choices.json", query, kind, ids, suggestions)
+
+
+def apply_selection(kind: str, work_dir: Path, filtered_path: Path):
+    """choices.json で選ばれた絞り込みを filtered_*.ndjson に適用する
+
+    Returns: (選択された提案, 絞り込み後のレコード)。選択がなければ (None, None)
+    """
+    choices_file = Path(work_dir) / "choices.json"
+    if not choices_file.exists() or not Path(filtered_path).exists():
+        return None, None
+
+    choices = json.loads(choices_file.read_text(encoding="utf-8"))
+    selected_id = choices.get("selected")
+    selected = next(
+        (s for s in choices.get("suggestions", []) if s["id"] == selected_id), None
+    )
+    if not selected:
+        return None, None
+
+    with open(filtered_path, "r", encoding="utf-8") as f:
+        hits = [json.loads(line) for line in f if line.strip()]
+
+    if selected["type"] == "filter" and "facet" in selected and exists(kind):
+        index = load(kind)
+        ids = [record_id(r, kind) for r in hits]
+        keep = set(filter_ids(index, ids, selected["facet"], selected["value"]))
+        hits = [r for r in hits if record_id(r, kind) in keep]
+
+    return selected, hits
+
+
+def main():
+    """メイン処理"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="ファセットインデックス")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="インデックス作成")
+    sub.add_parser("compact", help="差分セグメントを1つにまとめる")
+
+    counts_parser = sub.add_parser("counts", help="キーワード一致集合のファセット件数")
+    counts_parser.add_argument("kind", choices=KINDS)
+    counts_parser.add_argument("query", help="検索クエリ")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🏷️ ファセットインデックス作成中...")
+        build_all()
+        print("✅ 作成完了")
+        return
+
+    if args.command == "compact":
+        for kind in KINDS:
+            if exists(kind):
+                compact(kind, force=True)
+        print("✅ 圧縮完了")
+        return
+
+    if not exists(args.kind):
+        print(f"❌ インデックスがありません: {args.kind}")
+        print("   uv run bin/facets.py build を実行してください")
+        sys.exit(1)
+
+    ids = [record_id(r, args.kind) for r in keyword_hits(args.kind, args.query)]
+    index = load(args.kind)
+
+    start = time.time()
+    result = counts(index, ids)
+    elapsed_ms = (time.time() - start) * 1000
+
+    print(f"ヒット: {len(ids)}件")
+    for (facet, value), c in sorted(result.items(), key=lambda x: (x[0][0], -x[1])):
+        print(f"  {FACET_LABELS[facet]}: {value}\t{c}")
+    print(f"⏱️  {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Job–Candidate Fit Scorer
+
+求人に対する全候補者の適合度を、列ファイル（columnar.py）の配列演算1回で計算する。
+スキル・年収・勤務地・働き方・更新日・検索の関連度をそれぞれ 0〜1 で採点し、重み付きで合計する。
+candidate.py はこの上位（LLM_CANDIDATES 件）だけを内訳つきで LLM に渡し、
+LLM は説明文の作成と最終的なランク付けだけを行う。
+
+Usage:
+    uv run bin/fit.py J-0000023845
+    uv run bin/fit.py J-0000023845 --top 50
+"""
+
+import sys
+import time
+
+import numpy as np
+
+import columnar
+from records import (
+    find_record,
+    record_locations,
+    record_remote,
+    record_salary,
+    record_skills,
+)
+
+# LLMに渡す候補者数
+LLM_CANDIDATES = 40
+
+# 内訳ごとの重み（合計1）
+FIT_WEIGHTS = {
+    "relevance": 0.3,  # BM25・意味検索の順位
+    "skill": 0.25,  # 求人のスキルタグの充足率
+    "salary": 0.15,  # 希望年収が求人の上限に収まるか
+    "location": 0.1,  # 希望勤務地と求人の勤務地
+    "remote": 0.1,  # 希望の働き方と求人の働き方
+    "recency": 0.1,  # 最終更新日の新しさ
+}
+
+# 検索の関連度に点数をつける順位の範囲（candidate.py の MAX_CANDIDATES と同じ）
+RELEVANCE_POOL = 500
+
+# 情報がなくて判定できない項目の点数
+UNKNOWN_SCORE = 0.5
+
+# 希望年収が求人の上限をこの割合超えたら 0 点
+SALARY_TOLERANCE = 0.3
+
+# 更新日の半減期（日数）
+RECENCY_HALF_LIFE_DAYS = 90
+
+# 候補者の希望の働き方 → 求人の働き方ごとの点数
+REMOTE_FIT = {
+    "フルリモート": {"フルリモート": 1.0, "リモート併用": 0.5, "出社": 0.0},
+    "リモート併用": {"フルリモート": 1.0, "リモート併用": 1.0, "出社": 0.3},
+    "出社": {"フルリモート": 0.8, "リモート併用": 1.0, "出社": 1.0},
+}
+
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    bits = bits.astype(np.uint32)
+    return _POPCOUNT16[bits & 0xFFFF] + _POPCOUNT16[bits >> 16]
+
+
+def job_profile(job: dict) -> dict:
+    """求人から採点に使う条件を取り出す"""
+    return {
+        "skills": record_skills(job),
+        "salary": record_salary(job),
+        "locations": record_locations(job),
+        "remote": record_remote(job),
+    }
+
+
+def _codes(table: dict, column: str, labels) -> np.ndarray:
+    names = table["categories"][column]
+    return np.array(
+        [names.index(label) for label in labels if label in names], dtype=int
+    )
+
+
+def skill_bits(masks) -> np.ndarray:
+    """スキルタグのビットマスク → (件数 × タグ数) の 0/1 行列"""
+    masks = np.asarray(masks, dtype=np.uint32)
+    shifts = np.arange(len(columnar.SKILL_BITS), dtype=np.uint32)
+    return ((masks[:, None] >> shifts) & 1).astype(np.float64)
+
+
+def score_many(
+    table: dict, profiles: list, rows=None, relevance: np.ndarray = None, now=None
+):
+    """複数の求人 × 行の適合度をまとめて計算する
+
+    求人ごとの条件を (求人 × タグ・カテゴリ) の行列にして、行の特徴量との積・参照で一括に採点する。
+    rows: 採点する行番号（省略時は全行）
+    relevance: (求人数 × 行数) の検索の関連度（省略時は0）
+    Returns: (合計点, {内訳名: 点数の配列}) の配列はいずれも (求人数 × 行数)
+    """
+    rows = np.arange(table["size"]) if rows is None else np.asarray(rows, dtype=int)
+    shape = (len(profiles), len(rows))
+    now = now or np.datetime64("today", "D")
+    breakdown = {}
+
+    # スキル: 求人のスキルタグのうち候補者が持つ割合（タグの 0/1 行列の積）
+    wanted = np.array(
+        [columnar.skill_mask(p["skills"]) for p in profiles], dtype=np.uint32
+    )
+    if table["skills"] is not None:
+        have = skill_bits(wanted) @ skill_bits(np.asarray(table["skills"])[rows]).T
+        n_wanted = np.maximum(_popcount(wanted), 1)[:, None]
+        breakdown["skill"] = np.where(
+            (wanted > 0)[:, None], have / n_wanted, UNKNOWN_SCORE
+        )
+    else:
+        breakdown["skill"] = np.full(shape, UNKNOWN_SCORE)
+
+    # 年収: 希望年収が上限以下なら満点、上限を超えた分だけ減点
+    # （旧バージョンの列ファイルには希望年収の列がないので、判定できない扱いにする）
+    if "desired_salary" in table["numeric"]:
+        desired = np.asarray(table["numeric"]["desired_salary"], dtype=np.float64)[rows]
+    else:
+        desired = np.full(len(rows), np.nan)
+    high = np.array(
+        [p["salary"][1] if p["salary"] else np.nan for p in profiles], dtype=np.float64
+    )[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        over = np.clip((desired - high) / (high * SALARY_TOLERANCE), 0, 1)
+    breakdown["salary"] = np.where(
+        np.isnan(high) | np.isnan(desired), UNKNOWN_SCORE, 1 - over
+    )
+
+    # 勤務地: フルリモート求人はどこでも可、それ以外は都道府県の一致（求人 × 都道府県の表）
+    location_fit = np.full(
+        (len(profiles), len(table["categories"]["location"])), UNKNOWN_SCORE
+    )
+    for i, profile in enumerate(profiles):
+        if profile["remote"] == "フルリモート":
+            location_fit[i] = 1.0
+        elif profile["locations"]:
+            location_fit[i, 1:] = 0.0
+            location_fit[i, _codes(table, "location", profile["locations"])] = 1.0
+            location_fit[i, 0] = UNKNOWN_SCORE
+    breakdown["location"] = location_fit[
+        :, np.asarray(table["codes"]["location"])[rows]
+    ]
+
+    # 働き方: 候補者の希望 × 求人の働き方の表で採点
+    remote_fit = np.full(
+        (len(profiles), len(table["categories"]["remote"])), UNKNOWN_SCORE
+    )
+    for i, profile in enumerate(profiles):
+        if profile["remote"]:
+            for label, fits in REMOTE_FIT.items():
+                remote_fit[i, _codes(table, "remote", [label])] = fits[
+                    profile["remote"]
+                ]
+    breakdown["remote"] = remote_fit[:, np.asarray(table["codes"]["remote"])[rows]]
+
+    # 更新日: 半減期で減衰（不明は0点）。求人によらない
+    updated = np.asarray(table["numeric"]["updated_days"], dtype=np.float64)[rows]
+    today = float((now - np.datetime64("1970-01-01", "D")).astype(int))
+    age = np.clip(today - updated, 0, None)
+    recency = np.where(np.isnan(updated), 0.0, 0.5 ** (age / RECENCY_HALF_LIFE_DAYS))
+    breakdown["recency"] = np.broadcast_to(recency, shape)
+
+    breakdown["relevance"] = (
+        np.zeros(shape) if relevance is None else np.asarray(relevance)
+    )
+
+    total = sum(FIT_WEIGHTS[name] * values for name, values in breakdown.items())
+    return total, breakdown
+
+
+def score(table: dict, profile: dict, relevance: np.ndarray = None, now=None):
+    """全行の適合度を計算する
+
+    Returns: (合計点, {内訳名: 点数の配列})
+    """
+    if relevance is not None:
+        relevance = np.asarray(relevance)[None, :]
+    total, breakdown = score_many(table, [profile], None, relevance, now)
+    return total[0], {name: values[0] for name, values in breakdown.items()}
+
+
+def id_relevance(table: dict, ids, values) -> np.ndarray:
+    """候補者IDごとの関連度を行ごとの配列にする（同じ候補者の行は同じ値、ほかの行は0）"""
+    relevance = np.zeros(table["size"])
+    if len(ids) == 0:
+        return relevance
+    table_ids = np.asarray(table["ids"])
+    order = np.argsort(table_ids, kind="stable")
+    sorted_ids = table_ids[order]
+    wanted = np.asarray(ids, dtype=sorted_ids.dtype)
+    left = np.searchsorted(sorted_ids, wanted, side="left")
+    right = np.searchsorted(sorted_ids, wanted, side="right")
+    for start, end, value in zip(left, right, values):
+        relevance[order[start:end]] = value
+    return relevance
+
+
+def rank_points(n: int) -> np.ndarray:
+    """検索の順位（先頭ほど高い）ごとの 0〜1 の点数（RELEVANCE_POOL 位以降は0）
+
+    件数によらず同じ順位は同じ点数にする（学習時と採点時で関連度の尺度をそろえる）。
+    """
+    return np.maximum(0.0, 1.0 - np.arange(n) / RELEVANCE_POOL)
+
+
+def rank_relevance(table: dict, ranked_ids) -> np.ndarray:
+    """事前フィルタの順位（先頭ほど高い）を行ごとの 0〜1 の点数にする"""
+    return id_relevance(table, ranked_ids, rank_points(len(ranked_ids)))
+
+
+def similarity_top(similarity: np.ndarray, k: int = RELEVANCE_POOL) -> tuple:
+    """求人ごとの類似度の上位K件（列番号, 類似度。降順）
+
+    similarity: (求人数 × 候補者数) の意味検索の類似度（-inf は候補者なしとして扱う）
+    """
+    k = min(k, similarity.shape[1])
+    if k == 0:
+        empty = (len(similarity), 0)
+        return np.zeros(empty, dtype=np.int64), np.zeros(empty, dtype=similarity.dtype)
+    top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(similarity, top, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(
+        values, order, axis=1
+    )
+
+
+def similarity_relevance(similarity: np.ndarray, cutoffs) -> np.ndarray:
+    """意味検索の類似度を、求人ごとの全候補者の中での順位の点数（rank_points）にする
+
+    similarity: (求人数 × 行数), cutoffs: 求人ごとの全候補者の上位の類似度（降順。-inf は空き）
+    """
+    points = rank_points(RELEVANCE_POOL)
+    relevance = np.zeros(similarity.shape)
+    for j in range(len(similarity)):
+        top = cutoffs[j][np.isfinite(cutoffs[j])]
+        # 自分より類似度の高い候補者の数が順位
+        rank = np.searchsorted(-top, -similarity[j], side="left")
+        inside = rank < min(len(top), RELEVANCE_POOL)
+        relevance[j, inside] = points[rank[inside]]
+    return relevance
+
+
+def weighted(parts: dict) -> float:
+    """内訳から合計点を計算する"""
+    return round(sum(FIT_WEIGHTS[name] * value for name, value in parts.items()), 4)
+
+
+def top_candidates(
+    table: dict, profile: dict, k: int, relevance=None, exclude=(), rescore=None
+) -> list:
+    """適合度の上位K名 [(行番号, 合計点, 内訳), ...]（同じ候補者の行は最高点の1行）
+
+    rescore: (table, profile, relevance) → 全行の点数。指定すれば合計点の代わりに使う（ltr.py）
+    """
+    total, breakdown = score(table, profile, relevance)
+    if rescore is not None:
+        total = rescore(table, profile, relevance)
+    if exclude:
+        total = np.where(np.isin(table["ids"], list(exclude)), -np.inf, total)
+
+    results = []
+    seen = set()
+    for row in np.argsort(-total, kind="stable"):
+        if not np.isfinite(total[row]) or len(results) >= k:
+            break
+        rid = str(table["ids"][row])
+        if rid in seen:
+            continue
+        seen.add(rid)
+        parts = {name: round(float(v[row]), 3) for name, v in breakdown.items()}
+        results.append((int(row), round(float(total[row]), 4), parts))
+    return results
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="求人×候補者の適合度")
+    parser.add_argument("job_id", help="求人ID")
+    parser.add_argument("--top", type=int, default=20, help="表示件数")
+    args = parser.parse_args()
+
+    if not columnar.exists("candidates"):
+        print("❌ 列ファイルがありません: candidates")
+        print("   uv run bin/columnar.py build を実行してください")
+        sys.exit(1)
+
+    job = find_record("jobs", args.job_id)
+    if job is None:
+        print(f"❌ 求人が見つかりません: {args.job_id}")
+        sys.exit(1)
+
+    table = columnar.attach("candidates")
+    profile = job_profile(job)
+    start = time.perf_counter()
+    results = top_candidates(table, profile, args.top)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(f"求人条件: {profile}")
+    for row, total, parts in results:
+        detail = " ".join(f"{name}={value}" for name, value in parts.items())
+        print(f"{table['ids'][row]}\t{total}\t{detail}")
+    print(f"⏱️  {table['size']}行 / {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
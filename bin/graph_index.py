@@ -0,0 +1,320 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Company / Job / Candidate Graph
+
+企業 → 求人、求人 → 候補者（選考ステータスの行）、企業 → 候補者 の関係を
+CSR（圧縮隣接リスト）形式で保存し、「企業Xで選考中の候補者」「企業Yの求人」を
+配列のスライスだけで引けるようにする。
+インデックスは download.py の取り込み時に workspace/index/graph/ に作成する。
+
+Usage:
+    uv run bin/graph_index.py build
+    uv run bin/graph_index.py jobs 001C000009
+    uv run bin/graph_index.py in-process 株式会社サンプル9
+    uv run bin/graph_index.py applicants J-0000023845 --active
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from records import (
+    ACTIVE_STATUSES,
+    COMPANY_ID_FIELDS,
+    COMPANY_NAME_FIELDS,
+    INDEX_DIR,
+    JOB_ID_RE,
+    STATUS_FIELD,
+    iter_records,
+    record_id,
+)
+
+GRAPH_DIR = INDEX_DIR / "graph"
+
+# 関係名 → (元の種別, 先の種別)
+RELATIONS = {
+    "company_jobs": ("companies", "jobs"),
+    "job_company": ("jobs", "companies"),
+    "job_candidates": ("jobs", "candidates"),
+    "candidate_jobs": ("candidates", "jobs"),
+    "company_candidates": ("companies", "candidates"),
+    "candidate_companies": ("candidates", "companies"),
+}
+
+
+def _first(record: dict, fields) -> str:
+    for field in fields:
+        value = record.get(field)
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def record_job_ids(record: dict) -> list:
+    """候補者の行が参照する求人ID"""
+    found = []
+    for value in record.values():
+        if isinstance(value, str):
+            found.extend(JOB_ID_RE.findall(value))
+    return list(dict.fromkeys(found))
+
+
+def relation_key(record: dict, kind: str) -> list:
+    """build が読むレコードの値（これが変わらなければグラフは同じになる）"""
+    key = [record_id(record, kind)]
+    if kind == "companies":
+        key.append(_first(record, COMPANY_NAME_FIELDS))
+    elif kind == "jobs":
+        key += [_first(record, COMPANY_ID_FIELDS), _first(record, COMPANY_NAME_FIELDS)]
+    elif kind == "candidates":
+        key += [
+            str(record.get(STATUS_FIELD) or "").strip(),
+            record_job_ids(record),
+            _first(record, ["応募企業名"]),
+        ]
+    return key
+
+
+def _csr(n_src: int, src, dst, status):
+    """エッジ一覧から CSR 配列（indptr, indices, status）を作る"""
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int32)
+    status = np.asarray(status, dtype=np.int16)
+    # 同じ (元, 先) でもステータスごとにエッジを持つ（引くときに重複を除く）
+    order = np.lexsort((dst, src))
+    src, dst, status = src[order], dst[order], status[order]
+    indptr = np.zeros(n_src + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_src), out=indptr[1:])
+    return indptr, dst, status
+
+
+def build(graph_dir: Path = GRAPH_DIR) -> dict:
+    """全レコードの関係を読み込み、CSR グラフを保存
+
+    選考ステータスは番号で持つ（0: なし、1〜: 選考中、それ以外は末尾に追加）。
+    3種別すべてを読み直して全 CSR を書き出すので、コストは全件に比例する。
+    incremental.py は relation_key の値が変わったときだけ呼ぶ。
+    """
+    nodes = {kind: [] for kind in ("companies", "jobs", "candidates")}
+    positions = {kind: {} for kind in nodes}
+    statuses = ["", *ACTIVE_STATUSES]
+    status_codes = {s: i for i, s in enumerate(statuses)}
+    company_names = {}
+
+    def add_node(kind: str, node_id: str) -> int:
+        position = positions[kind].get(node_id)
+        if position is None:
+            position = positions[kind][node_id] = len(nodes[kind])
+            nodes[kind].append(node_id)
+        return position
+
+    for record in iter_records("companies"):
+        rid = record_id(record, "companies")
+        if not rid:
+            continue
+        add_node("companies", rid)
+        name = _first(record, COMPANY_NAME_FIELDS)
+        if name:
+            company_names[name] = rid
+
+    def company_node(record: dict):
+        key = _first(record, COMPANY_ID_FIELDS)
+        if not key:
+            name = _first(record, COMPANY_NAME_FIELDS)
+            key = company_names.get(name, name)
+        if not key:
+            return None
+        return add_node("companies", key)
+
+    edges = {name: ([], [], []) for name in RELATIONS}
+
+    def add_edge(relation: str, src: int, dst: int, status: int = 0):
+        s, d, st = edges[relation]
+        s.append(src)
+        d.append(dst)
+        st.append(status)
+
+    job_company = {}
+    for record in iter_records("jobs"):
+        job = add_node("jobs", record_id(record, "jobs"))
+        company = company_node(record)
+        if company is not None:
+            job_company[job] = company
+            add_edge("company_jobs", company, job)
+            add_edge("job_company", job, company)
+
+    for record in iter_records("candidates"):
+        candidate = add_node("candidates", record_id(record, "candidates"))
+        status = str(record.get(STATUS_FIELD) or "").strip()
+        if status not in status_codes:
+            status_codes[status] = len(statuses)
+            statuses.append(status)
+        code = status_codes[status]
+
+        companies = set()
+        for job_id in record_job_ids(record):
+            job = add_node("jobs", job_id)
+            add_edge("job_candidates", job, candidate, code)
+            add_edge("candidate_jobs", candidate, job, code)
+            if job in job_company:
+                companies.add(job_company[job])
+        # 求人が取り込まれていない（終了済みなど）場合は応募企業名で企業に結ぶ
+        if not companies:
+            name = _first(record, ["応募企業名"])
+            if name:
+                companies.add(add_node("companies", company_names.get(name, name)))
+        for company in companies:
+            add_edge("company_candidates", company, candidate, code)
+            add_edge("candidate_companies", candidate, company, code)
+
+    graph_dir.mkdir(parents=True, exist_ok=True)
+    for relation, (src_kind, _) in RELATIONS.items():
+        indptr, indices, status = _csr(len(nodes[src_kind]), *edges[relation])
+        np.save(graph_dir / f"{relation}_indptr.npy", indptr)
+        np.save(graph_dir / f"{relation}_indices.npy", indices)
+        np.save(graph_dir / f"{relation}_status.npy", status)
+
+    meta = {
+        "nodes": nodes,
+        "company_names": company_names,
+        "statuses": statuses,
+    }
+    (graph_dir / "graph.json").write_text(
+        json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+    )
+
+    n_edges = sum(len(edges[r][0]) for r in ("company_jobs", "job_candidates"))
+    print(
+        f"  🕸️ graph: 企業{len(nodes['companies'])} / 求人{len(nodes['jobs'])}"
+        f" / 候補者{len(nodes['candidates'])}（{n_edges}エッジ）"
+    )
+    return meta
+
+
+def exists(graph_dir: Path = GRAPH_DIR) -> bool:
+    return (graph_dir / "graph.json").exists()
+
+
+def load(graph_dir: Path = GRAPH_DIR) -> dict:
+    """グラフを読み込む（配列はmmapで読み込み）"""
+    meta = json.loads((graph_dir / "graph.json").read_text(encoding="utf-8"))
+    statuses = meta["statuses"]
+    graph = {
+        "nodes": meta["nodes"],
+        "positions": {
+            kind: {rid: i for i, rid in enumerate(ids)}
+            for kind, ids in meta["nodes"].items()
+        },
+        "company_names": meta["company_names"],
+        "statuses": statuses,
+        "active_codes": np.array(
+            [i for i, s in enumerate(statuses) if s in ACTIVE_STATUSES], dtype=np.int16
+        ),
+    }
+    for relation in RELATIONS:
+        graph[relation] = tuple(
+            np.load(graph_dir / f"{relation}_{part}.npy", mmap_mode="r")
+            for part in ("indptr", "indices", "status")
+        )
+    return graph
+
+
+def resolve_company(graph: dict, company: str):
+    """企業ID・企業名から企業ノードIDを返す（見つからなければ None）"""
+    company = company.strip()
+    if company in graph["positions"]["companies"]:
+        return company
+    return graph["company_names"].get(company)
+
+
+def neighbors(graph: dict, relation: str, node_id: str, active_only=False) -> list:
+    """関係の先にあるノードID一覧
+
+    active_only: 選考ステータスが選考中のエッジだけ
+    """
+    src_kind, dst_kind = RELATIONS[relation]
+    position = graph["positions"][src_kind].get(node_id)
+    if position is None:
+        return []
+    indptr, indices, status = graph[relation]
+    start, end = indptr[position], indptr[position + 1]
+    targets = np.asarray(indices[start:end])
+    if active_only:
+        targets = targets[np.isin(status[start:end], graph["active_codes"])]
+    ids = graph["nodes"][dst_kind]
+    return list(dict.fromkeys(ids[i] for i in targets))
+
+
+def company_jobs(graph: dict, company: str) -> list:
+    """企業の求人ID"""
+    key = resolve_company(graph, company)
+    return neighbors(graph, "company_jobs", key) if key else []
+
+
+def in_process_candidates(graph: dict, company: str) -> list:
+    """企業で選考中の候補者ID"""
+    key = resolve_company(graph, company)
+    return neighbors(graph, "company_candidates", key, active_only=True) if key else []
+
+
+def job_company(graph: dict, job_id: str):
+    """求人の企業ID（分からなければ None）"""
+    companies = neighbors(graph, "job_company", job_id)
+    return companies[0] if companies else None
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="企業・求人・候補者グラフ")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="グラフ作成")
+
+    jobs_parser = sub.add_parser("jobs", help="企業の求人")
+    jobs_parser.add_argument("company", help="企業ID / 企業名")
+
+    process_parser = sub.add_parser("in-process", help="企業で選考中の候補者")
+    process_parser.add_argument("company", help="企業ID / 企業名")
+
+    applicants_parser = sub.add_parser("applicants", help="求人に紐づく候補者")
+    applicants_parser.add_argument("job_id", help="求人ID")
+    applicants_parser.add_argument("--active", action="store_true", help="選考中のみ")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🕸️ グラフ作成中...")
+        build()
+        print("✅ 作成完了")
+        return
+
+    if not exists():
+        print("❌ グラフがありません")
+        print("   uv run bin/graph_index.py build を実行してください")
+        sys.exit(1)
+
+    graph = load()
+    start = time.perf_counter()
+    if args.command == "jobs":
+        results = company_jobs(graph, args.company)
+    elif args.command == "in-process":
+        results = in_process_candidates(graph, args.company)
+    else:
+        results = neighbors(graph, "job_candidates", args.job_id, args.active)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    for rid in results:
+        print(rid)
+    print(f"⏱️  {len(results)}件 / {elapsed_us:.0f}µs", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy", "scikit-learn"]
+# ///
+"""
+Incremental Index Refresh
+
+前回取り込み時のレコードごとのハッシュ（workspace/index/snapshot.json）と比較し、
+追加・変更されたレコードだけを各インデックスに差分セグメントとして追記、
+削除されたレコードは墓標にする。セグメントが増えたら自動でコンパクションする。
+これらの更新コストはデータ全体ではなく変更件数に比例する。
+列ファイル（columnar.py）は行番号の連続した全件のスナップショットなので、変更があった種別は
+全行を書き出し直す（内容の変わらない行は前のバージョンの値をコピーし、パースするのは変更された行だけ）。
+企業・求人・候補者グラフ（graph_index.py）は3種別すべてを読み直して全件作り直すため、
+グラフが読む値（企業名・求人の企業・候補者の選考ステータスと応募先）の署名が
+変わったときだけ作り直す（候補者のスキルやメモだけの変更では作り直さない）。
+語の統計（planner.py）も種別ごとに全件を読み直して作り直すため、検索対象テキストの署名が
+変わった種別だけ作り直す（更新日・ID・数値の項目だけの変更では作り直さない）。
+求人が変わったときは、その求人の要件プロファイル（job_profiles.py）のキャッシュを消す。
+
+Usage:
+    uv run bin/incremental.py            # 差分更新
+    uv run bin/incremental.py --full     # 全件再作成
+    uv run bin/incremental.py --compact  # 差分更新後に強制コンパクション
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import columnar
+import facets
+import graph_index
+import job_profiles
+import lsh_index
+import planner
+import vector_index
+from records import INDEX_DIR, KINDS, iter_records, record_id
+
+SNAPSHOT_PATH = INDEX_DIR / "snapshot.json"
+
+# 差分で更新するインデックス（build / apply_delta / compact / exists を持つモジュール）
+INDEXES = (vector_index, facets, lsh_index)
+
+# 種別に変更があったときに全件作成するもの（build / exists を持つモジュール）
+SNAPSHOTS = (columnar, planner)
+
+# 全件作成するものが読む値（名前 → (record, kind) を受け取る関数）。
+# 種別ごとにこの値だけの署名を持ち、署名が変わったときだけ作り直す
+# （SNAPSHOTS のモジュールはモジュール名で引く）
+SIGNATURES = {"graph": graph_index.relation_key, "planner": planner.text_key}
+
+# 前回の全件作成以降の変更がこの割合を超えたら全件作成する
+# （ベクトル化モデルの語彙を新しいデータに追従させるため）
+FULL_REBUILD_RATIO = 0.5
+
+
+def load_snapshot(path: Path = SNAPSHOT_PATH) -> dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_snapshot(snapshot: dict, path: Path = SNAPSHOT_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+
+
+def record_hashes(kind: str):
+    """レコードID → 内容ハッシュ（同じIDの行が複数あればまとめてハッシュ）
+
+    Returns: (ハッシュ, SIGNATURES の名前 → 種別全体の署名)
+    """
+    hashes = {}
+    signatures = {name: hashlib.sha1() for name in SIGNATURES}
+    for record in iter_records(kind):
+        rid = record_id(record, kind)
+        h = hashes.get(rid)
+        if h is None:
+            h = hashes[rid] = hashlib.sha1()
+        h.update(json.dumps(record, ensure_ascii=False, sort_keys=True).encode())
+        for name, key in SIGNATURES.items():
+            signatures[name].update(
+                json.dumps(key(record, kind), ensure_ascii=False).encode()
+            )
+    return (
+        {rid: h.hexdigest() for rid, h in hashes.items()},
+        {name: h.hexdigest() for name, h in signatures.items()},
+    )
+
+
+def diff(old: dict, new: dict):
+    """Returns: (追加・変更されたID, 削除されたID)"""
+    upserts = {rid for rid, h in new.items() if old.get(rid) != h}
+    deletes = [rid for rid in old if rid not in new]
+    return upserts, deletes
+
+
+def refresh_kind(kind: str, state: dict, full: bool = False, compact: bool = False):
+    """1種別のインデックスを更新する
+
+    Returns: (新しいスナップショット状態, 変更があったか)
+    """
+    hashes, signatures = record_hashes(kind)
+    missing = [m.__name__ for m in INDEXES if not m.exists(kind)]
+
+    if state and not full and not missing:
+        upserts, deletes = diff(state["hashes"], hashes)
+        churn = state.get("churn", 0) + len(upserts) + len(deletes)
+        if churn <= max(len(hashes), 1) * FULL_REBUILD_RATIO:
+            if upserts or deletes:
+                records = [
+                    r for r in iter_records(kind) if record_id(r, kind) in upserts
+                ]
+                for module in INDEXES:
+                    module.apply_delta(kind, records, deletes)
+                print(
+                    f"  🔁 {kind}: 追加・変更 {len(upserts)}件 / 削除 {len(deletes)}件"
+                )
+            else:
+                print(f"  ✨ {kind}: 変更なし")
+            for module in INDEXES:
+                module.compact(kind, force=compact)
+            state = {"hashes": hashes, "churn": churn, "signatures": signatures}
+            return state, bool(upserts or deletes)
+
+    if missing and state:
+        print(f"  ⚠️ {kind}: インデックスがありません（{', '.join(missing)}）")
+    for module in INDEXES:
+        module.build(kind, iter_records(kind))
+    return {"hashes": hashes, "churn": 0, "signatures": signatures}, True
+
+
+def refresh(full: bool = False, compact: bool = False):
+    """全種別のインデックスを差分更新（初回・--full は全件作成）"""
+    snapshot = load_snapshot()
+    stale = set()
+    signatures = {}
+    for kind in KINDS:
+        state = snapshot.get(kind) or {}
+        built = state.get("signatures", {})
+        snapshot[kind], kind_changed = refresh_kind(kind, state, full, compact)
+        signatures[kind] = snapshot[kind]["signatures"]
+        kind_stale = {
+            name
+            for name in SIGNATURES
+            if full or built.get(name) != signatures[kind][name]
+        }
+        stale |= kind_stale
+        # 署名は作り直しが済んでから記録する（途中で失敗したら次回も作り直す）
+        snapshot[kind]["signatures"] = built
+        for module in SNAPSHOTS:
+            name = module.__name__
+            rebuild = name in kind_stale if name in SIGNATURES else kind_changed
+            if rebuild or not module.exists(kind):
+                module.build(kind)
+        if kind == "jobs" and kind_changed:
+            job_profiles.prune(snapshot[kind]["hashes"])
+        # 途中で失敗しても完了した種別は次回差分で扱えるよう都度保存
+        save_snapshot(snapshot)
+
+    if "graph" in stale or not graph_index.exists():
+        graph_index.build()
+    else:
+        print("  ✨ graph: 関係に変更なし")
+    for kind in KINDS:
+        snapshot[kind]["signatures"] = signatures[kind]
+    save_snapshot(snapshot)
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="検索インデックスの差分更新")
+    parser.add_argument("--full", action="store_true", help="全件再作成")
+    parser.add_argument("--compact", action="store_true", help="強制コンパクション")
+    args = parser.parse_args()
+
+    print("🧭 検索インデックス更新中...")
+    refresh(args.full, args.compact)
+    print("✅ 更新完了")
+
+
+if __name__ == "__main__":
+    main()
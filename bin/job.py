@@ -1,6 +1,6 @@
 #!/usr/bin/env -S uv run
 # /// script
-# dependencies = ["python-ulid", "typing-extensions"]
+# dependencies = ["python-ulid", "typing-extensions", "numpy", "scikit-learn"]
 # ///
 """
 Job Search Interface
@@ -10,19 +10,54 @@ Job Search Interface
 Usage:
     uv run job.py "Pythonエンジニア" 10
     uv run job.py "フルリモート"
+    uv run job.py "フルリモート" --fresh   # 結果キャッシュを使わずに実行
 """
 
 import os
 import sys
 import subprocess
+from datetime import datetime
 from pathlib import Path
 from ulid import ULID
 
+import columnar
+import facets
+import planner
+import preflight
+import render
+import result_cache
+import synonyms
+import lsh_index
+import vector_index
+from ranking import rank_records
+from records import write_ndjson
+from scan import keyword_hits
+
+# プロンプトのバージョン（プロンプト・出力形式を変えたら上げる。結果キャッシュのキーに使う）
+PROMPT_VERSION = 1
+
+
+def write_semantic_hits(query: str, chunks_dir: Path, top_k: int) -> int:
+    """意味的に近い求人を chunks/semantic_hits.ndjson に書き出す"""
+    if not vector_index.exists("jobs"):
+        return 0
+
+    hits = [
+        {**record, "_semantic": round(score, 4)}
+        for score, record in vector_index.search_records("jobs", query, top_k)
+    ]
+    hits = lsh_index.collapse_duplicates(hits, "jobs")
+    write_ndjson(hits, chunks_dir / "semantic_hits.ndjson")
+    print(f"🧭 意味検索: {len(hits)}件")
+    return len(hits)
+
 
 def main():
     """メイン処理"""
     if len(sys.argv) < 2:
-        print("Usage: uv run job.py <SEARCH_QUERY> [COUNT] [--continue <session_id>]")
+        print(
+            "Usage: uv run job.py <SEARCH_QUERY> [COUNT] [--continue <session_id>] [--dry-run] [--fresh] [--narrate]"
+        )
         print('Example: uv run job.py "Pythonエンジニア" 10')
         print(
             'Example: uv run job.py "Pythonエンジニア" 10 --continue 01ARZ3NDEKTSV4RRFFQ69G5FAV'
@@ -32,6 +67,19 @@ def main():
     query = sys.argv[1]
     count = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 10
 
+    # 実行計画（語の統計からヒット件数・LLM入力トークン・所要時間を見積もる）
+    plan = None
+    if planner.exists("jobs"):
+        plan = planner.plan_search("jobs", query, count, columnar.exists("jobs"))
+    if "--dry-run" in sys.argv:
+        if not plan:
+            print(
+                "❌ 語の統計がありません。uv run bin/planner.py build を実行してください"
+            )
+            sys.exit(1)
+        planner.print_plan(plan)
+        sys.exit(0)
+
     # セッションIDの解析
     ulid = None
     continue_mode = False
@@ -41,6 +89,13 @@ def main():
             continue_mode = True
             break
 
+    # ヒットしない検索は OpenCode を起動する前に止める（preflight.py）
+    if not continue_mode:
+        message, _ = preflight.check_query("jobs", query)
+        if message:
+            print(message)
+            sys.exit(1)
+
     project_root = Path(__file__).parent.parent
     workspace_dir = project_root / "workspace"
 
@@ -51,6 +106,24 @@ def main():
     work_dir = workspace_dir / "output" / ulid
     chunks_dir = work_dir / "chunks"
 
+    # 同じ検索・同じデータ・同じモデルの結果があれば OpenCode を実行せずに返す
+    cache_key = result_cache.cache_key(
+        {
+            "type": "jobs",
+            "query": result_cache.normalize_query(query),
+            "count": count,
+            "synonyms": synonyms.dictionary_version(),
+        },
+        PROMPT_VERSION,
+    )
+    if not continue_mode and "--fresh" not in sys.argv:
+        cached = result_cache.lookup(cache_key, work_dir)
+        if cached:
+            created = datetime.fromtimestamp(cached["created_at"]).strftime("%H:%M")
+            print(f"⚡ キャッシュから応答（{created} の結果、--fresh で再実行）")
+            print(f"🆔 Process ID (ULID): {ulid}")
+            sys.exit(0)
+
     # ディレクトリ作成
     chunks_dir.mkdir(parents=True, exist_ok=True)
 
@@ -58,8 +131,61 @@ def main():
     print(f"🆔 Process ID (ULID): {ulid}")
     print(f"🔍 Search Query: {query}")
     print(f"📊 Count: {count}件")
+    if plan:
+        print(
+            f"🗺️ 見積もり: 約{plan['estimated_rows']}件 → {planner.PATH_LABELS[plan['path']]}"
+        )
     print()
 
+    # キーワード一致とファセット絞り込み（件数が多すぎればLLMを使わず選択肢を返す）
+    filtered_path = chunks_dir / "filtered_jobs.ndjson"
+    selected = None
+    hits = []
+    if continue_mode:
+        selected, hits = facets.apply_selection("jobs", work_dir, filtered_path)
+        if selected and selected["type"] == "show":
+            # 絞り込まずに表示: BM25上位の表示件数だけにする（全件をLLMに渡さない）
+            hits = [r for _, r in rank_records(hits, query, "jobs", top_k=count)]
+        if selected:
+            write_ndjson(hits, filtered_path)
+            print(f"🏷️ 絞り込み適用: {selected['text']} → {len(hits)}件")
+    else:
+        hits = keyword_hits("jobs", query)
+        print(f"🔎 キーワード一致: {len(hits)}件")
+        # ほぼ同じ内容の求人（同じ企業の量産求人など）は1件にまとめる
+        total = len(hits)
+        hits = lsh_index.collapse_duplicates(hits, "jobs")
+        if len(hits) < total:
+            print(f"🧬 重複求人をまとめました: {total}件 → {len(hits)}件")
+        # LLMに渡す量がトークン予算を超える場合はBM25上位に絞る
+        cap = planner.budget_rows(planner.load("jobs")) if plan else None
+        if cap and len(hits) > cap and len(hits) <= count * planner.CHOICES_RATIO:
+            hits = [r for _, r in rank_records(hits, query, "jobs", top_k=cap)]
+            print(f"✂️ トークン予算に合わせて上位{cap}件に絞り込み")
+        write_ndjson(hits, filtered_path)
+
+    if (not continue_mode or (selected and selected["type"] == "filter")) and (
+        facets.propose_choices("jobs", query, hits, count, work_dir)
+    ):
+        print("📋 choices.json に絞り込み候補を保存しました（LLM不使用）")
+        sys.exit(0)
+
+    # 表示件数以下ならテンプレートでレポートを作り、OpenCode は起動しない（--narrate でAIの説明文つき）
+    if (
+        hits
+        and len(hits) <= count
+        and (not continue_mode or selected)
+        and "--narrate" not in sys.argv
+    ):
+        n_rendered = render.keyword_report(
+            work_dir, "jobs", query, hits, f"求人検索: {query}"
+        )
+        print(
+            f"⚡ キーワード一致が{count}件以下のため、AIを使わずにレポートを作成: {n_rendered}件"
+        )
+        print("🤖 AIの説明文が必要なら --narrate を付けて再実行してください")
+        sys.exit(0)
+
     # OpenCode設定
     opencode_cmd = ["opencode", "run"]
 
@@ -68,42 +194,78 @@ def main():
     opencode_cmd.extend(["--model", opencode_model])
     print(f"🤖 OpenCode Model: {opencode_model}")
 
-    # Salesforce URL を環境変数から取得
-    salesforce_base_url = os.getenv(
-        "SALESFORCE_BASE_URL", "https://your-org.lightning.force.com"
+    # 意味検索（キーワードで拾えない表記揺れの補完用）
+    semantic_count = 0
+    if not continue_mode:
+        semantic_count = write_semantic_hits(query, chunks_dir, count * 5)
+
+    semantic_note = ""
+    if semantic_count:
+        semantic_note = f"""
+補足: output/{ulid}/chunks/semantic_hits.ndjson に意味的に近い求人（上位{semantic_count}件、_semantic=類似度）を用意済み。
+ripgrepで漏れた表記揺れ・類義語（例: SRE / インフラエンジニア / 基盤開発）の補完に使うこと。
+"""
+
+    # キーワードパターン（類義語辞書で展開。LLMでの生成は不要）
+    patterns = "\n".join(
+        f"- {group[0]}: {synonyms.rg_pattern(group)}"
+        for group in synonyms.expand(query)
     )
+    rg_command = synonyms.rg_command("jobs", query)
 
     # OpenCode 実行
-    if continue_mode:
+    if selected:
+        prompt = f"""前の検索結果を続けて処理してください。検索クエリ: {query}, セッションID: {ulid}
+
+1. ユーザーの選択「{selected["text"]}」は適用済みです: output/{ulid}/chunks/filtered_jobs.ndjson（{len(hits)}件）
+2. filtered_jobs.ndjson から条件に最も合う上位{count}件を選んでレポート作成（result.json）
+"""
+    elif continue_mode:
         prompt = f"""前の検索結果を続けて処理してください。検索クエリ: {query}, セッションID: {ulid}
 
 1. output/{ulid}/choices.json を読んでユーザーの選択を確認
-2. 条件に従って filtered_jobs.ndjson をフィルタリング
-3. フィルタリング後が{count}件以下ならレポート作成（jobs_summary.md, jobs.csv）
+2. 条件に従って output/{ulid}/chunks/filtered_jobs.ndjson をフィルタリング
+3. フィルタリング後が{count}件以下ならレポート作成（result.json）
 4. それでも{count * 5}件超なら、再度 choices.json に選択肢を保存して終了
 """
     else:
         prompt = f"""「{query}」に合う求人を検索してください。検索クエリ: {query}, セッションID: {ulid}
 
-Step 1: キーワードパターン生成（類義語・関連技術含める）
-Step 2: ripgrepで件数チェック → wc -l
+Step 1: キーワードパターン（類義語辞書 v{synonyms.dictionary_version()} で展開済み。生成は不要）
+{patterns}
+Step 2: ripgrepで件数チェック → 次のコマンドをそのまま使う
+{rg_command}
 Step 3: 件数が{count}件以下ならすぐにレポート作成、{count * 5}件超なら choices.json に選択肢保存して終了
 
 choices.json の形式は：query, total_count, suggestions（id, text, type, pattern/count）, message
 
 詳細手順:
-- Step 1: キーワードパターン生成
-- Step 2: ripgrepで件数チェック
-- Step 3: 件数{count}件以下ならレポート作成（jobs_summary.md, jobs.csv）、{count * 5}件超ならchoices.json保存して終了
+- Step 1: 展開済みのキーワードパターンを使う（辞書にない表記揺れに気づいた場合のみ、output/{ulid}/patterns.json に {{"query": "{query}", "patterns": ["語|言い換え|..."]}} として保存）
+- Step 2: 上のコマンドで件数チェック
+- Step 3: 件数{count}件以下ならレポート作成（result.json）、{count * 5}件超ならchoices.json保存して終了
 - Step 4: 続きモードならchoices.json読んで条件に従ってフィルタリング
 
 作業ディレクトリは output/{ulid}/ 内のみ。
-"""
 
-    opencode_cmd.append(prompt)
+MCPツール（openmatching）: search(query, kind, filters, k) / get(id, fields) / facets(query, kind) / similar(id) でインデックスから直接引ける（1回最大50件）。
+data/*.ndjson を grep・Read する前にこちらを使うこと。
+
+補足: クエリの全語（類義語辞書の言い換えを含む）を含む求人（{len(hits)}件）を output/{ulid}/chunks/filtered_jobs.ndjson に保存済み。件数チェックの出発点に使うこと。
+ほぼ同じ内容の求人は1件にまとめ、まとめた求人IDを _duplicates に入れてある。レポートには「他N件の類似求人あり」が自動で添えられる。
+求人には企業属性（「企業: 従業員数」「企業: 資金調達ステージ」「企業: 働き方」「企業: 企業ランク」「企業: 事業内容」など）を結合済み。企業条件のための companies_*.ndjson の突き合わせは不要。
+{semantic_note}"""
+
+    opencode_cmd.append(prompt + "\n" + render.result_prompt("jobs", ulid))
 
     result = subprocess.run(opencode_cmd, cwd=workspace_dir, check=False)
 
+    # 評価（result.json）からサマリーと CSV を作成（choices.json で終えた場合は何もしない）
+    n_rendered = render.render(work_dir, "jobs", f"求人検索: {query}")
+    if n_rendered >= 0:
+        print(f"📝 レポート作成: {n_rendered}件")
+    if result.returncode == 0 and not continue_mode:
+        result_cache.store(cache_key, work_dir)
+
     sys.exit(result.returncode)
 
 
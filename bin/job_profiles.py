@@ -0,0 +1,201 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Job Requirement Profiles
+
+求人ごとの要件プロファイル（workspace/index/profiles/<求人ID>.json）を、
+求人IDとレコードの内容ハッシュをキーにキャッシュする。
+
+- Python 側で作る部分: 適合度の条件（fit.job_profile）・BM25 のクエリ（job_query）
+- LLM が抽出する部分: 必須・歓迎要件、検索キーワード、要約（初回のマッチングで
+  output/<ulid>/job_profile.json に保存させ、終了後に取り込む）。キーワードは類義語辞書で
+  検索パターンに展開して一緒に保存する
+
+同じ求人の2回目以降のマッチングでは LLM に抽出済みの要件を渡し、求人の読み直しを省く。
+求人の内容が変わるとハッシュが変わるので自動で作り直す（取り込み時に古いものを削除）。
+
+Usage:
+    uv run bin/job_profiles.py show J-0000023845
+    uv run bin/job_profiles.py list
+"""
+
+import hashlib
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import fit
+import synonyms
+from ranking import job_query
+from records import INDEX_DIR, find_record, record_id
+
+PROFILES_DIR = INDEX_DIR / "profiles"
+
+# LLM に書かせるファイル（output/<ulid>/ 内）
+PROFILE_FILE = "job_profile.json"
+
+# 要件として取り込む項目と件数の上限
+REQUIREMENT_LIMITS = {"must": 10, "nice": 10, "keywords": 10}
+
+
+def record_hash(record: dict) -> str:
+    """レコードの内容ハッシュ（incremental.py のスナップショットと同じ計算）"""
+    data = json.dumps(record, ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+def _path(job_id: str, profiles_dir: Path = PROFILES_DIR) -> Path:
+    return profiles_dir / f"{job_id}.json"
+
+
+def _save(profile: dict, profiles_dir: Path = PROFILES_DIR):
+    path = _path(profile["job_id"], profiles_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(profile, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def build(job: dict) -> dict:
+    """求人から Python 側で作れる部分のプロファイルを作る"""
+    return {
+        "job_id": record_id(job, "jobs"),
+        "hash": record_hash(job),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "fit": fit.job_profile(job),
+        "query": dict(job_query(job)),
+        "requirements": None,
+    }
+
+
+def load(job: dict, profiles_dir: Path = PROFILES_DIR):
+    """キャッシュ済みのプロファイル（ないか、求人の内容が変わっていれば None）"""
+    path = _path(record_id(job, "jobs"), profiles_dir)
+    if not path.exists():
+        return None
+    try:
+        profile = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+    if profile.get("hash") != record_hash(job):
+        return None
+    return profile
+
+
+def get(job: dict, profiles_dir: Path = PROFILES_DIR) -> dict:
+    """プロファイルを返す（キャッシュがなければ作って保存）"""
+    profile = load(job, profiles_dir)
+    if profile is None:
+        profile = build(job)
+        _save(profile, profiles_dir)
+    return profile
+
+
+def learn(work_dir: Path, job: dict, profiles_dir: Path = PROFILES_DIR) -> bool:
+    """セッションで LLM が抽出した要件（job_profile.json）をプロファイルに取り込む"""
+    path = Path(work_dir) / PROFILE_FILE
+    if not path.exists():
+        return False
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return False
+    if not isinstance(data, dict):
+        return False
+
+    requirements = {
+        key: [str(v).strip() for v in data.get(key) or [] if str(v).strip()][:limit]
+        for key, limit in REQUIREMENT_LIMITS.items()
+    }
+    requirements["summary"] = str(data.get("summary", "")).strip()
+    if not any(requirements.values()):
+        return False
+    requirements["patterns"] = [
+        synonyms.rg_pattern(group)
+        for group in synonyms.expand(" ".join(requirements["keywords"]))
+    ]
+
+    profile = get(job, profiles_dir)
+    profile["requirements"] = requirements
+    profile["learned_from"] = Path(work_dir).name
+    _save(profile, profiles_dir)
+    return True
+
+
+def prompt_section(profile: dict, ulid: str) -> str:
+    """LLM に渡す要件の説明（抽出済みなら要件そのもの、未抽出なら保存の指示）"""
+    requirements = profile.get("requirements")
+    if requirements:
+        return f"""### 求人要件（抽出済み・キャッシュ）
+
+この求人の要件は過去のマッチングで抽出済みです。`target_job.ndjson` から要件を抽出し直す必要はありません
+（細部の確認が必要なときだけ読むこと）。
+
+```json
+{json.dumps(requirements, ensure_ascii=False, indent=2)}
+```
+"""
+    return f"""### 求人要件の保存（初回のみ）
+
+`target_job.ndjson` から読み取った要件を、次回以降のマッチングで再利用するため
+`output/{ulid}/{PROFILE_FILE}` に次の形式で保存してください。
+
+```json
+{{"must": ["必須要件（1項目20字程度）"], "nice": ["歓迎要件"], "keywords": ["候補者検索のキーワード（職種・技術名）"], "summary": "求める人物像（1〜2文）"}}
+```
+"""
+
+
+def prune(hashes: dict, profiles_dir: Path = PROFILES_DIR) -> int:
+    """求人が削除・変更されたプロファイルを消す
+
+    hashes: 求人ID → 内容ハッシュ（incremental.py のスナップショット）
+    """
+    removed = 0
+    for path in sorted(Path(profiles_dir).glob("*.json")):
+        try:
+            profile = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            profile = {}
+        if hashes.get(path.stem) != profile.get("hash"):
+            path.unlink()
+            removed += 1
+    if removed:
+        print(f"  🧹 求人要件プロファイル: 変更・削除された求人の {removed}件を削除")
+    return removed
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="求人要件プロファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show_parser = sub.add_parser("show", help="求人のプロファイルを表示")
+    show_parser.add_argument("job_id")
+    sub.add_parser("list", help="キャッシュ済みのプロファイル一覧")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in sorted(PROFILES_DIR.glob("*.json")):
+            profile = json.loads(path.read_text(encoding="utf-8"))
+            status = "要件あり" if profile.get("requirements") else "要件なし"
+            print(f"{profile['job_id']}\t{profile['created_at']}\t{status}")
+        return
+
+    job = find_record("jobs", args.job_id)
+    if job is None:
+        print(f"❌ 求人が見つかりません: {args.job_id}")
+        sys.exit(1)
+    profile = load(job)
+    if profile is None:
+        print(
+            "⚠️ キャッシュがないか、求人の内容が変わっています（次回のマッチングで作成）"
+        )
+        sys.exit(1)
+    print(json.dumps(profile, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
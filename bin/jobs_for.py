@@ -0,0 +1,518 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["python-ulid", "typing-extensions", "numpy", "scikit-learn"]
+# ///
+"""
+Reverse Matching: Candidate → Jobs
+
+候補者IDに対して、合う求人を探す（candidate.py の逆向き）。
+求人ファイル（jobs.ndjson）は読まず、取り込み時に作った求人の特徴量
+（workspace/index/job_features/: 適合度の条件と、候補者ベクトルと同じ空間の求人ベクトル、
+関連度の順位の基準になる求人ごとの全候補者の上位の類似度）で
+全求人を配列演算1回で採点し、上位 COUNT 件だけを LLM に渡して説明文とランク付けを任せる。
+
+- 採点は shortlists.py と同じ（fit.score_many と学習済みモデル）なので、同じ組み合わせは
+  どちら向きでも同じ点数になる
+- 候補者が選考中の企業の求人と、応募済みの求人は除く
+- 特徴量は取り込み（download.py）で変更された求人の分だけ作り直す。順位の基準（求人ごとの類似度の
+  上位 RELEVANCE_POOL 名）は、保存済みの上位に追加・変更・削除された候補者の分だけを反映する
+
+Usage:
+    uv run bin/jobs_for.py 003P00000000000
+    uv run bin/jobs_for.py 003P00000000000 5
+    uv run bin/jobs_for.py 003P00000000000 --dry-run   # LLM を使わずに上位を表示
+    uv run bin/jobs_for.py 003P00000000000 --fresh     # 結果キャッシュを使わずに実行
+    uv run bin/jobs_for.py build                       # 求人の特徴量を作り直す
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import fit
+import graph_index
+import job_profiles
+import ltr
+import render
+import result_cache
+import shortlists
+import summaries
+import vector_index
+from incremental import diff, load_snapshot
+from records import (
+    INDEX_DIR,
+    pick_field,
+    record_id,
+    select_records,
+    write_ndjson,
+)
+
+FEATURES_DIR = INDEX_DIR / "job_features"
+FEATURES_FILE = "features.json"
+VECTORS_FILE = "vectors.npy"
+CUTOFFS_FILE = "cutoffs.npy"
+CUTOFF_IDS_FILE = "cutoff_ids.npy"
+CUTOFF_FLOORS_FILE = "cutoff_floors.npy"
+HASHES_FILE = "candidate_hashes.json"
+
+# 求人ごとに保存する類似度の上位の件数（RELEVANCE_POOL より多く持ち、候補者の変更・削除で
+# 上位から外れても全候補者との計算をし直さずに済むようにする）
+CUTOFF_WIDTH = 2 * fit.RELEVANCE_POOL
+
+# プロンプトのバージョン（プロンプト・出力形式を変えたら上げる。結果キャッシュのキーに使う）
+PROMPT_VERSION = 1
+
+# LLM に渡す求人数の上限
+MAX_JOBS = 30
+
+
+def _vectors_version() -> str:
+    if not vector_index.exists("candidates"):
+        return ""
+    return str(vector_index._model_path("candidates").stat().st_mtime)
+
+
+def _padded(ids: np.ndarray, values: np.ndarray) -> tuple:
+    """上位の候補者ID・類似度を CUTOFF_WIDTH 列にそろえる（空きは ""・-inf）"""
+    width = CUTOFF_WIDTH - values.shape[1]
+    return (
+        np.pad(ids.astype(str), ((0, 0), (0, width)), constant_values=""),
+        np.pad(
+            values.astype(np.float32), ((0, 0), (0, width)), constant_values=-np.inf
+        ),
+    )
+
+
+def _top_similar(index: dict, vectors: np.ndarray) -> tuple:
+    """求人ごとの全候補者の中での類似度の上位（候補者ID, 類似度, 下限。関連度の順位の基準）
+
+    下限より類似度の高い候補者はすべて上位に入っている（全員入っていれば -inf）。
+    求人数 × 全候補者数の計算なので、新しい求人と基準を作り直す求人だけに使う。
+    """
+    ids, candidates = shortlists.live_vectors(index)
+    top_ids, top_values = [], []
+    for block in np.array_split(vectors, max(1, len(vectors) // 256)):
+        cols, values = fit.similarity_top(block @ candidates.T, CUTOFF_WIDTH)
+        top_ids.append(ids[cols])
+        top_values.append(values)
+    top_ids, top_values = _padded(np.concatenate(top_ids), np.concatenate(top_values))
+    floors = np.full(len(vectors), -np.inf, dtype=np.float32)
+    if len(ids) > CUTOFF_WIDTH:
+        floors[:] = top_values[:, -1]
+    return top_ids, top_values, floors
+
+
+def _merge_top(top_ids, top_values, floors, removed: set, new_ids, similarity):
+    """保存済みの上位から追加・変更・削除された候補者を外し、追加・変更された候補者の類似度を加えて取り直す
+
+    計算量は求人数 ×（CUTOFF_WIDTH + 変更された候補者数）で、候補者全体の件数にはよらない。
+    下限より低い候補者はほかにも保存していない候補者がいるので加えない。
+    Returns: (候補者ID, 類似度, 下限)
+    """
+    values = np.where(np.isin(top_ids, list(removed)), -np.inf, top_values)
+    similarity = np.where(similarity >= floors[:, None], similarity, -np.inf)
+    ids = np.concatenate(
+        [top_ids, np.broadcast_to(np.asarray(new_ids, dtype=str), similarity.shape)],
+        axis=1,
+    )
+    merged = np.concatenate([values, similarity], axis=1)
+    cols, values = fit.similarity_top(merged, CUTOFF_WIDTH)
+    # 入りきらなかった候補者がいれば、最下位が新しい下限になる
+    overflow = np.isfinite(merged).sum(axis=1) > CUTOFF_WIDTH
+    floors = np.where(overflow, np.maximum(floors, values[:, -1]), floors)
+    ids, values = _padded(np.take_along_axis(ids, cols, axis=1), values)
+    return ids, values, floors.astype(np.float32)
+
+
+def refresh(features_dir: Path = FEATURES_DIR) -> int:
+    """求人の特徴量を更新する（Returns: 作り直した求人数）"""
+    jobs = shortlists.active_jobs()
+    version = _vectors_version()
+    hashes = load_snapshot().get("candidates", {}).get("hashes", {})
+    old = _read_features(features_dir)
+    reuse = old is not None and old["vectors_version"] == version
+    old_rows = {jid: i for i, jid in enumerate(old["job_ids"])} if reuse else {}
+    old_hashes = shortlists._read_json(features_dir / HASHES_FILE)
+    upserts, deletes = diff(old_hashes or {}, hashes)
+
+    entries = []
+    changed = []
+    for jid, job in jobs.items():
+        job_hash = job_profiles.record_hash(job)
+        i = old_rows.get(jid)
+        if i is not None and old["jobs"][i]["hash"] == job_hash:
+            entries.append(old["jobs"][i])
+            continue
+        entries.append(
+            {
+                "id": jid,
+                "hash": job_hash,
+                "title": pick_field(job, ("求人名", "職種"), ""),
+                "company": pick_field(job, ("企業名", "取引先名"), ""),
+                "fit": job_profiles.get(job)["fit"],
+            }
+        )
+        changed.append(len(entries) - 1)
+    if (
+        old is not None
+        and not changed
+        and len(entries) == len(old["jobs"])
+        and old_hashes is not None
+        and not upserts
+        and not deletes
+    ):
+        print("  ✨ 求人の特徴量: 変更なし")
+        return 0
+
+    vectors = top_ids = top_values = None
+    if version:
+        index = vector_index.load("candidates")
+        dim = index["segments"][0]["vectors"].shape[1]
+        vectors = np.zeros((len(entries), dim), dtype=np.float32)
+        for out, entry in enumerate(entries):
+            i = old_rows.get(entry["id"])
+            if i is not None and out not in changed:
+                vectors[out] = old["vectors"][i]
+        if changed:
+            texts = [vector_index.index_text(jobs[entries[i]["id"]]) for i in changed]
+            vectors[changed] = vector_index.embed(index, texts)
+
+        # 順位の基準: 変更されていない求人は保存済みの上位に候補者の差分だけを反映する
+        kept = []
+        if old_hashes is not None and reuse and old["cutoff_floors"] is not None:
+            kept = sorted(set(range(len(entries))) - set(changed))
+        redo = sorted(set(range(len(entries))) - set(kept))
+        top_ids = np.full((len(entries), CUTOFF_WIDTH), "", dtype=object)
+        top_values = np.full((len(entries), CUTOFF_WIDTH), -np.inf, np.float32)
+        floors = np.full(len(entries), -np.inf, dtype=np.float32)
+        if kept:
+            rows = [old_rows[entries[out]["id"]] for out in kept]
+            positions = shortlists._vector_positions(index, list(upserts))
+            new_ids = list(positions)
+            new_vectors = np.zeros((len(new_ids), dim), dtype=np.float32)
+            for n, rid in enumerate(new_ids):
+                seg, i = positions[rid]
+                new_vectors[n] = index["segments"][seg]["vectors"][i]
+            ids, values, kept_floors = _merge_top(
+                old["cutoff_ids"][rows],
+                old["cutoffs"][rows],
+                old["cutoff_floors"][rows],
+                set(upserts) | set(deletes),
+                new_ids,
+                vectors[kept] @ new_vectors.T,
+            )
+            top_ids[kept], top_values[kept], floors[kept] = ids, values, kept_floors
+            # 変更・削除で上位が RELEVANCE_POOL 名を下回った求人は全候補者で作り直す
+            n_live = sum(
+                int(np.count_nonzero(seg["live"])) for seg in index["segments"]
+            )
+            short = np.isfinite(values).sum(axis=1) < min(fit.RELEVANCE_POOL, n_live)
+            redo += [out for out, s in zip(kept, short) if s]
+        if redo:
+            top_ids[redo], top_values[redo], floors[redo] = _top_similar(
+                index, vectors[redo]
+            )
+
+    features_dir.mkdir(parents=True, exist_ok=True)
+    if vectors is not None:
+        np.save(features_dir / VECTORS_FILE, vectors)
+        np.save(features_dir / CUTOFFS_FILE, top_values)
+        np.save(features_dir / CUTOFF_IDS_FILE, top_ids.astype(str))
+        np.save(features_dir / CUTOFF_FLOORS_FILE, floors)
+    else:
+        for name in (VECTORS_FILE, CUTOFFS_FILE, CUTOFF_IDS_FILE, CUTOFF_FLOORS_FILE):
+            (features_dir / name).unlink(missing_ok=True)
+    (features_dir / FEATURES_FILE).write_text(
+        json.dumps(
+            {
+                "vectors_version": version,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "jobs": entries,
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    shortlists._write_json(features_dir / HASHES_FILE, hashes)
+    delta = ""
+    if old_hashes is not None:
+        delta = f"（候補者の追加・変更 {len(upserts)}名・削除 {len(deletes)}名を反映）"
+    print(f"  🧾 求人の特徴量: {len(changed)}/{len(entries)}求人を更新{delta}")
+    return len(changed)
+
+
+def _read_features(features_dir: Path = FEATURES_DIR):
+    try:
+        data = json.loads((features_dir / FEATURES_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    data["job_ids"] = [entry["id"] for entry in data["jobs"]]
+    for key, name in (
+        ("vectors", VECTORS_FILE),
+        ("cutoffs", CUTOFFS_FILE),
+        ("cutoff_ids", CUTOFF_IDS_FILE),
+        ("cutoff_floors", CUTOFF_FLOORS_FILE),
+    ):
+        path = features_dir / name
+        data[key] = np.load(path) if path.exists() else None
+    return data
+
+
+def load(features_dir: Path = FEATURES_DIR):
+    """求人の特徴量（ないか、ベクトル化モデルが変わっていれば None）"""
+    data = _read_features(features_dir)
+    if data is None or data["vectors_version"] != _vectors_version():
+        return None
+    if _vectors_version() and any(
+        data[key] is None
+        for key in ("vectors", "cutoffs", "cutoff_ids", "cutoff_floors")
+    ):
+        return None
+    return data
+
+
+def _excluded_jobs(candidate_id: str, job_ids: list) -> set:
+    """候補者が応募済みの求人と、選考中の企業の求人"""
+    if not graph_index.exists():
+        return set()
+    graph = graph_index.load()
+    excluded = set(graph_index.neighbors(graph, "candidate_jobs", candidate_id))
+    companies = set(
+        graph_index.neighbors(
+            graph, "candidate_companies", candidate_id, active_only=True
+        )
+    )
+    if companies:
+        excluded |= {
+            jid for jid in job_ids if graph_index.job_company(graph, jid) in companies
+        }
+    return excluded
+
+
+def top_jobs(table: dict, candidate_id: str, features: dict, k: int) -> list:
+    """候補者に合う上位K件の求人 [{"id", "title", "company", "total", "fit", "parts"}, ...]"""
+    rows = np.flatnonzero(np.asarray(table["ids"]).astype(str) == candidate_id)
+    if len(rows) == 0:
+        return []
+    profiles = [entry["fit"] for entry in features["jobs"]]
+    relevance = None
+    if features["vectors"] is not None:
+        row_vectors = shortlists._row_vectors(
+            table, vector_index.load("candidates"), rows
+        )
+        relevance = shortlists.semantic_relevance(
+            features["vectors"], row_vectors, features["cutoffs"]
+        )
+    model = ltr.load() if ltr.exists() else None
+    total, breakdown = shortlists._score_block(table, profiles, rows, relevance, model)
+
+    # 同じ候補者の行が複数あれば、求人ごとに最高点の行を使う
+    best = np.argmax(total, axis=1)
+    jobs_idx = np.arange(len(profiles))
+    total = total[jobs_idx, best]
+    excluded = _excluded_jobs(candidate_id, features["job_ids"])
+
+    results = []
+    for j in np.argsort(-total, kind="stable"):
+        if len(results) >= k:
+            break
+        entry = features["jobs"][j]
+        if entry["id"] in excluded:
+            continue
+        parts = {
+            name: round(float(values[j, best[j]]), 3)
+            for name, values in breakdown.items()
+        }
+        results.append(
+            {
+                "id": entry["id"],
+                "title": entry["title"],
+                "company": entry["company"],
+                "total": round(float(total[j]), 4),
+                "fit": fit.weighted(parts),
+                "parts": parts,
+            }
+        )
+    return results
+
+
+def job_records(entries: list) -> list:
+    """上位の求人のレコード（求人の列ファイルがあれば該当行だけ、なければ1回の走査で読む）"""
+    ids = [entry["id"] for entry in entries]
+    found = {}
+    if columnar.exists("jobs"):
+        jobs_table = columnar.attach("jobs")
+        job_ids = np.asarray(jobs_table["ids"]).astype(str)
+        rows = {}
+        for row in np.flatnonzero(np.isin(job_ids, ids)):
+            rows.setdefault(job_ids[row], int(row))
+        found = dict(zip(rows, columnar.records_at(jobs_table, rows.values())))
+    missing = [rid for rid in ids if rid not in found]
+    if missing:
+        for record in select_records("jobs", missing):
+            found[record_id(record, "jobs")] = record
+    rescored = ltr.exists()
+    records = []
+    for entry in entries:
+        if entry["id"] not in found:
+            continue
+        record = {
+            **found[entry["id"]],
+            "_fit": entry["fit"],
+            "_fit_breakdown": entry["parts"],
+        }
+        if rescored:
+            record["_ltr"] = entry["total"]
+        records.append(record)
+    return records
+
+
+def jobs_prompt(candidate_id: str, ulid: str, n_jobs: int, count: int) -> str:
+    """上位の求人の説明・ランク付けのプロンプト"""
+    return f"""候補者ID「{candidate_id}」に合う求人を、事前に選んだ上位{n_jobs}件の中から評価してください。セッションID: {ulid}
+
+- 候補者: `output/{ulid}/chunks/target_candidate.ndjson`
+- 求人: `output/{ulid}/chunks/filtered_jobs.ndjson`（{n_jobs}件、適合度の高い順）
+
+求人はPython側で全求人の適合度を計算して選んであります。`data/` の求人ファイルを読み直したり、
+追加で検索したりする必要はありません。候補者がすでに応募済みの求人と、選考中の企業の求人は除外済みです。
+
+- `_fit`: 候補者への適合度（0〜1、計算済み）
+- `_fit_breakdown`: 適合度の内訳（各0〜1）: relevance=意味的な類似度, skill=求人スキルの充足率, salary=希望年収が上限内か, location=勤務地, remote=働き方, recency=候補者の更新日の新しさ
+- `_ltr`: 過去のマッチング結果から学習した A+/A 判定の見込み（0〜1。ある場合はこの順に並んでいます）
+- 候補者の `_summary` は長い自由記述の要約。全文が必要なときだけ MCP の get(id) で読むこと
+
+機械的な照合は `_fit_breakdown` で済んでいます。候補者の経験・志向と求人の業務内容・要件の対応関係を読んで、
+上位{count}件までを選び（合わない求人は外してよい）、なぜ合うのかを具体的な事実で説明してください。
+
+**禁止事項:**
+- ❌ `data/` の `jobs.ndjson` や `candidates.ndjson` を直接Readツールで読み込むこと
+- ❌ Taskツールで並列処理
+- ❌ 親ディレクトリ（../）へのアクセス
+"""
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) < 2:
+        print("Usage: uv run jobs_for.py <CANDIDATE_ID> [COUNT] [--dry-run] [--fresh]")
+        print("       uv run jobs_for.py build")
+        print("Example: uv run jobs_for.py 003P00000000000 5")
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        print("🧾 求人の特徴量を更新中...")
+        refresh()
+        return
+
+    candidate_id = sys.argv[1].strip()
+    count = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 10
+    count = min(count, MAX_JOBS)
+
+    if not columnar.exists("candidates"):
+        print("❌ 列ファイルがありません: candidates")
+        print("   uv run bin/columnar.py build を実行してください")
+        sys.exit(1)
+
+    # download.py からは refresh() だけを使うので、ULID はここで読み込む
+    from ulid import ULID
+
+    project_root = Path(__file__).parent.parent
+    workspace_dir = project_root / "workspace"
+    ulid = str(ULID())
+    work_dir = workspace_dir / "output" / ulid
+    chunks_dir = work_dir / "chunks"
+
+    # 同じ候補者・同じデータ・同じモデルの結果があれば OpenCode を実行せずに返す
+    cache_key = result_cache.cache_key(
+        {"type": "jobs_for", "candidate_id": candidate_id, "count": count},
+        PROMPT_VERSION,
+    )
+    dry_run = "--dry-run" in sys.argv
+    if not dry_run and "--fresh" not in sys.argv:
+        cached = result_cache.lookup(cache_key, work_dir)
+        if cached:
+            created = datetime.fromtimestamp(cached["created_at"]).strftime("%H:%M")
+            print(f"⚡ キャッシュから応答（{created} の結果、--fresh で再実行）")
+            print(f"🆔 Process ID (ULID): {ulid}")
+            sys.exit(0)
+
+    start = time.perf_counter()
+    features = load()
+    if features is None:
+        print("🧾 求人の特徴量がないか古いため作成中...")
+        refresh()
+        features = load()
+    table = columnar.attach("candidates")
+    entries = top_jobs(table, candidate_id, features, count)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if not entries:
+        print(f"❌ 候補者が見つかりません: {candidate_id}")
+        sys.exit(1)
+    print(
+        f"🧮 全{len(features['jobs'])}求人を採点: 上位{len(entries)}件（{elapsed_ms:.0f}ms）"
+    )
+
+    if dry_run:
+        for entry in entries:
+            detail = " ".join(f"{k}={v}" for k, v in entry["parts"].items())
+            print(
+                f"{entry['id']}\t{entry['total']}\t{entry['title']}（{entry['company']}）\t{detail}"
+            )
+        sys.exit(0)
+
+    row = int(np.flatnonzero(np.asarray(table["ids"]).astype(str) == candidate_id)[0])
+    candidate = columnar.record_at(table, row)
+    target = [dict(candidate)]
+    summaries.apply(target)
+    write_ndjson(target, chunks_dir / "target_candidate.ndjson")
+    records = job_records(entries)
+    write_ndjson(records, chunks_dir / "filtered_jobs.ndjson")
+
+    request = {
+        "type": "jobs_for",
+        "candidate_id": candidate_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    (work_dir / "request.json").write_text(
+        json.dumps(request, ensure_ascii=False), encoding="utf-8"
+    )
+
+    print(f"📍 Working directory: {workspace_dir}")
+    print(f"🆔 Process ID (ULID): {ulid}")
+    print(f"👤 Candidate ID: {candidate_id}")
+    print(f"📊 Count: {count}件")
+    print()
+
+    opencode_model = os.getenv("OPENCODE_MODEL", "opencode/grok-code")
+    print(f"🤖 OpenCode Model: {opencode_model}")
+    prompt = jobs_prompt(candidate_id, ulid, len(records), count)
+    opencode_cmd = [
+        "opencode",
+        "run",
+        "--model",
+        opencode_model,
+        prompt + "\n" + render.result_prompt("jobs", ulid),
+    ]
+    result = subprocess.run(opencode_cmd, cwd=workspace_dir, check=False)
+
+    # 評価（result.json）からサマリーと CSV を作成
+    name = pick_field(candidate, ("氏名", "名前"), candidate_id)
+    n_rendered = render.render(work_dir, "jobs", f"{name}（{candidate_id}）に合う求人")
+    if n_rendered >= 0:
+        print(f"📝 レポート作成: {n_rendered}件")
+    if result.returncode == 0:
+        result_cache.store(cache_key, work_dir)
+
+    sys.exit(result.returncode)
+
+
+if __name__ == "__main__":
+    main()
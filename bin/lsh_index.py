@@ -0,0 +1,367 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+MinHash LSH Index
+
+レコードのトークン集合（英単語・日本語bigram）の MinHash 署名を作り、
+バンド分割した LSH で「似ている候補者・求人」をミリ秒で引く。
+求人検索結果のほぼ重複した求人（同じ企業の量産求人など）をまとめるのにも使う。
+インデックスは download.py の取り込み時に workspace/index/lsh/<kind>/ に作成する。
+
+Usage:
+    uv run bin/lsh_index.py build
+    uv run bin/lsh_index.py similar J-0000023845 --top 10
+"""
+
+import json
+import sys
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import segments
+from records import (
+    INDEX_DIR,
+    JOB_ID_RE,
+    KINDS,
+    iter_records,
+    pick_field,
+    record_id,
+    record_text,
+    tokenize,
+)
+
+LSH_DIR = INDEX_DIR / "lsh"
+
+# 署名長 = バンド数 × バンドあたりの行数
+NUM_BANDS = 32
+BAND_ROWS = 4
+NUM_PERM = NUM_BANDS * BAND_ROWS
+
+# ほぼ重複とみなす推定Jaccard類似度
+DUPLICATE_THRESHOLD = 0.8
+
+# 重複をまとめる範囲（同じ企業の求人同士だけをまとめる）
+DUPLICATE_GROUP_FIELDS = {"jobs": ("企業ID", "企業名")}
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0)
+_HASH_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 63, BAND_ROWS, dtype=np.uint64) | np.uint64(1)
+_EMPTY = np.full(NUM_PERM, _PRIME, dtype=np.uint32)
+
+
+def signature(text: str) -> np.ndarray:
+    """テキストの MinHash 署名（uint32 × NUM_PERM）"""
+    tokens = set(tokenize(text))
+    if not tokens:
+        return _EMPTY.copy()
+    hashes = np.fromiter(
+        (zlib.crc32(t.encode()) & _PRIME for t in tokens),
+        dtype=np.uint64,
+        count=len(tokens),
+    )
+    permuted = (np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def record_signatures(records, kind: str):
+    """レコードごとの署名（同じIDの行は和集合の署名にまとめる）
+
+    Returns: (ID一覧, 署名行列)
+    """
+    merged = {}
+    for record in records:
+        rid = record_id(record, kind)
+        sig = signature(record_text(record))
+        merged[rid] = np.minimum(merged[rid], sig) if rid in merged else sig
+    ids = list(merged)
+    if not ids:
+        return ids, np.zeros((0, NUM_PERM), dtype=np.uint32)
+    return ids, np.stack([merged[rid] for rid in ids])
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """署名をバンドごとのハッシュキー（N × NUM_BANDS）に変換"""
+    bands = signatures.astype(np.uint64).reshape(-1, NUM_BANDS, BAND_ROWS)
+    return (bands * _BAND_MIX).sum(axis=2)
+
+
+def similarity(signatures: np.ndarray, sig: np.ndarray) -> np.ndarray:
+    """署名の一致率（推定Jaccard類似度）"""
+    return (signatures == sig).mean(axis=-1)
+
+
+# ─────────────────────────── インデックス ───────────────────────────
+
+
+def _kind_dir(kind: str, lsh_dir: Path = LSH_DIR) -> Path:
+    return lsh_dir / kind
+
+
+def _write_segment(kind_dir: Path, segment: str, ids: list, signatures: np.ndarray):
+    """署名とバンド別のソート済みキー（二分探索用）を保存"""
+    keys = band_keys(signatures).T
+    order = np.argsort(keys, axis=1, kind="stable").astype(np.int32)
+    np.save(segments.segment_path(kind_dir, segment, ".npy"), signatures)
+    np.save(
+        segments.segment_path(kind_dir, segment, "_keys.npy"),
+        np.take_along_axis(keys, order, axis=1),
+    )
+    np.save(segments.segment_path(kind_dir, segment, "_order.npy"), order)
+    segments.segment_path(kind_dir, segment, "_ids.json").write_text(
+        json.dumps(ids, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def _read_segment(kind_dir: Path, segment: str) -> dict:
+    def load_array(suffix):
+        return np.load(segments.segment_path(kind_dir, segment, suffix), mmap_mode="r")
+
+    ids = json.loads(
+        segments.segment_path(kind_dir, segment, "_ids.json").read_text(
+            encoding="utf-8"
+        )
+    )
+    return {
+        "ids": ids,
+        "positions": {rid: i for i, rid in enumerate(ids)},
+        "signatures": load_array(".npy"),
+        "keys": load_array("_keys.npy"),
+        "order": load_array("_order.npy"),
+    }
+
+
+def build(kind: str, records, lsh_dir: Path = LSH_DIR) -> int:
+    """MinHash署名とLSHバンドを作成して保存（既存セグメントは破棄）"""
+    ids, signatures = record_signatures(records, kind)
+    kind_dir = _kind_dir(kind, lsh_dir)
+    kind_dir.mkdir(parents=True, exist_ok=True)
+    manifest = segments.reset(kind_dir)
+    segment = segments.next_segment(manifest)
+    if ids:
+        _write_segment(kind_dir, segment, ids, signatures)
+    segments.add_segment(manifest, segment, ids)
+    segments.save_manifest(kind_dir, manifest)
+
+    print(f"  🧬 {kind}: {len(ids)}件 × {NUM_PERM}署名")
+    return len(ids)
+
+
+def build_all(lsh_dir: Path = LSH_DIR):
+    """全種別のLSHインデックスを作成"""
+    for kind in KINDS:
+        build(kind, iter_records(kind), lsh_dir)
+
+
+def apply_delta(kind: str, records, deleted_ids=(), lsh_dir: Path = LSH_DIR):
+    """変更レコードの署名を差分セグメントとして追記する"""
+    kind_dir = _kind_dir(kind, lsh_dir)
+    manifest = segments.load_manifest(kind_dir)
+    ids, signatures = record_signatures(records, kind)
+    segment = segments.next_segment(manifest)
+    if ids:
+        _write_segment(kind_dir, segment, ids, signatures)
+    segments.add_segment(manifest, segment, ids, deleted_ids)
+    segments.save_manifest(kind_dir, manifest)
+    return manifest
+
+
+def compact(kind: str, force: bool = False, lsh_dir: Path = LSH_DIR) -> bool:
+    """墓標を除いた有効な署名を1セグメントにまとめる
+
+    Returns: コンパクションしたかどうか
+    """
+    kind_dir = _kind_dir(kind, lsh_dir)
+    manifest = segments.load_manifest(kind_dir)
+    if not manifest["segments"]:
+        return False
+    if not (force or segments.needs_compaction(manifest)):
+        return False
+
+    blocks = []
+    live_ids = []
+    for segment in manifest["segments"]:
+        seg = _read_segment(kind_dir, segment)
+        mask = segments.live_mask(manifest, segment, seg["ids"])
+        blocks.append(np.asarray(seg["signatures"])[mask])
+        live_ids.extend(rid for rid, live in zip(seg["ids"], mask) if live)
+
+    segment = segments.next_segment(manifest)
+    if live_ids:
+        _write_segment(kind_dir, segment, live_ids, np.concatenate(blocks))
+    segments.replace_all(kind_dir, manifest, segment, live_ids)
+    segments.save_manifest(kind_dir, manifest)
+    print(f"  🧹 {kind}: LSH {len(live_ids)}件に圧縮")
+    return True
+
+
+def exists(kind: str, lsh_dir: Path = LSH_DIR) -> bool:
+    return segments.manifest_path(_kind_dir(kind, lsh_dir)).exists()
+
+
+def load(kind: str, lsh_dir: Path = LSH_DIR) -> dict:
+    """インデックスを読み込む（配列はmmapで読み込み）"""
+    kind_dir = _kind_dir(kind, lsh_dir)
+    manifest = segments.load_manifest(kind_dir)
+    loaded = []
+    for segment in manifest["segments"]:
+        seg = _read_segment(kind_dir, segment)
+        seg["name"] = segment
+        seg["live"] = segments.live_mask(manifest, segment, seg["ids"])
+        loaded.append(seg)
+    return {"kind": kind, "latest": manifest["latest"], "segments": loaded}
+
+
+def lookup(index: dict, rid: str):
+    """インデックス内のレコード署名（なければ None）"""
+    segment = index["latest"].get(rid)
+    for seg in index["segments"]:
+        if seg["name"] == segment:
+            return np.asarray(seg["signatures"][seg["positions"][rid]])
+    return None
+
+
+def query(index: dict, sig: np.ndarray, top_k: int = 20, exclude=()) -> list:
+    """署名と同じバンドを持つレコードを推定類似度順に返す [(id, similarity), ...]"""
+    keys = band_keys(sig[None, :])[0]
+    exclude = set(exclude)
+    scored = {}
+    for seg in index["segments"]:
+        rows = set()
+        for band, key in enumerate(keys):
+            sorted_keys = seg["keys"][band]
+            lo = np.searchsorted(sorted_keys, key, side="left")
+            hi = np.searchsorted(sorted_keys, key, side="right")
+            rows.update(seg["order"][band][lo:hi].tolist())
+        rows = [r for r in rows if seg["live"][r] and seg["ids"][r] not in exclude]
+        if not rows:
+            continue
+        rows = np.array(sorted(rows))
+        sims = similarity(np.asarray(seg["signatures"][rows]), sig)
+        for r, s in zip(rows, sims):
+            scored[seg["ids"][r]] = float(s)
+    return sorted(scored.items(), key=lambda x: -x[1])[:top_k]
+
+
+def similar(kind: str, rid: str, top_k: int = 20, index: dict = None) -> list:
+    """IDのレコードに似たレコード [(id, similarity), ...]"""
+    index = index or load(kind)
+    sig = lookup(index, rid)
+    if sig is None:
+        return []
+    return query(index, sig, top_k, exclude=[rid])
+
+
+def guess_kind(rid: str) -> str:
+    """IDがどの種別のインデックスにあるかを推定"""
+    if JOB_ID_RE.fullmatch(rid):
+        return "jobs"
+    for kind in KINDS:
+        if exists(kind) and segments.load_manifest(_kind_dir(kind))["latest"].get(rid):
+            return kind
+    return None
+
+
+def collapse_duplicates(records, kind: str, threshold: float = DUPLICATE_THRESHOLD):
+    """ほぼ重複したレコードを先に出てきた1件にまとめる（順序維持）
+
+    求人は同じ企業の求人同士だけをまとめる。
+    まとめたレコードのIDは代表レコードの `_duplicates` に入れる。
+    署名はインデックスにあればそれを使い、なければその場で計算する。
+    """
+    records = list(records)
+    index = load(kind) if exists(kind) else None
+    group_fields = DUPLICATE_GROUP_FIELDS.get(kind)
+
+    kept = []
+    kept_signatures = []
+    buckets = defaultdict(list)
+    for record in records:
+        rid = record_id(record, kind)
+        sig = lookup(index, rid) if index else None
+        if sig is None:
+            sig = signature(record_text(record))
+
+        group = pick_field(record, group_fields, "") if group_fields else ""
+        keys = band_keys(sig[None, :])[0]
+        matched = None
+        for band, key in enumerate(keys.tolist()):
+            for i in buckets[(group, band, key)]:
+                if similarity(kept_signatures[i], sig) >= threshold:
+                    matched = i
+                    break
+            if matched is not None:
+                break
+
+        if matched is not None:
+            rep = kept[matched]
+            if rid != record_id(rep, kind):
+                rep.setdefault("_duplicates", []).append(rid)
+            continue
+
+        for band, key in enumerate(keys.tolist()):
+            buckets[(group, band, key)].append(len(kept))
+        kept.append(dict(record))
+        kept_signatures.append(sig)
+    return kept
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MinHash LSH 類似レコード検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="インデックス作成")
+    sub.add_parser("compact", help="差分セグメントを1つにまとめる")
+
+    similar_parser = sub.add_parser("similar", help="IDのレコードに似たレコード")
+    similar_parser.add_argument("id", help="候補者ID / 求人ID / 企業ID")
+    similar_parser.add_argument("--kind", choices=KINDS, help="種別（省略時は推定）")
+    similar_parser.add_argument("--top", type=int, default=20, help="上位件数")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🧬 LSHインデックス作成中...")
+        build_all()
+        print("✅ 作成完了")
+        return
+
+    if args.command == "compact":
+        for kind in KINDS:
+            if exists(kind):
+                compact(kind, force=True)
+        print("✅ 圧縮完了")
+        return
+
+    kind = args.kind or guess_kind(args.id)
+    if not kind or not exists(kind):
+        print(f"❌ インデックスにIDがありません: {args.id}")
+        print("   uv run bin/lsh_index.py build を実行してください")
+        sys.exit(1)
+
+    start = time.time()
+    index = load(kind)
+    results = similar(kind, args.id, args.top, index)
+    elapsed_ms = (time.time() - start) * 1000
+
+    if not results and lookup(index, args.id) is None:
+        print(f"❌ IDが見つかりません: {args.id}")
+        sys.exit(1)
+
+    for rid, score in results:
+        print(f"{score:.3f}\t{rid}")
+    print(f"⏱️  {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
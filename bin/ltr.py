@@ -0,0 +1,420 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy", "scikit-learn"]
+# ///
+"""
+Learning-to-Rank Prefilter
+
+過去の候補者マッチング（workspace/output/<ulid>/）で LLM が A+/A と判定した候補者を正例、
+LLM に渡したが選ばれなかった候補者と、事前フィルタの候補（プール）のうち渡さなかった候補者の一部を負例として、
+求人×候補者の特徴量（fit.py の内訳・ランク・スキル一致数）にロジスティック回帰を学習する。
+candidate.py は学習済みモデルがあれば適合度の代わりにこのスコアで候補者を並べ、
+検証データで A+/A の再現率が TARGET_RECALL に届く件数まで LLM に渡す件数を減らす。
+
+モデルは係数だけを workspace/index/ltr/model.json に保存し、推論は NumPy だけで行う。
+キーワード（BM25・意味検索）の順位・適合度との比較を report.md に書き出す。
+
+検索の関連度はセッションごとに candidate.py が保存したプール（chunks/prefilter_pool.json）から
+そのとき実際に使った値を復元する（LLM に渡したかどうかから作ると正解が特徴量に漏れる）。
+
+Usage:
+    uv run bin/ltr.py train
+    uv run bin/ltr.py report
+    uv run bin/ltr.py score J-0000023845 --top 20
+"""
+
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import fit
+from records import INDEX_DIR, WORKSPACE_DIR, find_record, record_id
+
+LTR_DIR = INDEX_DIR / "ltr"
+OUTPUT_DIR = WORKSPACE_DIR / "output"
+
+# 事前フィルタのプール（セッションの chunks/ に保存）
+POOL_FILE = "prefilter_pool.json"
+
+# 正例とする LLM の判定
+POSITIVE_RANKS = ("A+", "A")
+
+# プールのうち LLM に渡さなかった候補者からセッションごとに加える負例の数
+UNSHOWN_NEGATIVES = 200
+
+# 検証に回すセッションの割合（新しいセッションから）
+VALIDATION_RATIO = 0.2
+
+# LLM に渡す件数は、検証データでこの再現率に届く最小の件数にする
+TARGET_RECALL = 0.95
+
+# 学習に必要な最少セッション数
+MIN_SESSIONS = 5
+
+# レポートで比べる上位件数
+REPORT_CUTOFFS = (10, 20, 40, 100)
+
+FEATURES = (
+    "relevance",
+    "skill",
+    "salary",
+    "location",
+    "remote",
+    "recency",
+    "skill_count",
+    "rank_s",
+    "rank_a",
+)
+
+
+def features(table: dict, profile: dict, relevance=None):
+    """全行の特徴量行列（行数 × FEATURES）と適合度を計算する"""
+    total, breakdown = fit.score(table, profile, relevance)
+    wanted = columnar.skill_mask(profile["skills"])
+    if wanted and table["skills"] is not None:
+        skill_count = fit._popcount(np.asarray(table["skills"]) & np.uint32(wanted))
+    else:
+        skill_count = np.zeros(table["size"])
+    ranks = np.asarray(table["codes"]["rank"])
+    columns = {
+        **breakdown,
+        "skill_count": skill_count,
+        "rank_s": np.isin(ranks, fit._codes(table, "rank", ["S"])),
+        "rank_a": np.isin(ranks, fit._codes(table, "rank", ["A"])),
+    }
+    matrix = np.column_stack(
+        [np.asarray(columns[name], dtype=np.float64) for name in FEATURES]
+    )
+    return matrix, total
+
+
+def predict(model: dict, matrix: np.ndarray) -> np.ndarray:
+    """A+/A と判定される確率"""
+    z = (matrix - model["mean"]) / model["scale"]
+    return 1.0 / (1.0 + np.exp(-(z @ model["coef"] + model["intercept"])))
+
+
+def predict_columns(model: dict, columns: dict) -> np.ndarray:
+    """特徴量ごとの配列（同じ形ならどんな形でもよい）から確率を計算する（shortlists.py の一括計算用）"""
+    z = model["intercept"]
+    for i, name in enumerate(FEATURES):
+        values = np.asarray(columns[name], dtype=np.float64)
+        z = z + (values - model["mean"][i]) / model["scale"][i] * model["coef"][i]
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def exists(ltr_dir: Path = LTR_DIR) -> bool:
+    return (ltr_dir / "model.json").exists()
+
+
+def load(ltr_dir: Path = LTR_DIR) -> dict:
+    model = json.loads((ltr_dir / "model.json").read_text(encoding="utf-8"))
+    for key in ("mean", "scale", "coef"):
+        model[key] = np.array(model[key])
+    return model
+
+
+def rescorer(model: dict):
+    """fit.top_candidates の並べ替えに使う関数（全行の確率を返す）"""
+
+    def rescore(table, profile, relevance):
+        matrix, _ = features(table, profile, relevance)
+        return predict(model, matrix)
+
+    return rescore
+
+
+# ─────────────────────────── 学習データ ───────────────────────────
+
+
+def save_pool(chunks_dir: Path, ids, relevance):
+    """事前フィルタの候補（ID と検索の関連度）をセッションに保存する（学習で関連度を復元するため）"""
+    pool = {
+        "ids": [str(rid) for rid in ids],
+        "relevance": [round(float(v), 4) for v in relevance],
+    }
+    (chunks_dir / POOL_FILE).write_text(json.dumps(pool), encoding="utf-8")
+
+
+def _read_pool(path: Path):
+    if not path.exists():
+        return None
+    pool = json.loads(path.read_text(encoding="utf-8"))
+    return pool if pool.get("ids") else None
+
+
+def _read_ids(path: Path) -> list:
+    if not path.exists():
+        return []
+    ids = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                ids.append(record_id(json.loads(line), "candidates"))
+    return ids
+
+
+def _read_picks(path: Path, known_ids: set) -> dict:
+    """matching.csv から 候補者ID → 判定（A+/A/B）"""
+    picks = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            rid = next(
+                (v.strip() for v in row.values() if v and v.strip() in known_ids), None
+            )
+            rank = next(
+                (
+                    str(v).strip().upper()
+                    for k, v in row.items()
+                    if k
+                    and "ランク" in k
+                    and v
+                    and str(v).strip().upper() in ("A+", "A", "B")
+                ),
+                None,
+            )
+            if rid and rank:
+                picks.setdefault(rid, rank)
+    return picks
+
+
+def load_sessions(table: dict, output_dir: Path = OUTPUT_DIR) -> list:
+    """request.json・matching.csv・プールがそろった候補者マッチングのセッション（古い順）"""
+    known_ids = {str(rid) for rid in np.asarray(table["ids"])}
+    sessions = []
+    for session_dir in sorted(p for p in Path(output_dir).glob("*") if p.is_dir()):
+        request_file = session_dir / "request.json"
+        csv_file = session_dir / "matching.csv"
+        if not request_file.exists() or not csv_file.exists():
+            continue
+        try:
+            request = json.loads(request_file.read_text(encoding="utf-8"))
+            picks = _read_picks(csv_file, known_ids)
+            pool = _read_pool(session_dir / "chunks" / POOL_FILE)
+        except (json.JSONDecodeError, csv.Error, UnicodeDecodeError):
+            continue
+        if request.get("type") != "candidate" or not picks or pool is None:
+            continue
+        sessions.append(
+            {
+                "id": session_dir.name,
+                "job_id": request["job_id"],
+                "shown": _read_ids(
+                    session_dir / "chunks" / "filtered_candidates.ndjson"
+                ),
+                "picks": picks,
+                "pool": pool,
+            }
+        )
+    return sessions
+
+
+def _session_rows(table: dict, session: dict, rng):
+    """セッションの特徴量・ラベル・全行のスコア（評価用）"""
+    job = find_record("jobs", session["job_id"])
+    if job is None:
+        return None
+    profile = fit.job_profile(job)
+    pool = session["pool"]
+    relevance = fit.id_relevance(table, pool["ids"], pool["relevance"])
+    matrix, total = features(table, profile, relevance)
+
+    ids = np.asarray(table["ids"])
+    positive = np.isin(
+        ids, [rid for rid, r in session["picks"].items() if r in POSITIVE_RANKS]
+    )
+    shown = np.isin(ids, session["shown"]) | np.isin(ids, list(session["picks"]))
+    # 負例は同じプールから選ぶ（プールの外は事前フィルタの時点で候補になっていない）
+    unshown = np.flatnonzero(np.isin(ids, pool["ids"]) & ~shown)
+    sampled = rng.choice(unshown, min(UNSHOWN_NEGATIVES, len(unshown)), replace=False)
+    rows = np.union1d(np.flatnonzero(shown), sampled)
+    return {
+        "X": matrix[rows],
+        "y": positive[rows].astype(int),
+        "matrix": matrix,
+        "fit": total,
+        "relevance": relevance,
+        "positive": positive,
+        "ids": ids,
+    }
+
+
+def _recall_at(scores: np.ndarray, data: dict, k: int) -> float:
+    """スコア上位K名（同じ候補者の行は1名）に含まれる正例の割合"""
+    wanted = set(data["ids"][data["positive"]])
+    if not wanted:
+        return None
+    picked = set()
+    for row in np.argsort(-scores, kind="stable"):
+        if len(picked) >= k:
+            break
+        picked.add(data["ids"][row])
+    return len(wanted & picked) / len(wanted)
+
+
+def _mean(values) -> float:
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else 0.0
+
+
+def train(output_dir: Path = OUTPUT_DIR, ltr_dir: Path = LTR_DIR) -> dict:
+    """過去のセッションから学習し、モデルと評価レポートを保存する"""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    table = columnar.attach("candidates")
+    rng = np.random.default_rng(0)
+    # 求人が終了してデータにないセッションは除く
+    data = [_session_rows(table, s, rng) for s in load_sessions(table, output_dir)]
+    data = [d for d in data if d is not None]
+    if len(data) < MIN_SESSIONS:
+        print(
+            f"⚠️ 学習できるセッションが{len(data)}件しかありません（{MIN_SESSIONS}件以上必要）"
+        )
+        return None
+
+    n_valid = max(1, int(len(data) * VALIDATION_RATIO))
+    train_data, valid_data = data[:-n_valid], data[-n_valid:]
+
+    X = np.vstack([d["X"] for d in train_data])
+    y = np.concatenate([d["y"] for d in train_data])
+    if y.min() == y.max():
+        print("⚠️ 学習データに正例・負例の両方がありません")
+        return None
+    scaler = StandardScaler().fit(X)
+    scale = np.where(scaler.scale_ > 0, scaler.scale_, 1.0)
+    classifier = LogisticRegression(class_weight="balanced", max_iter=1000)
+    classifier.fit((X - scaler.mean_) / scale, y)
+
+    model = {
+        "features": list(FEATURES),
+        "mean": scaler.mean_,
+        "scale": scale,
+        "coef": classifier.coef_[0],
+        "intercept": float(classifier.intercept_[0]),
+    }
+
+    # 検証セッションで、キーワード順位・適合度・学習モデルの再現率を比べる
+    scorers = {
+        "キーワード（BM25+意味検索）": lambda d: d["relevance"],
+        "適合度（fit.py）": lambda d: d["fit"],
+        "学習モデル（ltr.py）": lambda d: predict(model, d["matrix"]),
+    }
+    cutoffs = sorted(set(REPORT_CUTOFFS) | {fit.LLM_CANDIDATES})
+    recalls = {
+        name: {
+            k: _mean(_recall_at(score(d), d, k) for d in valid_data) for k in cutoffs
+        }
+        for name, score in scorers.items()
+    }
+
+    # 目標の再現率に届く最小の件数（届かなければ LLM_CANDIDATES のまま）
+    shortlist = fit.LLM_CANDIDATES
+    for k in range(5, fit.LLM_CANDIDATES + 1, 5):
+        recall = _mean(
+            _recall_at(predict(model, d["matrix"]), d, k) for d in valid_data
+        )
+        if recall >= TARGET_RECALL:
+            shortlist = k
+            break
+    model["shortlist"] = shortlist
+
+    ltr_dir.mkdir(parents=True, exist_ok=True)
+    saved = {
+        k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in model.items()
+    }
+    saved["trained_at"] = datetime.now().isoformat(timespec="seconds")
+    saved["sessions"] = {"train": len(train_data), "valid": len(valid_data)}
+    (ltr_dir / "model.json").write_text(
+        json.dumps(saved, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    report = _report(saved, recalls, cutoffs, int(y.sum()), len(y))
+    (ltr_dir / "report.md").write_text(report, encoding="utf-8")
+    print(report)
+    return model
+
+
+def _report(model: dict, recalls: dict, cutoffs, n_positive: int, n_rows: int) -> str:
+    lines = [
+        "# 候補者事前フィルタの評価",
+        "",
+        f"- 学習日時: {model['trained_at']}",
+        f"- セッション: 学習 {model['sessions']['train']} / 検証 {model['sessions']['valid']}（新しい順に検証）",
+        f"- 学習データ: {n_rows}行（正例 {n_positive}: LLMの判定 {' / '.join(POSITIVE_RANKS)}）",
+        f"- LLMに渡す件数: {model['shortlist']}名（検証の再現率 {TARGET_RECALL:.0%} 以上）",
+        "",
+        "## A+/A 判定の再現率（上位K名）",
+        "",
+        "| 事前フィルタ | " + " | ".join(f"@{k}" for k in cutoffs) + " |",
+        "|---" * (len(cutoffs) + 1) + "|",
+    ]
+    for name, by_k in recalls.items():
+        lines.append(
+            f"| {name} | " + " | ".join(f"{by_k[k]:.2f}" for k in cutoffs) + " |"
+        )
+    lines += ["", "## 係数（標準化後）", ""]
+    for name, coef in sorted(
+        zip(model["features"], model["coef"]), key=lambda x: -abs(x[1])
+    ):
+        lines.append(f"- {name}: {coef:+.3f}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="候補者事前フィルタの学習")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("train", help="過去のセッションから学習")
+    sub.add_parser("report", help="評価レポートを表示")
+    score_parser = sub.add_parser("score", help="求人に対する候補者の順位")
+    score_parser.add_argument("job_id")
+    score_parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if not columnar.exists("candidates"):
+        print("❌ 列ファイルがありません: candidates")
+        print("   uv run bin/columnar.py build を実行してください")
+        sys.exit(1)
+
+    if args.command == "train":
+        print("🎓 学習中...")
+        if train() is None:
+            sys.exit(1)
+        print("✅ 学習完了")
+        return
+
+    if not exists():
+        print("❌ 学習済みモデルがありません")
+        print("   uv run bin/ltr.py train を実行してください")
+        sys.exit(1)
+
+    if args.command == "report":
+        print((LTR_DIR / "report.md").read_text(encoding="utf-8"))
+        return
+
+    job = find_record("jobs", args.job_id)
+    if job is None:
+        print(f"❌ 求人が見つかりません: {args.job_id}")
+        sys.exit(1)
+    table = columnar.attach("candidates")
+    start = time.perf_counter()
+    results = fit.top_candidates(
+        table, fit.job_profile(job), args.top, rescore=rescorer(load())
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for row, total, parts in results:
+        print(f"{table['ids'][row]}\t{total}\t{parts}")
+    print(f"⏱️  {table['size']}行 / {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Map-Reduce LLM Evaluation
+
+候補者を推定トークン数で詰め合わせたチャンクに分け、チャンクごとに別の opencode を
+同時実行して評価させ（map）、各チャンクの評価を1つのランキングにまとめる（reduce）。
+1回の opencode に渡す量が抑えられるため、より多くの候補者を短い時間で評価できる。
+
+- map:    chunks/map_XX.ndjson を評価し chunks/map_XX_result.json に保存させる
+- reduce: 評価をランク・点数順にまとめ、上位を元のレコードと合わせて返す
+"""
+
+import json
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from planner import CHARS_PER_TOKEN
+from records import record_id, write_ndjson
+
+# 1チャンクあたりの入力トークンの上限
+MAP_CHUNK_TOKENS = int(os.environ.get("MAP_CHUNK_TOKENS", "40000"))
+
+# 同時に実行する opencode の数
+MATCH_CONCURRENCY = int(os.environ.get("MATCH_CONCURRENCY", "4"))
+
+# 1回の map の制限時間（秒）
+MAP_TIMEOUT_SEC = 900
+
+# 各チャンクから選ばせる候補者数
+MAP_PICKS = 10
+
+# ランクの並び順（C は見送りとして reduce に渡さない）
+RANK_ORDER = {"A+": 0, "A": 1, "B": 2}
+
+
+def record_tokens(record: dict) -> int:
+    """レコードをLLMに渡すときの推定トークン数"""
+    return int(len(json.dumps(record, ensure_ascii=False)) / CHARS_PER_TOKEN) + 1
+
+
+def pack(records: list, budget: int = MAP_CHUNK_TOKENS) -> list:
+    """順序を保ったまま、推定トークン数が budget 以下のチャンクに詰める"""
+    chunks = []
+    current = []
+    used = 0
+    for record in records:
+        tokens = record_tokens(record)
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(record)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def write_chunks(chunks: list, chunks_dir: Path) -> list:
+    """チャンクを map_XX.ndjson に書き出し、(入力, 結果) のパス一覧を返す"""
+    paths = []
+    for i, chunk in enumerate(chunks, 1):
+        source = chunks_dir / f"map_{i:02d}.ndjson"
+        write_ndjson(chunk, source)
+        paths.append((source, chunks_dir / f"map_{i:02d}_result.json"))
+    return paths
+
+
+def run_parallel(commands: list, cwd: Path, concurrency: int = MATCH_CONCURRENCY):
+    """opencode のコマンドを同時実行数を制限して実行し、終了コードの一覧を返す"""
+
+    def run(command):
+        try:
+            return subprocess.run(
+                command, cwd=cwd, check=False, timeout=MAP_TIMEOUT_SEC
+            ).returncode
+        except subprocess.TimeoutExpired:
+            return -1
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        return list(pool.map(run, commands))
+
+
+def read_result(path: Path) -> list:
+    """map の結果 [{"id", "rank", "score", "reason"}, ...]（読めなければ None）"""
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("candidates", [])
+    return [item for item in data if isinstance(item, dict) and item.get("id")]
+
+
+def merge(chunks: list, results: list, kind: str, top_k: int) -> tuple:
+    """各チャンクの評価を1つのランキングにまとめる
+
+    評価できなかったチャンクは、先頭（事前フィルタの上位）MAP_PICKS 件を未評価のまま末尾に残す
+    （top_k 件に満たない分だけ）。
+    C（見送り）の候補者は除く。
+    Returns: (上位レコード, 評価できなかったチャンク数)
+    """
+    evaluated = []
+    unevaluated = []
+    failed = 0
+    for chunk, result in zip(chunks, results):
+        by_id = {record_id(r, kind): r for r in chunk}
+        if result is None:
+            failed += 1
+            unevaluated.extend(chunk[:MAP_PICKS])
+            continue
+        for item in result:
+            record = by_id.get(str(item["id"]))
+            if record is None:
+                continue
+            rank = str(item.get("rank", "")).strip().upper()
+            if rank == "C":
+                continue
+            evaluated.append(
+                {
+                    **record,
+                    "_map_rank": rank,
+                    "_map_score": item.get("score"),
+                    "_map_reason": item.get("reason", ""),
+                }
+            )
+
+    def sort_key(record):
+        score = record["_map_score"]
+        score = float(score) if isinstance(score, (int, float)) else 0.0
+        return (RANK_ORDER.get(record["_map_rank"], len(RANK_ORDER)), -score)
+
+    evaluated.sort(key=sort_key)
+    # 評価できた候補者を優先し、空いた枠だけ未評価の候補者で埋める
+    merged = evaluated[:top_k]
+    merged += unevaluated[: top_k - len(merged)]
+    return merged, failed
@@ -0,0 +1,263 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["mcp>=1.2,<2", "numpy", "scikit-learn"]
+# ///
+"""
+Matching MCP Server
+
+workspace/ の OpenCode エージェントに、取り込み時に作ったインデックスを使う
+検索・取得ツールを stdio の MCP サーバーとして提供する。
+大きな NDJSON を grep / Read で読む代わりに、件数・サイズに上限のある呼び出しで済ませる。
+workspace/opencode.json から読み込まれる（OpenCode が起動時に立ち上げる）。
+
+ツール:
+- search(query, kind, filters, k): キーワード（類義語展開）+ 意味検索、ファセットで絞り込み
+- get(id, fields, kind): 1件のレコード（フィールド指定可）
+- facets(query, kind): ヒットのファセット別件数
+- similar(id, kind, k): MinHash LSH で似たレコード
+
+Usage:
+    uv run bin/mcp_server.py
+"""
+
+import numpy as np
+from mcp.server.fastmcp import FastMCP
+
+import columnar
+import facets as facet_index
+import lsh_index
+import vector_index
+from ranking import rank_records
+from records import KINDS, find_record, record_id, select_records
+from scan import keyword_hits
+
+# 1回の呼び出しで返す最大件数
+MAX_RESULTS = 50
+
+# 一覧（search / similar）で返す各フィールドの最大文字数
+SUMMARY_CHARS = 80
+
+# get で返す各フィールドの最大文字数
+FIELD_CHARS = 2000
+
+# ファセットごとに返す値の数
+FACET_VALUES = 10
+
+mcp = FastMCP("openmatching")
+
+# 種別ごとの列ファイルと ID → 行番号（サーバーの起動中は使い回す）
+_tables = {}
+
+
+def _check_kind(kind: str):
+    if kind not in KINDS:
+        raise ValueError(f"kind は {' / '.join(KINDS)} のいずれか: {kind}")
+
+
+def _truncate(value, limit: int):
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + "…"
+    return value
+
+
+def _compact(record: dict, limit: int, fields=None) -> dict:
+    """空のフィールドを除き、長い値を切り詰める"""
+    return {
+        key: _truncate(value, limit)
+        for key, value in record.items()
+        if value not in (None, "") and (not fields or key in fields)
+    }
+
+
+def _table(kind: str):
+    if kind not in _tables:
+        table = columnar.attach(kind)
+        rows = {str(rid): i for i, rid in enumerate(np.asarray(table["ids"]))}
+        _tables[kind] = (table, rows)
+    return _tables[kind]
+
+
+def _fetch(kind: str, ids) -> dict:
+    """ID → レコード（列ファイルがあれば該当行だけを読む）"""
+    ids = list(dict.fromkeys(ids))
+    if not columnar.exists(kind):
+        return {record_id(r, kind): r for r in select_records(kind, ids)}
+    table, rows = _table(kind)
+    found = [rid for rid in ids if rid in rows]
+    records = columnar.records_at(table, [rows[rid] for rid in found])
+    return dict(zip(found, records))
+
+
+def _guess_kind(rid: str) -> str:
+    kind = lsh_index.guess_kind(rid)
+    if kind:
+        return kind
+    for kind in KINDS:
+        if columnar.exists(kind) and rid in _table(kind)[1]:
+            return kind
+    raise ValueError(f"IDが見つかりません: {rid}")
+
+
+def _apply_filters(kind: str, ids: list, filters: dict) -> list:
+    if not filters:
+        return ids
+    if not facet_index.exists(kind):
+        raise ValueError(f"ファセットインデックスがありません: {kind}")
+    index = facet_index.load(kind)
+    for facet, value in filters.items():
+        if facet not in facet_index.FACET_LABELS:
+            raise ValueError(
+                f"filters のキーは {' / '.join(facet_index.FACET_LABELS)} のいずれか: {facet}"
+            )
+        ids = facet_index.filter_ids(index, ids, facet, value)
+    return ids
+
+
+@mcp.tool()
+def search(
+    query: str,
+    kind: str = "jobs",
+    filters: dict[str, str] | None = None,
+    k: int = 20,
+) -> dict:
+    """求人・企業・候補者を検索する（関連度順、最大50件）
+
+    query の全語（類義語を含む）を含むレコードを BM25 で並べ、足りなければ意味検索で補う。
+    filters はファセット条件（例: {"remote": "フルリモート", "salary": "700〜999万円"}）。
+    値は facets ツールの結果にあるものを使う。長いフィールドは80文字で切り詰める（全文は get）。
+
+    Args:
+        query: 検索クエリ（例: "Python フルリモート"）
+        kind: jobs / companies / candidates
+        filters: ファセット名 → 値（industry, rank, location, remote, salary, skill, stage, size）
+        k: 返す件数（1〜50）
+    """
+    _check_kind(kind)
+    k = max(1, min(k, MAX_RESULTS))
+
+    hits = keyword_hits(kind, query)
+    by_id = {record_id(r, kind): r for r in hits}
+    ids = _apply_filters(kind, list(by_id), filters)
+    total = len(ids)
+
+    ranked = rank_records([by_id[rid] for rid in ids], query, kind, top_k=k)
+    results = [
+        {
+            "id": record_id(r, kind),
+            "_score": round(score, 4),
+            **_compact(r, SUMMARY_CHARS),
+        }
+        for score, r in ranked
+    ]
+
+    # キーワードで足りない分は意味検索（表記揺れ・類義語）で補う
+    if len(results) < k and vector_index.exists(kind):
+        seen = {r["id"] for r in results}
+        semantic = [
+            (rid, score)
+            for rid, score in vector_index.search(kind, query, k * 2)[0]
+            if rid not in seen
+        ]
+        keep = set(_apply_filters(kind, [rid for rid, _ in semantic], filters))
+        semantic = [(rid, score) for rid, score in semantic if rid in keep]
+        records = _fetch(kind, [rid for rid, _ in semantic[: k - len(results)]])
+        results.extend(
+            {
+                "id": rid,
+                "_semantic": round(score, 4),
+                **_compact(records[rid], SUMMARY_CHARS),
+            }
+            for rid, score in semantic
+            if rid in records
+        )
+
+    return {
+        "query": query,
+        "kind": kind,
+        "keyword_total": total,
+        "results": results[:k],
+    }
+
+
+@mcp.tool()
+def get(id: str, fields: list[str] | None = None, kind: str | None = None) -> dict:
+    """IDで1件のレコードを取得する（各フィールド最大2000文字）
+
+    Args:
+        id: 求人ID（J-0000023845）・企業ID・個人ユーザーID
+        fields: 返すフィールド名（省略時はすべて）
+        kind: jobs / companies / candidates（省略時はIDから推定）
+    """
+    kind = kind or _guess_kind(id)
+    _check_kind(kind)
+    record = _fetch(kind, [id]).get(id)
+    if record is None:
+        record = find_record(kind, id)
+    if record is None:
+        raise ValueError(f"レコードが見つかりません: {id}")
+    return {"id": id, "kind": kind, "record": _compact(record, FIELD_CHARS, fields)}
+
+
+@mcp.tool()
+def facets(query: str, kind: str = "jobs") -> dict:
+    """検索ヒットのファセット別件数（絞り込み条件の候補）
+
+    返った facet / value は search の filters にそのまま使える。
+
+    Args:
+        query: 検索クエリ
+        kind: jobs / companies / candidates
+    """
+    _check_kind(kind)
+    ids = [record_id(r, kind) for r in keyword_hits(kind, query)]
+    result = {"query": query, "kind": kind, "total": len(ids), "facets": {}}
+    if not ids or not facet_index.exists(kind):
+        return result
+
+    grouped = {}
+    for (facet, value), count in facet_index.counts(
+        facet_index.load(kind), ids
+    ).items():
+        grouped.setdefault(facet, []).append({"value": value, "count": count})
+    for facet, values in grouped.items():
+        values.sort(key=lambda v: -v["count"])
+        result["facets"][facet] = values[:FACET_VALUES]
+    return result
+
+
+@mcp.tool()
+def similar(id: str, kind: str | None = None, k: int = 10) -> dict:
+    """IDのレコードに内容が似たレコード（MinHash の推定類似度順、最大50件）
+
+    Args:
+        id: 求人ID・企業ID・個人ユーザーID
+        kind: jobs / companies / candidates（省略時はIDから推定）
+        k: 返す件数（1〜50）
+    """
+    kind = kind or _guess_kind(id)
+    _check_kind(kind)
+    if not lsh_index.exists(kind):
+        raise ValueError(f"LSHインデックスがありません: {kind}")
+    k = max(1, min(k, MAX_RESULTS))
+
+    hits = lsh_index.similar(kind, id, k)
+    records = _fetch(kind, [rid for rid, _ in hits])
+    results = [
+        {
+            "id": rid,
+            "_similarity": round(float(sim), 3),
+            **_compact(records[rid], SUMMARY_CHARS),
+        }
+        for rid, sim in hits
+        if rid in records
+    ]
+    return {"id": id, "kind": kind, "results": results}
+
+
+def main():
+    """メイン処理"""
+    mcp.run()
+
+
+if __name__ == "__main__":
+    main()
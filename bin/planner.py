@@ -0,0 +1,313 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Query Planner
+
+取り込み時に作る語の文書頻度（workspace/index/stats/<kind>.json）から
+検索クエリの各語のヒット件数を見積もり、実行経路を選ぶ。
+
+- direct:  ヒットが表示件数以下 → そのままレポート作成
+- choices: ヒットが表示件数の5倍超 → 絞り込み候補（choices.json）を返して終了（LLM不使用）
+- narrow:  LLMに渡す量がトークン予算を超える → BM25上位に絞ってからLLMへ
+- llm:     それ以外 → ヒットをLLMで選別
+
+job.py / company.py / candidate.py の --dry-run で、段階ごとの見積もり件数・
+LLM入力トークン・所要時間を表示する（値は目安）。
+
+Usage:
+    uv run bin/planner.py build
+    uv run bin/planner.py jobs "フルリモート" 10
+"""
+
+import json
+import math
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+
+import fit
+import synonyms
+from records import INDEX_DIR, KINDS, iter_records, record_text, tokenize
+
+STATS_DIR = INDEX_DIR / "stats"
+
+# LLMに渡す入力トークンの上限（超える場合は narrow 経路で件数を絞る）
+LLM_TOKEN_BUDGET = int(os.environ.get("LLM_TOKEN_BUDGET", "150000"))
+
+# 見積もり用の定数（目安）
+CHARS_PER_TOKEN = 2.0  # 日本語混じりのJSON
+PROMPT_TOKENS = 3000  # 指示文・出力形式の説明
+OUTPUT_TOKENS_PER_ITEM = 300  # レポート1件あたりの出力
+LLM_INPUT_TOKENS_PER_SEC = 2000
+LLM_OUTPUT_TOKENS_PER_SEC = 50
+LLM_OVERHEAD_SEC = 15  # 起動・ツール呼び出し
+SCAN_BYTES_PER_SEC = 300 * 1024 * 1024  # 列ファイルのキーワード走査（1コア）
+JSON_ROWS_PER_SEC = 40000  # NDJSONの直接走査
+BM25_ROWS_PER_SEC = 6000
+
+# choices 経路に切り替える倍率（表示件数のN倍超）
+CHOICES_RATIO = 5
+
+
+def _path(kind: str, stats_dir: Path = STATS_DIR) -> Path:
+    return stats_dir / f"{kind}.json"
+
+
+def text_key(record: dict, kind: str) -> str:
+    """build が数える検索対象テキスト（これが変わらなければ語の統計は同じ）"""
+    return record_text(record)
+
+
+def build(kind: str, stats_dir: Path = STATS_DIR) -> dict:
+    """語（英単語・日本語bigram）ごとの文書頻度とレコードの平均サイズを保存
+
+    種別の全件を読み直すので、コストは件数に比例する。incremental.py は text_key の
+    値が変わった種別だけ作り直す。avg_chars（レコード全体の平均サイズ）は見積もりの
+    目安なので、テキスト以外の項目だけの変更では前回の値のまま使う。
+    """
+    df = Counter()
+    n_docs = 0
+    total_chars = 0
+    total_text_bytes = 0
+    for record in iter_records(kind):
+        text = record_text(record)
+        df.update(set(tokenize(text)))
+        n_docs += 1
+        total_chars += len(json.dumps(record, ensure_ascii=False))
+        total_text_bytes += len(text.encode("utf-8"))
+
+    stats = {
+        "kind": kind,
+        "size": n_docs,
+        "avg_chars": total_chars / n_docs if n_docs else 0,
+        "text_bytes": total_text_bytes,
+        # 1件しか出ない語は見積もりにほぼ影響しないので省く
+        "df": {t: c for t, c in df.items() if c > 1},
+    }
+    stats_dir.mkdir(parents=True, exist_ok=True)
+    _path(kind, stats_dir).write_text(
+        json.dumps(stats, ensure_ascii=False), encoding="utf-8"
+    )
+    print(f"  📈 {kind}: {n_docs}件 / {len(stats['df'])}語")
+    return stats
+
+
+def build_all(stats_dir: Path = STATS_DIR):
+    for kind in KINDS:
+        build(kind, stats_dir)
+
+
+def exists(kind: str, stats_dir: Path = STATS_DIR) -> bool:
+    return _path(kind, stats_dir).exists()
+
+
+def load(kind: str, stats_dir: Path = STATS_DIR) -> dict:
+    return json.loads(_path(kind, stats_dir).read_text(encoding="utf-8"))
+
+
+def estimate_term(stats: dict, term: str) -> int:
+    """語を含むレコード数の見積もり（構成トークンの文書頻度の最小値）"""
+    tokens = set(tokenize(term))
+    if not tokens:
+        return stats["size"]
+    # 統計にない語は1件以下
+    return min(stats["df"].get(t, 1) for t in tokens)
+
+
+def estimate_group(stats: dict, group) -> int:
+    """言い換えのいずれかを含むレコード数の見積もり（重なりは無視して合計）
+
+    ほかの言い換えを部分文字列に含む語（フルリモート ⊃ フルリモ）は数えない。
+    """
+    group = [t for t in group if not any(o != t and o in t for o in group)]
+    return min(sum(estimate_term(stats, t) for t in group), stats["size"])
+
+
+def estimate_rows(stats: dict, groups) -> int:
+    """全語を含むレコード数の見積もり（語の独立性を仮定）
+
+    groups: 語ごとの言い換えの一覧（synonyms.expand）
+    """
+    n_docs = stats["size"]
+    if not groups or n_docs == 0:
+        return 0
+    counts = [estimate_group(stats, g) for g in groups]
+    return int(round(n_docs * math.prod(c / n_docs for c in counts)))
+
+
+def llm_tokens(stats: dict, rows: int) -> int:
+    """レコードをLLMに渡すときの入力トークン数の見積もり"""
+    return int(PROMPT_TOKENS + rows * stats["avg_chars"] / CHARS_PER_TOKEN)
+
+
+def budget_rows(stats: dict, budget: int = LLM_TOKEN_BUDGET) -> int:
+    """トークン予算内でLLMに渡せるレコード数"""
+    per_row = max(stats["avg_chars"] / CHARS_PER_TOKEN, 1.0)
+    return max(int((budget - PROMPT_TOKENS) / per_row), 1)
+
+
+def llm_seconds(input_tokens: int, output_items: int) -> float:
+    return (
+        LLM_OVERHEAD_SEC
+        + input_tokens / LLM_INPUT_TOKENS_PER_SEC
+        + output_items * OUTPUT_TOKENS_PER_ITEM / LLM_OUTPUT_TOKENS_PER_SEC
+    )
+
+
+def _scan_seconds(stats: dict, parallel: bool) -> float:
+    if parallel:
+        workers = int(os.environ.get("SCAN_WORKERS", "0")) or os.cpu_count() or 1
+        return stats["text_bytes"] / SCAN_BYTES_PER_SEC / workers
+    return stats["size"] / JSON_ROWS_PER_SEC
+
+
+def _stage(name: str, rows: int, seconds: float, tokens: int = 0) -> dict:
+    return {"name": name, "rows": rows, "seconds": seconds, "tokens": tokens}
+
+
+def plan_search(kind: str, query: str, count: int, columnar_ready=False) -> dict:
+    """キーワード検索（job.py / company.py）の実行計画"""
+    stats = load(kind)
+    groups = synonyms.expand(query)
+    rows = estimate_rows(stats, groups)
+    cap = budget_rows(stats)
+
+    stages = [
+        _stage("キーワード走査", stats["size"], _scan_seconds(stats, columnar_ready)),
+        _stage("意味検索", count * CHOICES_RATIO, 0.05),
+    ]
+    if rows > count * CHOICES_RATIO:
+        path = "choices"
+        stages.append(_stage("ファセット絞り込み候補", rows, 0.05))
+        llm_rows = 0
+    elif rows and rows <= count:
+        # ヒットからテンプレートでレポートを作る（render.keyword_report）
+        path = "direct"
+        stages[-1] = _stage("テンプレートでレポート作成", rows, 0.05)
+        llm_rows = 0
+    else:
+        path = "llm"
+        llm_rows = rows + count * CHOICES_RATIO
+        if llm_rows > cap:
+            path = "narrow"
+            stages.append(
+                _stage("BM25で上位に絞り込み", rows, rows / BM25_ROWS_PER_SEC)
+            )
+            llm_rows = cap
+
+    tokens = llm_tokens(stats, llm_rows) if llm_rows else 0
+    if tokens:
+        stages.append(_stage("LLM", llm_rows, llm_seconds(tokens, count), tokens))
+
+    return {
+        "kind": kind,
+        "query": query,
+        "count": count,
+        "terms": [(" / ".join(g), estimate_group(stats, g)) for g in groups],
+        "estimated_rows": rows,
+        "path": path,
+        "llm_rows": llm_rows,
+        "stages": stages,
+        "llm_tokens": tokens,
+        "seconds": sum(s["seconds"] for s in stages),
+    }
+
+
+def plan_matching(top_k: int, vector_ready=False, fit_ready=False) -> dict:
+    """候補者マッチング（candidate.py）の実行計画
+
+    候補者のトークン予算に収まるよう、事前フィルタの上位件数（top_k）と
+    LLMに渡す件数（llm_rows）を決める。適合度スコア（fit.py）が使えれば
+    事前フィルタは関連度の計算だけに使い、LLMには適合度の上位だけを渡す。
+    """
+    stats = load("candidates")
+    cap = budget_rows(stats)
+    llm_rows = min(top_k, cap)
+    if fit_ready:
+        path = "fit"
+        llm_rows = min(llm_rows, fit.LLM_CANDIDATES)
+    else:
+        path = "narrow" if top_k > cap else "llm"
+        top_k = llm_rows
+
+    stages = [
+        _stage(
+            "BM25ランキング",
+            stats["size"],
+            stats["size"] / BM25_ROWS_PER_SEC,
+        )
+    ]
+    if vector_ready:
+        stages.append(_stage("意味ベクトル検索", stats["size"], 0.05))
+    stages.append(_stage("選考中の候補者を除外", top_k, 0.01))
+    if fit_ready:
+        stages.append(_stage("適合度スコア", stats["size"], 0.05))
+    tokens = llm_tokens(stats, llm_rows)
+    stages.append(_stage("LLM", llm_rows, llm_seconds(tokens, 20), tokens))
+
+    return {
+        "kind": "candidates",
+        "path": path,
+        "top_k": top_k,
+        "estimated_rows": stats["size"],
+        "llm_rows": llm_rows,
+        "stages": stages,
+        "llm_tokens": tokens,
+        "seconds": sum(s["seconds"] for s in stages),
+    }
+
+
+PATH_LABELS = {
+    "direct": "直接レポート（ヒットが表示件数以下・LLM不使用）",
+    "choices": "絞り込み候補を返す（LLM不使用）",
+    "narrow": "BM25で件数を絞ってからLLM（トークン予算超過）",
+    "llm": "ヒットをLLMで選別",
+    "fit": "適合度スコアの上位だけをLLMへ（説明文の作成）",
+}
+
+
+def print_plan(plan: dict):
+    """実行計画を表示"""
+    print("🗺️ 実行計画（見積もり）")
+    for term, rows in plan.get("terms", []):
+        print(f"  語「{term}」: 約{rows}件")
+    print(f"  推定ヒット: 約{plan['estimated_rows']}件")
+    print(f"  経路: {PATH_LABELS[plan['path']]}")
+    for i, stage in enumerate(plan["stages"], 1):
+        tokens = f" / 入力 約{stage['tokens']:,}トークン" if stage["tokens"] else ""
+        print(
+            f"  {i}. {stage['name']}: {stage['rows']:,}件 / 約{stage['seconds']:.1f}秒"
+            f"{tokens}"
+        )
+    print(f"  LLM入力: 約{plan['llm_tokens']:,}トークン（予算 {LLM_TOKEN_BUDGET:,}）")
+    print(f"  所要時間: 約{plan['seconds']:.0f}秒")
+    print()
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        print("📈 語の統計を作成中...")
+        build_all()
+        print("✅ 作成完了")
+        return
+
+    if len(sys.argv) < 3 or sys.argv[1] not in KINDS:
+        print("Usage: uv run bin/planner.py build")
+        print("       uv run bin/planner.py <jobs|companies> <QUERY> [COUNT]")
+        sys.exit(1)
+
+    kind, query = sys.argv[1], sys.argv[2]
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    if not exists(kind):
+        print(f"❌ 統計がありません: {kind}")
+        print("   uv run bin/planner.py build を実行してください")
+        sys.exit(1)
+    print_plan(plan_search(kind, query, count))
+
+
+if __name__ == "__main__":
+    main()
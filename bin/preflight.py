@@ -0,0 +1,282 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+Preflight Check
+
+ボットのキューに積む前・OpenCode を起動する前に、依頼が成立するかをローカルの索引だけで確かめる
+（標準ライブラリのみ・1秒未満。ボットのプロセス内からも呼べる）。
+
+- 求人ID・候補者ID: 取り込み時のスナップショット（workspace/index/snapshot.json）にあるか。
+  なければデータファイルを mmap で文字列検索し、どこにも現れなければ「存在しない」と判定する
+- 検索クエリ: 列ファイルの検索用テキスト（columns/<kind>/text.bin）から、
+  類義語で展開した語ごとのヒット件数と AND のヒット件数を数える（scan.keyword_hits と同じ判定）。
+  0件なら、ヒットする語だけに絞ったクエリを提案する
+
+索引がない・データより古いときは判定せずに通す（本処理側で従来どおり扱う）。
+
+Usage:
+    uv run bin/preflight.py candidate J-0000023845 23846
+    uv run bin/preflight.py jobs-for 003P00000000000
+    uv run bin/preflight.py job "Pythonエンジニア フルリモート"
+    uv run bin/preflight.py company "SaaS系スタートアップ"
+"""
+
+import ast
+import bisect
+import json
+import mmap
+import sys
+import time
+from array import array
+from pathlib import Path
+
+import synonyms
+from records import INDEX_DIR, data_files, query_terms
+
+SNAPSHOT_PATH = INDEX_DIR / "snapshot.json"
+COLUMN_DIR = INDEX_DIR / "columns"
+
+# 表示用の名前と単位
+LABELS = {
+    "candidates": ("候補者", "人"),
+    "jobs": ("求人", "件"),
+    "companies": ("企業", "社"),
+}
+
+_snapshot = {"mtime": None, "ids": {}}
+
+
+def _snapshot_ids(kind: str) -> set:
+    """スナップショットのレコードID（ファイルが変わったときだけ読み直す）"""
+    if not SNAPSHOT_PATH.exists():
+        return set()
+    mtime = SNAPSHOT_PATH.stat().st_mtime
+    if _snapshot["mtime"] != mtime:
+        snapshot = json.loads(SNAPSHOT_PATH.read_text(encoding="utf-8"))
+        _snapshot["ids"] = {k: set(v.get("hashes", {})) for k, v in snapshot.items()}
+        _snapshot["mtime"] = mtime
+    return _snapshot["ids"].get(kind, set())
+
+
+def _file_contains(path: Path, needles: list) -> set:
+    """ファイルに現れる文字列（mmap で検索。空ファイルは mmap できない）"""
+    if path.stat().st_size == 0:
+        return set()
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return {n for n in needles if m.find(n.encode("utf-8")) >= 0}
+
+
+def missing_ids(kind: str, ids) -> list:
+    """データのどこにも現れないID（find_record で見つからないことが確実なもの）"""
+    known = _snapshot_ids(kind)
+    unknown = [i for i in ids if i not in known]
+    files = data_files(kind)
+    if not unknown or not files:
+        return []
+    found = set()
+    for path in files:
+        found |= _file_contains(path, [i for i in unknown if i not in found])
+    return [i for i in unknown if i not in found]
+
+
+def normalize_job_id(job_id: str):
+    """求人IDを正規化（不明な形式は None）"""
+    # 数字のみの場合は J- プレフィックスを追加
+    if job_id.isdigit():
+        return f"J-{int(job_id):010d}"
+    # J- で始まる場合・006で始まる求人票IDはそのまま
+    if job_id.startswith(("J-", "006")):
+        return job_id
+    return None
+
+
+def split_job_ids(job_ids) -> tuple:
+    """求人IDを1件ずつ確かめる
+
+    Returns: (形式が正しくデータにある求人ID, 問題のあったIDのメッセージ（なければ None）)
+    """
+    bad = [i for i in job_ids if normalize_job_id(i) is None]
+    valid = [i for i in job_ids if normalize_job_id(i) is not None]
+    missing = set(missing_ids("jobs", [normalize_job_id(i) for i in valid]))
+    found = [i for i in valid if normalize_job_id(i) not in missing]
+    messages = []
+    if bad:
+        messages.append(
+            f"❌ 不明なID形式: {', '.join(bad)}\n"
+            "対応形式: J-0000023845 / 23845 / 006RA00000HzHwb"
+        )
+    if missing:
+        messages.append(
+            "❌ 求人が見つかりません: "
+            + ", ".join(normalize_job_id(i) for i in valid if i not in found)
+        )
+    return found, "\n".join(messages) or None
+
+
+def check_job_ids(job_ids) -> str | None:
+    """求人IDの形式と存在を確かめる（問題があればメッセージ）"""
+    return split_job_ids(job_ids)[1]
+
+
+def check_candidate_id(candidate_id: str) -> str | None:
+    """候補者IDの存在を確かめる（問題があればメッセージ）"""
+    if missing_ids("candidates", [candidate_id]):
+        return f"❌ 候補者が見つかりません: {candidate_id}"
+    return None
+
+
+# ───────────────────────────── 検索クエリ ─────────────────────────────
+
+
+def _read_int64_npy(path: Path) -> array:
+    """np.save した1次元の int64 配列を NumPy なしで読む"""
+    data = path.read_bytes()
+    if data[:6] != b"\x93NUMPY":
+        raise ValueError(f"not a .npy file: {path}")
+    if data[6] == 1:
+        header_len, start = int.from_bytes(data[8:10], "little"), 10
+    else:
+        header_len, start = int.from_bytes(data[8:12], "little"), 12
+    header = ast.literal_eval(data[start : start + header_len].decode("latin1"))
+    if header["descr"] != "<i8" or len(header["shape"]) != 1:
+        raise ValueError(f"unexpected dtype or shape: {header}")
+    values = array("q")
+    values.frombytes(data[start + header_len :])
+    return values
+
+
+def _text_index(kind: str):
+    """公開中の検索用テキストと行の開始位置（なし・データより古ければ None）"""
+    current = COLUMN_DIR / kind / "CURRENT"
+    files = data_files(kind)
+    if not current.exists() or not files:
+        return None
+    # 内容の変わらない取り込みでは列ファイルは作り直さず、スナップショットだけ保存される
+    synced = current.stat().st_mtime
+    if SNAPSHOT_PATH.exists():
+        synced = max(synced, SNAPSHOT_PATH.stat().st_mtime)
+    if max(p.stat().st_mtime for p in files) > synced:
+        return None
+    version_dir = COLUMN_DIR / kind / current.read_text().strip()
+    try:
+        return (
+            (version_dir / "text.bin").read_bytes(),
+            _read_int64_npy(version_dir / "text_offsets.npy"),
+        )
+    except (OSError, ValueError):
+        return None
+
+
+def _group_rows(text: bytes, offsets: array, group) -> set:
+    """言い換えのいずれかを含む行（1行に1回見つかれば次の行へ進む）"""
+    rows = set()
+    for term in group:
+        needle = term.encode("utf-8")
+        pos = text.find(needle)
+        while pos >= 0:
+            row = bisect.bisect_right(offsets, pos) - 1
+            # 行をまたいだ一致は数えない
+            if pos + len(needle) <= offsets[row + 1]:
+                rows.add(row)
+                pos = text.find(needle, offsets[row + 1])
+            else:
+                pos = text.find(needle, pos + 1)
+    return rows
+
+
+def query_hits(kind: str, query: str) -> dict | None:
+    """クエリの語ごと・全体（AND）のヒット件数（索引がなければ None）"""
+    index = _text_index(kind)
+    if index is None:
+        return None
+    text, offsets = index
+    groups = synonyms.expand(query)
+    rows = [_group_rows(text, offsets, group) for group in groups]
+    return {
+        "terms": [{"term": group[0], "hits": len(r)} for group, r in zip(groups, rows)],
+        "rows": rows,
+        "hits": len(set.intersection(*rows)) if rows else 0,
+    }
+
+
+def suggest_query(result: dict) -> tuple | None:
+    """0件のクエリの代わりにヒットする語の組み合わせ（クエリ, 件数）
+
+    0件の語を取り除き、それでも0件なら1語ずつ外して件数が最も多いものを選ぶ。
+    """
+    terms = [t["term"] for t in result["terms"]]
+
+    def hits(indexes):
+        return len(set.intersection(*(result["rows"][i] for i in indexes)))
+
+    keep = [i for i, t in enumerate(result["terms"]) if t["hits"]]
+    if keep and len(keep) < len(terms) and hits(keep):
+        return " ".join(terms[i] for i in keep), hits(keep)
+    best = None
+    for drop in keep:
+        indexes = [i for i in keep if i != drop]
+        if indexes and hits(indexes) and (best is None or hits(indexes) > best[1]):
+            best = (" ".join(terms[i] for i in indexes), hits(indexes))
+    return best
+
+
+def check_query(kind: str, query: str) -> tuple:
+    """検索クエリのヒット件数を確かめる（問題があれば（メッセージ, 提案クエリ））"""
+    label, unit = LABELS[kind]
+    if not query_terms(query):
+        return "❌ 検索語がありません", None
+    result = query_hits(kind, query)
+    if result is None or result["hits"]:
+        return None, None
+    zero = [t["term"] for t in result["terms"] if not t["hits"]]
+    reason = (
+        f"「{'」「'.join(zero)}」を含む{label}がありません"
+        if zero
+        else "すべての語を同時に含むものがありません"
+    )
+    message = f"❌ 「{query}」に一致する{label}は0{unit}です（{reason}）"
+    suggestion = suggest_query(result)
+    if suggestion:
+        message += f"\n💡 「{suggestion[0]}」なら{suggestion[1]}{unit}あります"
+        return message, suggestion[0]
+    return message, None
+
+
+def check(command: str, args: list) -> tuple:
+    """コマンドの依頼が成立するか（問題があれば（メッセージ, 提案クエリ））"""
+    if command == "candidate":
+        return check_job_ids(args), None
+    if command == "jobs-for":
+        return check_candidate_id(args[0]), None
+    if command == "job":
+        return check_query("jobs", " ".join(args))
+    if command == "company":
+        return check_query("companies", " ".join(args))
+    return None, None
+
+
+def main():
+    """メイン処理"""
+    if len(sys.argv) < 3 or sys.argv[1] not in (
+        "candidate",
+        "jobs-for",
+        "job",
+        "company",
+    ):
+        print(__doc__)
+        sys.exit(1)
+
+    started = time.time()
+    message, _ = check(sys.argv[1], sys.argv[2:])
+    elapsed = (time.time() - started) * 1000
+    if message:
+        print(message)
+        print(f"⏱️ {elapsed:.0f}ms")
+        sys.exit(1)
+    print(f"✅ OK（{elapsed:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+BM25 Ranking Engine
+
+フィールド重み付きBM25（BM25F）でレコードをスコアリングし、上位K件を返す。
+職種・スキル欄を自由記述メモより重く扱い、登録ランクと最終更新日でブーストする。
+
+Usage:
+    uv run bin/ranking.py candidates "Python AWS バックエンド" --top 500
+    uv run bin/ranking.py jobs "フルリモート" --top 50 --output out.ndjson
+"""
+
+import heapq
+import math
+import sys
+from collections import Counter
+from datetime import datetime
+
+from records import (
+    field_weight,
+    iter_records,
+    record_rank,
+    record_updated_at,
+    text_fields,
+    tokenize,
+    write_ndjson,
+)
+
+K1 = 1.2
+B = 0.75
+
+# ランクブースト（登録時ランク・企業ランク）
+RANK_BOOST = {"S": 1.3, "A": 1.15, "B": 1.0}
+
+# 更新日ブースト（半減期 日数・最大上乗せ率）
+RECENCY_HALF_LIFE_DAYS = 90
+RECENCY_MAX_BOOST = 0.3
+
+
+def build_query(query, max_terms: int = 100) -> Counter:
+    """クエリ（文字列 / トークン列 / 重み付きdict）を重み付きトークンに変換"""
+    if isinstance(query, str):
+        terms = Counter(tokenize(query))
+    elif isinstance(query, dict):
+        terms = Counter(query)
+    else:
+        terms = Counter(query)
+    return Counter(dict(terms.most_common(max_terms)))
+
+
+def job_query(job: dict, max_terms: int = 100) -> Counter:
+    """求人レコードから検索クエリを作る（重いフィールドほど重視）"""
+    terms = Counter()
+    for key, value in text_fields(job).items():
+        weight = field_weight(key)
+        if weight < 1.0:
+            continue
+        for token in tokenize(value):
+            terms[token] += weight
+    # 長文求人で同じ語が繰り返されても支配的にならないよう対数で抑える
+    terms = Counter({t: 1.0 + math.log(w) for t, w in terms.items() if w >= 1.0})
+    return build_query(terms, max_terms)
+
+
+def boost(record: dict, kind: str, now: datetime = None) -> float:
+    """ランク・更新日ブースト"""
+    now = now or datetime.now()
+    factor = RANK_BOOST.get(record_rank(record, kind), 0.9)
+
+    updated_at = record_updated_at(record)
+    if updated_at:
+        age_days = max((now - updated_at).days, 0)
+        factor *= 1.0 + RECENCY_MAX_BOOST * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+    return factor
+
+
+def rank_records(records, query, kind: str, top_k: int = 500, use_boost=True):
+    """BM25Fで上位K件を返す [(score, record), ...]
+
+    1パス目で各フィールドのクエリ語頻度・長さ・文書頻度を集計し、
+    2パス目でスコアを計算してヒープで上位K件だけを保持する。
+    """
+    terms = build_query(query)
+    if not terms:
+        return []
+
+    docs = []
+    n_docs = 0
+    df = Counter()
+    field_len_total = Counter()
+    field_count = Counter()
+
+    for record in records:
+        fields = {}
+        seen = set()
+        for key, value in text_fields(record).items():
+            tokens = tokenize(value)
+            field_len_total[key] += len(tokens)
+            field_count[key] += 1
+            tf = Counter(t for t in tokens if t in terms)
+            if tf:
+                fields[key] = (tf, len(tokens))
+                seen.update(tf)
+        n_docs += 1
+        # クエリ語を含まないレコードはスコア0なので保持しない
+        if fields:
+            df.update(seen)
+            docs.append((record, fields))
+
+    if not docs:
+        return []
+
+    avg_len = {k: field_len_total[k] / field_count[k] for k in field_count}
+    idf = {t: math.log(1.0 + (n_docs - df[t] + 0.5) / (df[t] + 0.5)) for t in terms}
+    weights = {k: field_weight(k) for k in avg_len}
+    now = datetime.now()
+
+    def scored():
+        for i, (record, fields) in enumerate(docs):
+            pseudo_tf = Counter()
+            for key, (tf, length) in fields.items():
+                norm = 1.0 - B + B * length / max(avg_len[key], 1.0)
+                for t, c in tf.items():
+                    pseudo_tf[t] += weights[key] * c / norm
+            score = sum(terms[t] * idf[t] * f / (K1 + f) for t, f in pseudo_tf.items())
+            if use_boost:
+                score *= boost(record, kind, now)
+            yield score, i, record
+
+    top = heapq.nlargest(top_k, scored(), key=lambda x: (x[0], -x[1]))
+    return [(score, record) for score, _, record in top]
+
+
+def fuse_rankings(rankings, k: int = 60) -> list:
+    """複数のランキング（IDの並び）を Reciprocal Rank Fusion で1つに統合"""
+    scores = Counter()
+    for ranking in rankings:
+        for position, rid in enumerate(ranking):
+            scores[rid] += 1.0 / (k + position + 1)
+    return [rid for rid, _ in scores.most_common()]
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="BM25ランキング")
+    parser.add_argument("kind", choices=["candidates", "jobs", "companies"])
+    parser.add_argument("query", help="検索クエリ")
+    parser.add_argument("--top", type=int, default=500, help="上位件数")
+    parser.add_argument("--output", help="NDJSON出力先（省略時は標準出力）")
+    args = parser.parse_args()
+
+    ranked = rank_records(iter_records(args.kind), args.query, args.kind, args.top)
+
+    results = []
+    for score, record in ranked:
+        results.append({**record, "_score": round(score, 4)})
+
+    if args.output:
+        write_ndjson(results, args.output)
+        print(f"✅ 上位{len(results)}件を保存: {args.output}", file=sys.stderr)
+    else:
+        import json
+
+        for record in results:
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Record Utilities
+
+workspace/data/ の NDJSON レコードを読み込み、ID・テキスト・属性を取り出す共通処理。
+download.py が出力するカラム名（Salesforceレポート由来）を前提にする。
+"""
+
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+WORKSPACE_DIR = PROJECT_ROOT / "workspace"
+DATA_DIR = WORKSPACE_DIR / "data"
+INDEX_DIR = WORKSPACE_DIR / "index"
+
+KINDS = ("candidates", "jobs", "companies")
+
+# 求人ID（J-0000023845）
+JOB_ID_RE = re.compile(r"J-\d{10}")
+
+# ID候補カラム（先頭から順に探す）
+ID_FIELDS = {
+    "candidates": ["個人ユーザー/企業: 個人ユーザーID", "個人ユーザーID", "求職者ID"],
+    "jobs": ["求人ID", "求人票: 求人ID", "求人票ID"],
+    "companies": ["企業ID", "取引先ID", "個人ユーザー/企業: 企業ID"],
+}
+
+# ランクカラム
+RANK_FIELDS = {
+    "candidates": ["個人ユーザー/企業: 登録時ランク", "normalized_rank"],
+    "jobs": ["企業ランク", "normalized_rank"],
+    "companies": ["企業ランク", "normalized_rank"],
+}
+
+# 選考ステータス（候補者の行 × 求人）と、選考中とみなすステータス
+STATUS_FIELD = "選考ステータス"
+ACTIVE_STATUSES = (
+    "書類選考中",
+    "一次面接中",
+    "二次面接中",
+    "最終面接中",
+    "オファー面談中",
+)
+
+# 企業を指すカラム（ID優先、なければ企業名）
+COMPANY_ID_FIELDS = ["企業ID", "取引先ID", "個人ユーザー/企業: 企業ID"]
+COMPANY_NAME_FIELDS = ["企業名", "取引先名", "応募企業名"]
+
+# download.py が求人に結合した企業属性カラムの接頭辞（例: 「企業: 従業員数」）
+COMPANY_PREFIX = "企業: "
+
+UPDATED_FIELDS = ["最終更新日", "アンケート回答日時", "個人ユーザー/企業: 初回面談日時"]
+
+# フィールド重み（カラム名に含まれるキーワード → 重み）
+# 職種・スキルを重く、自由記述のメモは軽く扱う
+FIELD_WEIGHT_RULES = [
+    (("職種", "役職", "ポジション", "求人名", "タイトル"), 3.0),
+    (("スキル", "技術", "言語", "資格", "ツール"), 2.5),
+    (("経験", "業務内容", "仕事内容", "必須", "歓迎", "経歴"), 1.5),
+    (("メモ", "備考", "コメント", "所感", "詳細", "自由記述"), 0.5),
+]
+
+# テキストとして扱わないカラム
+SKIP_FIELD_KEYWORDS = ("ID", "URL", "日時", "日付", "更新日", "作成日")
+
+_ASCII_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+_CJK_RUN_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uff66-\uff9f]+")
+
+
+def data_files(kind: str, data_dir: Path = DATA_DIR) -> list:
+    """種別ごとのNDJSONファイル一覧"""
+    return sorted(Path(data_dir).glob(f"{kind}_*.ndjson"))
+
+
+def iter_records(kind: str, data_dir: Path = DATA_DIR):
+    """種別ごとのレコードを順に返す"""
+    for path in data_files(kind, data_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def load_records(kind: str, data_dir: Path = DATA_DIR) -> list:
+    """種別ごとのレコードをすべて読み込む"""
+    return list(iter_records(kind, data_dir))
+
+
+def find_record(kind: str, target_id: str, data_dir: Path = DATA_DIR):
+    """IDでレコードを1件探す（文字列一致で候補行を絞ってからパース）"""
+    fallback = None
+    for path in data_files(kind, data_dir):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if target_id not in line:
+                    continue
+                record = json.loads(line)
+                if record_id(record, kind) == target_id:
+                    return record
+                if fallback is None and target_id in (
+                    str(v) for v in record.values() if v is not None
+                ):
+                    fallback = record
+    return fallback
+
+
+def select_records(kind: str, ids, data_dir: Path = DATA_DIR) -> list:
+    """ID一覧に該当するレコードを、ID一覧の順序で返す"""
+    order = {rid: i for i, rid in enumerate(ids)}
+    found = {}
+    for record in iter_records(kind, data_dir):
+        rid = record_id(record, kind)
+        if rid in order and rid not in found:
+            found[rid] = record
+    return [found[rid] for rid in sorted(found, key=order.get)]
+
+
+def read_ndjson(path: Path) -> list:
+    """NDJSONファイルを読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_ndjson(records, output_path: Path):
+    """レコードをNDJSON形式で保存"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def pick_field(record: dict, keywords, default=None):
+    """カラム名にキーワードを含む最初の値を返す"""
+    for key, value in record.items():
+        if value is None or value == "":
+            continue
+        if any(k in key for k in keywords):
+            return value
+    return default
+
+
+def record_id(record: dict, kind: str) -> str:
+    """レコードIDを取得"""
+    for field in ID_FIELDS.get(kind, []):
+        value = record.get(field)
+        if value:
+            return str(value)
+
+    if kind == "jobs":
+        for value in record.values():
+            if isinstance(value, str) and JOB_ID_RE.fullmatch(value):
+                return value
+
+    for key, value in record.items():
+        if value and key.endswith("ID"):
+            return str(value)
+
+    return ""
+
+
+def record_rank(record: dict, kind: str) -> str:
+    """ランク（S/A/B...）を取得"""
+    for field in RANK_FIELDS.get(kind, []):
+        value = record.get(field)
+        if value:
+            return str(value).strip().upper()
+    return "UNKNOWN"
+
+
+def record_updated_at(record: dict):
+    """最終更新日時を取得（パースできなければ None）"""
+    for field in UPDATED_FIELDS:
+        value = record.get(field)
+        if not value:
+            continue
+        try:
+            return datetime.fromisoformat(str(value).replace("/", "-"))
+        except ValueError:
+            continue
+    return None
+
+
+def field_weight(key: str) -> float:
+    """カラム名からフィールド重みを決める"""
+    for keywords, weight in FIELD_WEIGHT_RULES:
+        if any(k in key for k in keywords):
+            return weight
+    return 1.0
+
+
+def text_fields(record: dict) -> dict:
+    """検索対象のテキストフィールドだけを取り出す"""
+    fields = {}
+    for key, value in record.items():
+        if value is None or key.startswith("_"):
+            continue
+        if any(k in key for k in SKIP_FIELD_KEYWORDS):
+            continue
+        if isinstance(value, str) and value.strip():
+            fields[key] = value
+    return fields
+
+
+def record_text(record: dict) -> str:
+    """検索対象テキストを1つの文字列に連結"""
+    return "\n".join(text_fields(record).values())
+
+
+_QUERY_TERM_RE = re.compile(r"[a-z0-9+#.\-]+|[^\sa-z0-9+#.\-]+")
+
+# 語頭・語尾に付く助詞・接尾辞（「SaaS系」「リモートの」など）
+_TERM_AFFIXES = "系のな・、。"
+
+
+def query_terms(query: str) -> list:
+    """検索クエリを語に分割（空白と、英数字・日本語の境界で区切る）
+
+    記号だけの語と英数字1文字の語（「O'Reilly」の「'」「o」など）は絞り込みに
+    ならないので除く。
+    """
+    terms = []
+    for term in _QUERY_TERM_RE.findall(query.lower()):
+        term = term.strip(_TERM_AFFIXES)
+        if not any(c.isalnum() for c in term):
+            continue
+        if len(term) == 1 and term.isascii():
+            continue
+        terms.append(term)
+    return terms
+
+
+def keyword_hits(kind: str, query: str, data_dir: Path = DATA_DIR, groups=None) -> list:
+    """クエリのすべての語を含むレコード（大文字小文字は区別しない）
+
+    groups: 語ごとの言い換えの一覧（synonyms.expand）。各グループのいずれかを含めば一致
+    """
+    if groups is None:
+        groups = [[term] for term in query_terms(query)]
+    if not groups:
+        return []
+    hits = []
+    for record in iter_records(kind, data_dir):
+        text = record_text(record).lower()
+        if all(any(term in text for term in group) for group in groups):
+            hits.append(record)
+    return hits
+
+
+def tokenize(text: str) -> list:
+    """英数字は単語、日本語は文字bigramに分割"""
+    text = text.lower()
+    tokens = _ASCII_TOKEN_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+# ───────────────────────────── 属性抽出 ─────────────────────────────
+
+PREFECTURES = """
+北海道 青森県 岩手県 宮城県 秋田県 山形県 福島県
+茨城県 栃木県 群馬県 埼玉県 千葉県 東京都 神奈川県
+新潟県 富山県 石川県 福井県 山梨県 長野県 岐阜県
+静岡県 愛知県 三重県 滋賀県 京都府 大阪府 兵庫県
+奈良県 和歌山県 鳥取県 島根県 岡山県 広島県 山口県
+徳島県 香川県 愛媛県 高知県 福岡県 佐賀県 長崎県
+熊本県 大分県 宮崎県 鹿児島県 沖縄県
+""".split()
+
+LOCATION_FIELD_KEYWORDS = ("勤務地", "所在地", "住所", "エリア", "居住地")
+STAGE_FIELD_KEYWORDS = ("資金調達", "ステージ")
+EMPLOYEE_FIELD_KEYWORDS = ("従業員",)
+SALARY_FIELD_KEYWORDS = ("年収", "給与", "月給", "報酬")
+INDUSTRY_FIELDS = ["mapped_industry", "業種"]
+
+# 働き方の分類（上から順に判定）
+REMOTE_RULES = [
+    ("フルリモート", re.compile(r"フルリモート|完全リモート|全国リモート|出社不要")),
+    (
+        "リモート併用",
+        re.compile(
+            r"週\s*[1-4１-４]\s*日?\s*出社|リモート可|ハイブリッド|一部リモート|リモート併用"
+        ),
+    ),
+    ("出社", re.compile(r"出社|常駐|リモート不可")),
+]
+
+# 年収帯（万円）
+SALARY_BANDS = [
+    ("〜499万円", 0, 499),
+    ("500〜699万円", 500, 699),
+    ("700〜999万円", 700, 999),
+    ("1000万円〜", 1000, 100000),
+]
+
+# 従業員規模（人）
+EMPLOYEE_BANDS = [
+    ("〜49名", 0, 49),
+    ("50〜299名", 50, 299),
+    ("300〜999名", 300, 999),
+    ("1000名〜", 1000, 10**9),
+]
+
+# スキルタグ（タグ → 正規表現）
+SKILL_TAGS = {
+    "Python": r"python|パイソン",
+    "Java": r"java(?!script)",
+    "Go": r"golang|\bgo\b|go言語",
+    "Ruby": r"ruby|rails",
+    "PHP": r"php|laravel",
+    "TypeScript": r"typescript",
+    "JavaScript": r"javascript|node\.?js",
+    "React": r"react",
+    "Vue": r"vue",
+    "AWS": r"aws|amazon web services",
+    "GCP": r"gcp|google cloud",
+    "Azure": r"azure",
+    "Kubernetes": r"kubernetes|k8s",
+    "Terraform": r"terraform",
+    "Linux": r"linux",
+    "SQL": r"sql|mysql|postgres",
+    "機械学習": r"機械学習|machine learning|深層学習|ディープラーニング",
+    "データ分析": r"データ分析|データサイエンス|bi\b",
+    "SRE": r"\bsre\b|インフラ|基盤",
+    "セキュリティ": r"セキュリティ|security",
+    "PM": r"プロジェクトマネージャ|プロジェクトマネジメント|\bpm\b|pmo",
+    "営業": r"営業|セールス|sales",
+    "マーケティング": r"マーケティング|marketing",
+    "人事": r"人事|採用",
+    "SaaS": r"saas",
+}
+_SKILL_RES = {tag: re.compile(p, re.IGNORECASE) for tag, p in SKILL_TAGS.items()}
+_MAN_YEN_RE = re.compile(r"(\d{3,4}(?:\.\d+)?)\s*万")
+_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _fields_text(record: dict, keywords) -> str:
+    return "\n".join(
+        str(v)
+        for k, v in record.items()
+        if v is not None and any(w in k for w in keywords)
+    )
+
+
+def record_industry(record: dict) -> str:
+    """業種"""
+    for field in INDUSTRY_FIELDS:
+        value = record.get(field)
+        if value:
+            return str(value)
+    return "other"
+
+
+def record_locations(record: dict) -> list:
+    """勤務地・所在地から都道府県を抽出"""
+    text = _fields_text(record, LOCATION_FIELD_KEYWORDS)
+    found = []
+    # 正式名称で一致した部分は取り除く（「東京都」の中の「京都」を拾わないため）
+    for pref in PREFECTURES:
+        if pref in text:
+            found.append(pref)
+            text = text.replace(pref, " ")
+    for pref in PREFECTURES:
+        short = pref if pref == "北海道" else pref[:-1]
+        if pref not in found and short in text:
+            found.append(pref)
+    return found
+
+
+def record_remote(record: dict):
+    """働き方（フルリモート / リモート併用 / 出社）
+
+    求人自体の記載を優先し、なければ結合した企業の働き方方針で判定する。
+    """
+    own = {k: v for k, v in record.items() if not k.startswith(COMPANY_PREFIX)}
+    for text in (record_text(own), record_text(record)):
+        for label, pattern in REMOTE_RULES:
+            if pattern.search(text):
+                return label
+    return None
+
+
+def record_stage(record: dict):
+    """資金調達ステージ（シリーズA / 上場 など）"""
+    value = pick_field(record, STAGE_FIELD_KEYWORDS)
+    return str(value).strip() if value else None
+
+
+def employee_band(record: dict):
+    """従業員規模ラベル"""
+    value = pick_field(record, EMPLOYEE_FIELD_KEYWORDS)
+    numbers = _NUMBER_RE.findall(str(value)) if value is not None else []
+    if not numbers:
+        return None
+    count = float(numbers[0].replace(",", ""))
+    for label, low, high in EMPLOYEE_BANDS:
+        if low <= count <= high:
+            return label
+    return None
+
+
+def parse_salary(value) -> list:
+    """年収表記から万円単位の数値を取り出す（円表記も万円に換算）"""
+    if value is None:
+        return []
+    if isinstance(value, (int, float)):
+        numbers = [float(value)]
+    else:
+        text = str(value)
+        man = [float(n) for n in _MAN_YEN_RE.findall(text)]
+        if man:
+            return man
+        numbers = [float(n.replace(",", "")) for n in _NUMBER_RE.findall(text)]
+    result = []
+    for n in numbers:
+        if n >= 100000:
+            n = n / 10000
+        if 100 <= n <= 10000:
+            result.append(n)
+    return result
+
+
+def record_salary(record: dict):
+    """年収レンジ（万円）を (下限, 上限) で返す"""
+    values = []
+    for key, value in record.items():
+        if any(k in key for k in SALARY_FIELD_KEYWORDS):
+            values.extend(parse_salary(value))
+    if not values:
+        return None
+    return (min(values), max(values))
+
+
+def record_desired_salary(record: dict):
+    """候補者の希望年収（万円。レンジなら下限）。現年収などの希望でない年収は使わない"""
+    values = []
+    for key, value in record.items():
+        if "希望" in key and any(k in key for k in SALARY_FIELD_KEYWORDS):
+            values.extend(parse_salary(value))
+    return min(values) if values else None
+
+
+def salary_band(salary) -> str:
+    """年収帯ラベル"""
+    if not salary:
+        return None
+    low = salary[0]
+    for label, band_low, band_high in SALARY_BANDS:
+        if band_low <= low <= band_high:
+            return label
+    return None
+
+
+def record_skills(record: dict) -> list:
+    """スキルタグを抽出"""
+    text = record_text(record)
+    return [tag for tag, pattern in _SKILL_RES.items() if pattern.search(text)]
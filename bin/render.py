@@ -0,0 +1,414 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+Result Renderer
+
+LLM が output/<ulid>/result.json に書いた評価（ID・ランク・短い理由・懸念点）から、
+Slack Canvas 用のサマリー（Markdown）と CSV をテンプレートで作る。
+LLM はレポートを書かずに済むので出力トークンが減り、書式は毎回同じになる。
+レコードの基本情報・Salesforce リンク・統計は Python 側でデータから埋める。
+
+result.json:
+    {"overview": "全体の所感", "items": [
+        {"id": "...", "rank": "A+", "summary": "1〜2文", "reasons": ["..."], "concerns": ["..."]}
+    ]}
+
+Usage:
+    uv run bin/render.py 01ARZ3NDEKTSV4RRFFQ69G5FAV candidates
+    uv run bin/render.py 01ARZ3NDEKTSV4RRFFQ69G5FAV jobs --title "Pythonエンジニア"
+
+検索のヒットが表示件数以下のときは keyword_report で LLM を使わずに result.json を作る
+（並びは BM25、理由はクエリの語が現れた項目。source: "keyword"）。
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import synonyms
+from ranking import rank_records
+from records import (
+    KINDS,
+    WORKSPACE_DIR,
+    parse_salary,
+    pick_field,
+    read_ndjson,
+    record_id,
+    select_records,
+    text_fields,
+)
+
+RESULT_FILE = "result.json"
+
+# 種別ごとの出力ファイル（bot.py が読む名前）
+OUTPUT_FILES = {
+    "candidates": ("matching_summary.md", "matching.csv"),
+    "jobs": ("jobs_summary.md", "jobs.csv"),
+    "companies": ("companies_summary.md", "companies.csv"),
+}
+
+# 種別ごとのIDの列名（ltr.py は matching.csv の「候補者ID」「ランク」を読む）
+ID_LABELS = {"candidates": "候補者ID", "jobs": "求人ID", "companies": "企業ID"}
+
+# 基本情報として表示する項目（表示名, カラム名に含まれるキーワード）
+PROFILE_FIELDS = {
+    "candidates": [
+        ("氏名", ("氏名", "名前")),
+        ("希望職種", ("希望職種",)),
+        ("経歴", ("現職", "職務経歴", "経歴")),
+        ("スキル", ("スキル",)),
+        ("年齢", ("年齢",)),
+        ("希望年収", ("希望年収",)),
+        ("希望勤務地", ("希望勤務地",)),
+        ("希望働き方", ("希望働き方",)),
+        ("最終更新日", ("最終更新日",)),
+    ],
+    "jobs": [
+        ("求人名", ("求人名", "タイトル")),
+        ("企業名", ("企業名", "取引先名")),
+        ("職種", ("職種",)),
+        ("年収", ("年収", "給与")),
+        ("勤務地", ("勤務地",)),
+        ("働き方", ("リモート", "働き方")),
+        ("必須スキル", ("必須",)),
+    ],
+    "companies": [
+        ("企業名", ("企業名", "取引先名")),
+        ("業種", ("業種",)),
+        ("従業員数", ("従業員数",)),
+        ("資金調達ステージ", ("資金調達",)),
+        ("働き方", ("働き方", "リモート")),
+        ("事業内容", ("事業内容",)),
+    ],
+}
+
+# Salesforce のレコードID（15/18桁）として使うカラム
+SALESFORCE_ID_FIELDS = {
+    "candidates": ("個人ユーザーID",),
+    "jobs": ("求人票ID",),
+    "companies": ("企業ID", "取引先ID"),
+}
+
+RANKS = ("A+", "A", "B")
+
+# 基本情報の各項目の最大文字数
+PROFILE_CHARS = 120
+
+
+def _text(value, limit: int = PROFILE_CHARS) -> str:
+    text = " ".join(str(value).split())
+    return text[:limit] + "…" if len(text) > limit else text
+
+
+def _list(value) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value if v]
+
+
+def result_prompt(kind: str, ulid: str) -> str:
+    """LLM に result.json の書き方を指示するプロンプトの一部"""
+    return f"""## 出力（result.json のみ）
+
+レポート（Markdown・CSV）は書かないこと。Python 側で result.json から自動で作成します。
+評価結果だけを次の形式のJSONで `output/{ulid}/{RESULT_FILE}` にWriteツールで保存してください。
+
+```json
+{{"overview": "全体の所感（2〜3文）",
+ "items": [{{"id": "{ID_LABELS[kind]}", "rank": "A+", "summary": "なぜ該当するか（1〜2文）",
+            "reasons": ["具体的なマッチ点（1項目20〜40字）", "..."], "concerns": ["懸念点・要確認事項（なければ空配列）"]}}]}}
+```
+
+- items は良い順に並べる。rank は A+ / A / B
+- id はデータの{ID_LABELS[kind]}をそのまま使う（名前・年収などの基本情報は書かなくてよい）
+- reasons は2〜4項目。抽象的な表現ではなく、データにある具体的な事実に基づいて書く
+"""
+
+
+def session_records(work_dir: Path, kind: str, ids) -> dict:
+    """ID → レコード（セッションの chunks/ にあればそこから、なければ data/ から）"""
+    wanted = set(ids)
+    found = {}
+    for path in sorted((work_dir / "chunks").glob("*.ndjson")):
+        for record in read_ndjson(path):
+            rid = record_id(record, kind)
+            if rid in wanted:
+                found.setdefault(rid, record)
+    missing = [rid for rid in ids if rid not in found]
+    if missing:
+        for record in select_records(kind, missing):
+            found.setdefault(record_id(record, kind), record)
+    return found
+
+
+def load_result(work_dir: Path):
+    """result.json を読む（なければ・壊れていれば None）"""
+    path = work_dir / RESULT_FILE
+    if not path.exists():
+        return None
+    try:
+        result = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+    if isinstance(result, list):
+        result = {"items": result}
+    items = []
+    seen = set()
+    for item in result.get("items", []):
+        if not isinstance(item, dict) or not item.get("id"):
+            continue
+        rid = str(item["id"]).strip()
+        if rid in seen:
+            continue
+        seen.add(rid)
+        rank = str(item.get("rank", "")).strip().upper()
+        items.append(
+            {
+                "id": rid,
+                "rank": rank if rank in RANKS else "B",
+                "summary": str(item.get("summary", "")).strip(),
+                "reasons": _list(item.get("reasons")),
+                "concerns": _list(item.get("concerns")),
+            }
+        )
+    return {"overview": str(result.get("overview", "")).strip(), "items": items}
+
+
+def salesforce_url(record: dict, kind: str) -> str:
+    base = os.getenv("SALESFORCE_BASE_URL", "https://your-org.lightning.force.com")
+    for key, value in record.items():
+        if value and any(k in key for k in SALESFORCE_ID_FIELDS[kind]):
+            return f"{base.rstrip('/')}/{value}"
+    return ""
+
+
+def profile(record: dict, kind: str) -> list:
+    """基本情報 [(表示名, 値), ...]"""
+    rows = []
+    for label, keywords in PROFILE_FIELDS[kind]:
+        value = pick_field(record, keywords)
+        if value not in (None, ""):
+            rows.append((label, _text(value)))
+    return rows
+
+
+def _statistics(kind: str, items: list, records: dict) -> list:
+    ranks = Counter(item["rank"] for item in items)
+    lines = [
+        "- ランク分布: " + ", ".join(f"{rank}: {ranks.get(rank, 0)}" for rank in RANKS)
+    ]
+    if kind != "candidates":
+        return lines
+
+    ages = []
+    salaries = []
+    for item in items:
+        record = records.get(item["id"], {})
+        age = pick_field(record, ("年齢",))
+        if isinstance(age, (int, float)) or str(age or "").isdigit():
+            ages.append(int(age))
+        salaries.extend(parse_salary(pick_field(record, ("希望年収",))))
+    if ages:
+        lines.append(f"- 平均年齢: {sum(ages) / len(ages):.1f}歳")
+    if salaries:
+        lines.append(f"- 希望年収レンジ: {min(salaries):.0f}〜{max(salaries):.0f}万円")
+    return lines
+
+
+def render_markdown(kind: str, title: str, result: dict, records: dict) -> str:
+    items = result["items"]
+    unit = "名" if kind == "candidates" else "件"
+    lines = [
+        f"# {title}",
+        "",
+        "## 概要",
+        "",
+        f"- 作成日時: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"- 該当: {len(items)}{unit}",
+    ]
+    if result["overview"]:
+        lines += ["", result["overview"]]
+
+    lines += ["", "## 一覧", ""]
+    for i, item in enumerate(items, 1):
+        record = records.get(item["id"], {})
+        info = dict(profile(record, kind))
+        name = info.pop(PROFILE_FIELDS[kind][0][0], item["id"])
+        lines += [f"### {i}. {name}（ランク: {item['rank']}）", "", "**基本情報**"]
+        lines += [f"- {ID_LABELS[kind]}: {item['id']}"]
+        lines += [f"- {label}: {value}" for label, value in info.items()]
+        if record.get("_duplicates"):
+            lines += [f"- 類似求人: 他{len(record['_duplicates'])}件"]
+        if item["summary"]:
+            lines += ["", "**なぜ該当するのか**", item["summary"]]
+        if item["reasons"]:
+            lines += ["", "**マッチポイント**"]
+            lines += [f"✅ {reason}" for reason in item["reasons"]]
+        lines += ["", "**懸念点・要確認事項**"]
+        lines += [f"⚠️ {c}" for c in item["concerns"]] or ["⚠️ 特になし"]
+        url = salesforce_url(record, kind)
+        if url:
+            lines += ["", "**詳細情報**", f"- Salesforce: [開く]({url})"]
+        lines += ["", "---", ""]
+
+    lines += ["## 統計情報", ""]
+    lines += _statistics(kind, items, records)
+    return "\n".join(lines) + "\n"
+
+
+def write_csv(path: Path, kind: str, result: dict, records: dict):
+    labels = [label for label, _ in PROFILE_FIELDS[kind]]
+    header = ["順位", ID_LABELS[kind], "ランク", *labels]
+    header += ["理由", "マッチポイント", "懸念点", "Salesforce"]
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i, item in enumerate(result["items"], 1):
+            record = records.get(item["id"], {})
+            info = dict(profile(record, kind))
+            writer.writerow(
+                [
+                    i,
+                    item["id"],
+                    item["rank"],
+                    *(info.get(label, "") for label in labels),
+                    _text(item["summary"], 500),
+                    " / ".join(_text(r) for r in item["reasons"]),
+                    " / ".join(_text(c) for c in item["concerns"]),
+                    salesforce_url(record, kind),
+                ]
+            )
+
+
+def render(work_dir: Path, kind: str, title: str) -> int:
+    """result.json からサマリーと CSV を作る
+
+    Returns: 件数（result.json がなければ -1。LLM が直接書いたレポートはそのまま残す）
+    """
+    result = load_result(work_dir)
+    if result is None:
+        return -1
+    records = session_records(work_dir, kind, [item["id"] for item in result["items"]])
+    # データにないID（LLMの書き間違い）は載せない
+    result["items"] = [item for item in result["items"] if item["id"] in records]
+    summary_name, csv_name = OUTPUT_FILES[kind]
+    (work_dir / summary_name).write_text(
+        render_markdown(kind, title, result, records), encoding="utf-8"
+    )
+    write_csv(work_dir / csv_name, kind, result, records)
+    return len(result["items"])
+
+
+def rendered_count(work_dir: Path, kind: str) -> int:
+    """render が書いた CSV の件数（キャッシュから復元したセッション用。CSV がなければ -1）"""
+    path = work_dir / OUTPUT_FILES[kind][1]
+    if not path.exists():
+        return -1
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def _matched_fields(record: dict, group) -> list:
+    """言い換えのいずれかを含む項目名（「求人票: 必須スキル」→「必須スキル」）"""
+    return [
+        key.split(": ")[-1]
+        for key, value in text_fields(record).items()
+        if any(term in value.lower() for term in group)
+    ]
+
+
+def keyword_result(kind: str, query: str, records: list, total: int) -> dict:
+    """LLM を使わずに、キーワード一致から result.json と同じ形の評価を作る
+
+    records は良い順に並べたもの。クエリのすべての語が基本情報の項目に現れれば A、それ以外は B。
+    """
+    groups = synonyms.expand(query)
+    profile_keywords = [k for _, keywords in PROFILE_FIELDS[kind] for k in keywords]
+    unit = "名" if kind == "candidates" else "件"
+    items = []
+    for record in records:
+        fields = [_matched_fields(record, group) for group in groups]
+        reasons = [
+            f"「{group[0]}」: {'・'.join(dict.fromkeys(matched[:3]))}"
+            for group, matched in zip(groups, fields)
+            if matched
+        ]
+        in_profile = all(
+            any(k in field for field in matched for k in profile_keywords)
+            for matched in fields
+        )
+        items.append(
+            {
+                "id": record_id(record, kind),
+                "rank": "A" if in_profile else "B",
+                "summary": "キーワード「"
+                + "」「".join(group[0] for group in groups)
+                + "」に一致",
+                "reasons": reasons,
+                "concerns": [],
+            }
+        )
+    return {
+        "source": "keyword",
+        "overview": (
+            f"キーワード一致が{total}{unit}と少ないため、AIを使わずにデータから作成しました。"
+            "並びはキーワードの関連度順、ランクはクエリの語がすべて基本情報に現れれば A、それ以外は B です。"
+        ),
+        "items": items,
+    }
+
+
+def keyword_report(
+    work_dir: Path, kind: str, query: str, hits: list, title: str
+) -> int:
+    """キーワード一致のレコードから、LLM を使わずに result.json・サマリー・CSV を作る
+
+    BM25 で並べ、クエリ語を直接含まない（類義語だけで一致した）レコードは後ろに元の順で付ける。
+    Returns: 件数
+    """
+    ranked = [record for _, record in rank_records(hits, query, kind, top_k=len(hits))]
+    seen = {record_id(record, kind) for record in ranked}
+    ranked += [record for record in hits if record_id(record, kind) not in seen]
+    result = keyword_result(kind, query, ranked, len(hits))
+    (work_dir / RESULT_FILE).write_text(
+        json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return render(work_dir, kind, title)
+
+
+def is_keyword_result(work_dir: Path) -> bool:
+    """result.json が keyword_report で作ったもの（AIの説明文なし）か"""
+    path = work_dir / RESULT_FILE
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("source") == "keyword"
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return False
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="result.json からレポートを作成")
+    parser.add_argument("session", help="セッションのULID（workspace/output/<ULID>）")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("--title", default="検索結果", help="サマリーの見出し")
+    args = parser.parse_args()
+
+    work_dir = WORKSPACE_DIR / "output" / args.session
+    count = render(work_dir, args.kind, args.title)
+    if count < 0:
+        print(f"❌ {RESULT_FILE} がないか読めません: {work_dir}")
+        raise SystemExit(1)
+    print(f"✅ {' / '.join(OUTPUT_FILES[args.kind])} を作成しました（{count}件）")
+
+
+if __name__ == "__main__":
+    main()
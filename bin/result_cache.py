@@ -0,0 +1,204 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+Result Cache
+
+候補者マッチング・求人検索・企業検索の成果物（サマリー・CSV・result.json）を、
+リクエスト・データのスナップショット・OPENCODE_MODEL・プロンプトのバージョンをキーに保存する。
+同じ日に同じ依頼が来たら OpenCode を実行せず、保存した成果物を新しいセッションにコピーして数秒で返す。
+
+- 取り込み（download.py）でデータが変わるとスナップショットのハッシュが変わり、古い結果は使われない
+  （取り込み時に削除）
+- RESULT_CACHE_TTL_HOURS を過ぎた結果は使わない。RESULT_CACHE_MAX_ENTRIES を超えたら
+  最後に使われた日時の古いものから削除する（LRU）
+- 各スクリプトの --fresh（ボットでは rerun）でキャッシュを使わずに実行する
+
+Usage:
+    uv run bin/result_cache.py list
+    uv run bin/result_cache.py clear
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+from records import WORKSPACE_DIR
+
+CACHE_DIR = WORKSPACE_DIR / "cache" / "results"
+SNAPSHOT_PATH = WORKSPACE_DIR / "index" / "snapshot.json"
+META_FILE = "meta.json"
+
+# 結果を使う期間（時間）・保存する件数
+RESULT_CACHE_TTL_HOURS = float(os.environ.get("RESULT_CACHE_TTL_HOURS", "24"))
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "200"))
+
+# 保存する成果物（セッションディレクトリ直下）
+ARTIFACTS = (
+    "result.json",
+    "matching_summary.md",
+    "matching.csv",
+    "jobs_summary.md",
+    "jobs.csv",
+    "companies_summary.md",
+    "companies.csv",
+)
+
+
+def data_version(path: Path = SNAPSHOT_PATH) -> str:
+    """取り込み済みデータのバージョン（incremental.py のスナップショットのハッシュ）"""
+    if not path.exists():
+        return ""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def normalize_query(query: str) -> str:
+    """表記の揺れ（全角・半角、大文字・小文字、空白）をそろえた検索クエリ"""
+    return " ".join(unicodedata.normalize("NFKC", query).lower().split())
+
+
+def cache_key(request: dict, prompt_version: int, snapshot: str | None = None) -> dict:
+    """キャッシュのキー（リクエスト・スナップショット・モデル・プロンプトのバージョン）"""
+    return {
+        "request": request,
+        "snapshot": data_version() if snapshot is None else snapshot,
+        "model": os.getenv("OPENCODE_MODEL", "opencode/grok-code"),
+        "prompt_version": prompt_version,
+    }
+
+
+def _digest(key: dict) -> str:
+    data = json.dumps(key, ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()[:20]
+
+
+def _read_meta(entry_dir: Path):
+    try:
+        return json.loads((entry_dir / META_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_meta(entry_dir: Path, meta: dict):
+    (entry_dir / META_FILE).write_text(
+        json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+
+def lookup(key: dict, work_dir: Path, cache_dir: Path = CACHE_DIR):
+    """キャッシュがあれば成果物を work_dir にコピーしてメタ情報を返す（なければ None）"""
+    entry_dir = cache_dir / _digest(key)
+    meta = _read_meta(entry_dir)
+    if meta is None or meta["key"] != key:
+        return None
+    if time.time() - meta["created_at"] > RESULT_CACHE_TTL_HOURS * 3600:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        return None
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    for name in meta["files"]:
+        shutil.copy2(entry_dir / name, work_dir / name)
+    meta["last_used"] = time.time()
+    meta["hits"] = meta.get("hits", 0) + 1
+    _write_meta(entry_dir, meta)
+    return meta
+
+
+def store(key: dict, work_dir: Path, cache_dir: Path = CACHE_DIR) -> bool:
+    """セッションの成果物を保存する（サマリーと CSV がそろっていなければ保存しない）"""
+    files = [name for name in ARTIFACTS if (work_dir / name).exists()]
+    if not any(name.endswith(".md") for name in files) or not any(
+        name.endswith(".csv") for name in files
+    ):
+        return False
+
+    entry_dir = cache_dir / _digest(key)
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    for name in files:
+        shutil.copy2(work_dir / name, entry_dir / name)
+    now = time.time()
+    _write_meta(
+        entry_dir,
+        {
+            "key": key,
+            "files": files,
+            "session": work_dir.name,
+            "created_at": now,
+            "last_used": now,
+            "hits": 0,
+        },
+    )
+    evict(cache_dir)
+    return True
+
+
+def entries(cache_dir: Path = CACHE_DIR) -> list:
+    """[(ディレクトリ, メタ情報), ...]（最後に使われた日時の新しい順）"""
+    found = []
+    for entry_dir in Path(cache_dir).glob("*"):
+        meta = _read_meta(entry_dir)
+        if meta is not None:
+            found.append((entry_dir, meta))
+        elif entry_dir.is_dir():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+    return sorted(found, key=lambda item: -item[1]["last_used"])
+
+
+def evict(cache_dir: Path = CACHE_DIR) -> int:
+    """期限切れと、上限を超えた古い結果（LRU）を削除する"""
+    removed = 0
+    now = time.time()
+    for i, (entry_dir, meta) in enumerate(entries(cache_dir)):
+        expired = now - meta["created_at"] > RESULT_CACHE_TTL_HOURS * 3600
+        if expired or i >= RESULT_CACHE_MAX_ENTRIES:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def prune(cache_dir: Path = CACHE_DIR) -> int:
+    """取り込み前のデータで作った結果を削除する（download.py から呼ぶ）"""
+    snapshot = data_version()
+    removed = evict(cache_dir)
+    for entry_dir, meta in entries(cache_dir):
+        if meta["key"].get("snapshot") != snapshot:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"  🧹 結果キャッシュ: {removed}件を削除")
+    return removed
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="マッチング・検索結果のキャッシュ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="保存済みの結果")
+    sub.add_parser("clear", help="すべて削除")
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print("🧹 結果キャッシュを削除しました")
+        return
+
+    for entry_dir, meta in entries():
+        created = datetime.fromtimestamp(meta["created_at"]).strftime("%m-%d %H:%M")
+        request = json.dumps(meta["key"]["request"], ensure_ascii=False)
+        print(f"{entry_dir.name}\t{created}\thit {meta.get('hits', 0)}\t{request}")
+
+
+if __name__ == "__main__":
+    main()
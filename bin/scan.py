@@ -0,0 +1,221 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy"]
+# ///
+"""
+Parallel Scan Engine
+
+列ファイル（columnar.py）を検索テキストのバイト数が均等になるシャードに分け、
+キーワード・カテゴリ・数値範囲の条件をプロセスプールで並列に評価する。
+シャードは行の連続区間なので、結果はシャード順に連結するだけで元の並び順になる。
+NDJSON の分割ファイル（ランク別など）は大きさが偏るため、走査の単位には使わない。
+
+Usage:
+    uv run bin/scan.py candidates "python aws"
+    uv run bin/scan.py jobs "sre フルリモート" --expand
+    uv run bin/scan.py candidates "python" --where status=書類選考中 --range salary_min=500:800
+    uv run bin/scan.py jobs "" --where remote=フルリモート --workers 4
+    uv run bin/scan.py shards candidates
+"""
+
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import columnar
+import synonyms
+from records import KINDS, keyword_hits as _keyword_hits, query_terms
+
+# 1シャードあたりの最小バイト数（小さすぎるとプロセス間のやり取りが支配的になる）
+MIN_SHARD_BYTES = 4 * 1024 * 1024
+
+# これより小さいデータはプロセスプールを使わずに走査する
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+# ワーカー数（既定はCPUコア数）
+SCAN_WORKERS = int(os.environ.get("SCAN_WORKERS", "0")) or os.cpu_count() or 1
+
+# ワーカープロセスごとに attach 済みの列ファイル
+_tables = {}
+
+
+def _table(kind: str) -> dict:
+    table = _tables.get(kind)
+    if table is None:
+        table = _tables[kind] = columnar.attach(kind)
+    return table
+
+
+def shard_ranges(table: dict, n_shards: int) -> list:
+    """テキストのバイト数が均等になる行区間 [(start, end), ...]"""
+    offsets = np.asarray(table["text_offsets"])
+    total = int(offsets[-1])
+    n_rows = table["size"]
+    if n_rows == 0:
+        return []
+    n_shards = max(1, min(n_shards, n_rows, total // MIN_SHARD_BYTES or 1))
+    targets = np.linspace(0, total, n_shards + 1)[1:-1]
+    bounds = np.searchsorted(offsets, targets, side="left")
+    bounds = np.unique(np.concatenate([[0], bounds, [n_rows]]))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def predicate_mask(table: dict, start: int, end: int, predicate: dict) -> np.ndarray:
+    """区間内でカテゴリ・数値範囲の条件を満たす行"""
+    mask = np.ones(end - start, dtype=bool)
+    for column, labels in predicate.get("categories", {}).items():
+        mask &= columnar.category_mask(table, column, labels)[start:end]
+    for column, (low, high) in predicate.get("ranges", {}).items():
+        values = np.asarray(table["numeric"][column][start:end])
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    return mask
+
+
+def term_rows(table: dict, start: int, end: int, term: str) -> np.ndarray:
+    """区間内でテキストに語を含む行（区間内の相対位置）
+
+    区間のテキストを1つのバイト列として検索し、一致位置を行に割り当てる。
+    """
+    offsets = np.asarray(table["text_offsets"][start : end + 1])
+    text = bytes(table["text"][offsets[0] : offsets[-1]])
+    needle = term.encode("utf-8")
+    positions = np.fromiter(
+        (m.start() for m in re.finditer(re.escape(needle), text)), dtype=np.int64
+    )
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64)
+    local = offsets - offsets[0]
+    rows = np.searchsorted(local, positions, side="right") - 1
+    # 行の境目をまたいだ一致は除く
+    rows = rows[positions + len(needle) <= local[rows + 1]]
+    return np.unique(rows)
+
+
+def scan_shard(kind: str, start: int, end: int, predicate: dict) -> np.ndarray:
+    """1シャードを走査して一致した行番号（全体の位置、昇順）を返す"""
+    table = _table(kind)
+    mask = predicate_mask(table, start, end, predicate)
+    # 語ごとの言い換えのいずれかを含む行（語どうしは AND）
+    for group in predicate.get("terms", []):
+        if not mask.any():
+            break
+        hit = np.zeros_like(mask)
+        for term in group:
+            hit[term_rows(table, start, end, term)] = True
+        mask &= hit
+    return np.flatnonzero(mask) + start
+
+
+def scan(kind: str, predicate: dict, workers: int = None) -> np.ndarray:
+    """全シャードを並列に走査し、一致した行番号を元の並び順で返す"""
+    table = _table(kind)
+    workers = workers or SCAN_WORKERS
+    total = int(table["text_offsets"][-1]) if table["size"] else 0
+    if workers <= 1 or total < PARALLEL_MIN_BYTES:
+        return scan_shard(kind, 0, table["size"], predicate)
+
+    shards = shard_ranges(table, workers)
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        futures = [
+            pool.submit(scan_shard, kind, start, end, predicate)
+            for start, end in shards
+        ]
+        # シャード順に連結すれば元の並び順になる
+        parts = [future.result() for future in futures]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+
+def build_predicate(query: str = "", where=(), ranges=(), expand=False) -> dict:
+    """検索クエリ・カテゴリ条件（col=値|値）・数値範囲（col=下限:上限）から条件を作る
+
+    expand: クエリの語を類義語辞書（synonyms.py）で言い換えのグループに展開する
+    """
+    if expand:
+        terms = synonyms.expand(query)
+    else:
+        terms = [[term] for term in query_terms(query)]
+    predicate = {"terms": terms}
+    categories = {}
+    for item in where:
+        column, _, labels = item.partition("=")
+        categories[column] = labels.split("|")
+    if categories:
+        predicate["categories"] = categories
+    bounds = {}
+    for item in ranges:
+        column, _, span = item.partition("=")
+        low, _, high = span.partition(":")
+        bounds[column] = (float(low) if low else None, float(high) if high else None)
+    if bounds:
+        predicate["ranges"] = bounds
+    return predicate
+
+
+def keyword_hits(kind: str, query: str) -> list:
+    """クエリのすべての語（類義語辞書の言い換えを含む）を含むレコード
+
+    records.keyword_hits の並列版。列ファイルがなければ NDJSON を直接走査する。
+    """
+    if not columnar.exists(kind):
+        return _keyword_hits(kind, query, groups=synonyms.expand(query))
+    predicate = build_predicate(query, expand=True)
+    if not predicate["terms"]:
+        return []
+    rows = scan(kind, predicate)
+    return columnar.records_at(_table(kind), rows)
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    if len(sys.argv) > 1 and sys.argv[1] == "shards":
+        kind = sys.argv[2] if len(sys.argv) > 2 else "candidates"
+        table = _table(kind)
+        offsets = np.asarray(table["text_offsets"])
+        for start, end in shard_ranges(table, SCAN_WORKERS):
+            size_mb = (offsets[end] - offsets[start]) / 1024 / 1024
+            print(f"{start}-{end}\t{end - start}行\t{size_mb:.1f}MB")
+        return
+
+    parser = argparse.ArgumentParser(description="並列スキャン")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("query", help="検索クエリ（全語一致、空文字で条件のみ）")
+    parser.add_argument(
+        "--where", action="append", default=[], help="カテゴリ条件 列=値|値"
+    )
+    parser.add_argument(
+        "--range", action="append", default=[], help="数値範囲 列=下限:上限"
+    )
+    parser.add_argument("--workers", type=int, help="ワーカー数")
+    parser.add_argument(
+        "--expand", action="store_true", help="類義語辞書でクエリを展開"
+    )
+    parser.add_argument("--top", type=int, default=20, help="表示件数")
+    args = parser.parse_args()
+
+    if not columnar.exists(args.kind):
+        print(f"❌ 列ファイルがありません: {args.kind}")
+        print("   uv run bin/columnar.py build を実行してください")
+        sys.exit(1)
+
+    predicate = build_predicate(args.query, args.where, args.range, args.expand)
+    start = time.perf_counter()
+    rows = scan(args.kind, predicate, args.workers)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    table = _table(args.kind)
+    for row in rows[: args.top]:
+        print(table["ids"][row])
+    print(f"⏱️  {len(rows)}件 / {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Index Segments
+
+検索インデックスを「ベースセグメント + 差分セグメント」で管理する共通処理。
+変更・追加されたレコードは新しいセグメントに追記し、古い行は墓標（tombstone）扱いにする。
+削除レコードは最新セグメントを null にして墓標化する。定期的にコンパクションで1つにまとめる。
+
+manifest.json:
+    segments: セグメント名の一覧（古い順）
+    latest:   レコードID → 最新の行を持つセグメント名（削除済みは null）
+    id_rows:  レコードID → 最新セグメント内の行数
+    rows:     セグメント名 → 行数
+    dead:     墓標になった行数
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# セグメント数・墓標率がこれを超えたらコンパクション
+MAX_SEGMENTS = 8
+MAX_DEAD_RATIO = 0.2
+
+
+def manifest_path(index_dir: Path) -> Path:
+    return Path(index_dir) / "manifest.json"
+
+
+def empty_manifest() -> dict:
+    return {"segments": [], "latest": {}, "id_rows": {}, "rows": {}, "dead": 0}
+
+
+def load_manifest(index_dir: Path) -> dict:
+    path = manifest_path(index_dir)
+    if not path.exists():
+        return empty_manifest()
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(index_dir: Path, manifest: dict):
+    Path(index_dir).mkdir(parents=True, exist_ok=True)
+    manifest_path(index_dir).write_text(
+        json.dumps(manifest, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def reset(index_dir: Path) -> dict:
+    """既存セグメントを削除して空のマニフェストを返す"""
+    index_dir = Path(index_dir)
+    if index_dir.exists():
+        for path in index_dir.glob("seg_*"):
+            path.unlink()
+    return empty_manifest()
+
+
+def next_segment(manifest: dict) -> str:
+    if not manifest["segments"]:
+        return "000"
+    return f"{int(manifest['segments'][-1]) + 1:03d}"
+
+
+def segment_path(index_dir: Path, segment: str, suffix: str) -> Path:
+    return Path(index_dir) / f"seg_{segment}{suffix}"
+
+
+def add_segment(manifest: dict, segment: str, ids: list, deleted_ids=()):
+    """セグメントを登録し、ID → 最新セグメントを更新する
+
+    ids に含まれるIDと deleted_ids の古い行は墓標になる。
+    """
+    latest = manifest["latest"]
+    id_rows = manifest["id_rows"]
+    counts = Counter(ids)
+
+    for rid in set(counts) | set(deleted_ids):
+        if latest.get(rid) is not None:
+            manifest["dead"] += id_rows.get(rid, 0)
+    for rid in deleted_ids:
+        if rid not in counts:
+            latest[rid] = None
+            id_rows.pop(rid, None)
+    for rid, n in counts.items():
+        latest[rid] = segment
+        id_rows[rid] = n
+
+    # 削除のみの差分ではセグメントを作らない
+    if ids:
+        manifest["segments"].append(segment)
+        manifest["rows"][segment] = len(ids)
+
+
+def live_mask(manifest: dict, segment: str, ids: list) -> np.ndarray:
+    """セグメント内で有効な（墓標でない）行"""
+    latest = manifest["latest"]
+    return np.array([latest.get(rid) == segment for rid in ids], dtype=bool)
+
+
+def dead_ratio(manifest: dict) -> float:
+    total = sum(manifest["rows"].values())
+    if total == 0:
+        return 0.0
+    return manifest["dead"] / total
+
+
+def needs_compaction(manifest: dict) -> bool:
+    return (
+        len(manifest["segments"]) > MAX_SEGMENTS
+        or dead_ratio(manifest) > MAX_DEAD_RATIO
+    )
+
+
+def replace_all(index_dir: Path, manifest: dict, segment: str, ids: list):
+    """既存セグメントをすべて削除し、コンパクション済みの1セグメントに置き換える"""
+    for old in manifest["segments"]:
+        if old == segment:
+            continue
+        for path in Path(index_dir).glob(f"seg_{old}*"):
+            path.unlink()
+    manifest.update(empty_manifest())
+    add_segment(manifest, segment, ids)
@@ -0,0 +1,423 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy", "scikit-learn"]
+# ///
+"""
+Precomputed Candidate Shortlists
+
+取り込み後（夜間）に、すべての求人（取り込み時に JOB_STATUS で絞り込み済み）について
+全候補者の適合度をまとめて計算し、求人ごとの上位 SHORTLIST_K 名を内訳つきで保存する
+（workspace/index/shortlists/<求人ID>.json）。candidate.py はこれがあれば BM25・意味検索・適合度の
+計算を省き、保存済みの上位から始める。
+
+- 求人 JOB_BLOCK 件ずつ、求人 × スキルタグ・都道府県・働き方の行列と候補者の列ファイルの積で一括に採点する
+  （fit.score_many）。検索の関連度は、候補者ベクトルとの内積（意味検索の類似度）の全候補者の中での
+  順位を、学習時と同じ fit.rank_points の点数にして使う
+- 学習済みモデル（ltr.py）があればその確率で並べる
+- 2回目以降は、変更された求人だけを全件で計算し直し、変更されていない求人は
+  追加・変更された候補者と保存済みの上位だけを採点し直して入れ替える
+- 更新日の点数は日々ずれるので、SHORTLIST_FULL_DAYS 日ごとに全件で計算し直す
+
+Usage:
+    uv run bin/shortlists.py build
+    uv run bin/shortlists.py build --full
+    uv run bin/shortlists.py show J-0000023845
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+import columnar
+import fit
+import job_profiles
+import ltr
+import vector_index
+from incremental import diff, load_snapshot
+from records import INDEX_DIR, find_record, iter_records, record_id
+
+SHORTLISTS_DIR = INDEX_DIR / "shortlists"
+STATE_FILE = "state.json"
+HASHES_FILE = "candidate_hashes.json"
+
+# 求人ごとに保存する候補者数
+SHORTLIST_K = int(os.environ.get("SHORTLIST_K", "100"))
+
+# 全件で計算し直す間隔（日数）
+SHORTLIST_FULL_DAYS = int(os.environ.get("SHORTLIST_FULL_DAYS", "7"))
+
+# まとめて採点する求人数（求人数 × 候補者の行数の配列を作るのでメモリに合わせる）
+JOB_BLOCK = 16
+
+
+def _path(job_id: str, shortlists_dir: Path = SHORTLISTS_DIR) -> Path:
+    return shortlists_dir / f"{job_id}.json"
+
+
+def _read_json(path: Path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def versions(table: dict) -> dict:
+    """保存済みの上位が使えるかを判定する情報（列ファイル・学習モデル・ベクトル化モデル・関連度の尺度）"""
+    ltr_version = ""
+    if ltr.exists():
+        data = (ltr.LTR_DIR / "model.json").read_bytes()
+        ltr_version = hashlib.sha1(data).hexdigest()
+    vector_version = ""
+    if vector_index.exists("candidates"):
+        vector_version = str(vector_index._model_path("candidates").stat().st_mtime)
+    return {
+        "columns": table["path"],
+        "ltr": ltr_version,
+        "vectors": vector_version,
+        "relevance": fit.RELEVANCE_POOL,
+        # 採点に使う列が増えたら全件で計算し直す
+        "numeric": list(table["numeric"]),
+    }
+
+
+def active_jobs() -> dict:
+    """求人ID → 求人（同じIDの行は最初の1行）"""
+    jobs = {}
+    for job in iter_records("jobs"):
+        jobs.setdefault(record_id(job, "jobs"), job)
+    return jobs
+
+
+def _vector_positions(index: dict, ids) -> dict:
+    """候補者ID → (セグメント番号, 行)（墓標を除く）"""
+    wanted = np.unique(np.asarray(ids).astype(str))
+    positions = {}
+    for s, seg in enumerate(index["segments"]):
+        seg_ids = np.asarray(seg["ids"]).astype(str)
+        for i in np.flatnonzero(seg["live"] & np.isin(seg_ids, wanted)):
+            positions[seg_ids[i]] = (s, int(i))
+    return positions
+
+
+def _row_vectors(table: dict, index: dict, rows) -> np.ndarray:
+    """列ファイルの行ごとの候補者ベクトル（行数 × 次元。ベクトルがなければ0）"""
+    ids = np.asarray(table["ids"])[rows].astype(str)
+    positions = _vector_positions(index, ids)
+    dim = index["segments"][0]["vectors"].shape[1]
+    vectors = np.zeros((len(rows), dim), dtype=np.float32)
+    for out, rid in enumerate(ids):
+        position = positions.get(rid)
+        if position is not None:
+            s, i = position
+            vectors[out] = index["segments"][s]["vectors"][i]
+    return vectors
+
+
+def live_vectors(index: dict) -> tuple:
+    """墓標を除いた全候補者のID・ベクトル（候補者数 × 次元）"""
+    segments = index["segments"]
+    ids = np.concatenate([np.asarray(seg["ids"])[seg["live"]] for seg in segments])
+    vectors = np.concatenate([seg["vectors"][seg["live"]] for seg in segments])
+    return ids.astype(str), vectors
+
+
+def semantic_relevance(job_vectors, row_vectors, cutoffs) -> np.ndarray:
+    """求人ベクトル × 行の候補者ベクトルの関連度（全候補者の中での類似度の順位の点数）
+
+    学習時（candidate.py の検索順位）と同じ fit.rank_points の尺度にそろえる。
+    ベクトルのない候補者は0。
+    """
+    relevance = fit.similarity_relevance(job_vectors @ row_vectors.T, cutoffs)
+    relevance[:, ~row_vectors.any(axis=1)] = 0
+    return relevance
+
+
+def _score_block(table: dict, profiles: list, rows, relevance, model):
+    """求人のブロック × 行を採点する Returns: (並べる点数, 内訳)"""
+    total, breakdown = fit.score_many(table, profiles, rows, relevance)
+    if model is None:
+        return total, breakdown
+
+    shape = total.shape
+    skill_count = np.zeros(shape)
+    if table["skills"] is not None:
+        wanted = [columnar.skill_mask(p["skills"]) for p in profiles]
+        skill_count = (
+            fit.skill_bits(wanted) @ fit.skill_bits(np.asarray(table["skills"])[rows]).T
+        )
+    ranks = np.asarray(table["codes"]["rank"])[rows]
+    columns = {
+        **breakdown,
+        "skill_count": skill_count,
+        "rank_s": np.broadcast_to(
+            np.isin(ranks, fit._codes(table, "rank", ["S"])), shape
+        ),
+        "rank_a": np.broadcast_to(
+            np.isin(ranks, fit._codes(table, "rank", ["A"])), shape
+        ),
+    }
+    return ltr.predict_columns(model, columns), breakdown
+
+
+def scorer(table: dict, jobs: dict, rows=None, features=None):
+    """求人のブロック × 行をまとめて採点する関数を返す
+
+    rows: 採点する可能性のある行（昇順。省略時は全行）。候補者ベクトルはこの分だけ読み込む
+    features: jobs_for.load() の戻り値。あれば求人ベクトルと順位の基準を作り直さずに使う
+      （ない求人だけ、求人ベクトル化と全候補者との類似度の計算をする）
+    Returns: score(求人IDのリスト, 行番号) → (並べる点数, 内訳)
+    """
+    universe = np.arange(table["size"]) if rows is None else np.asarray(rows)
+    model = ltr.load() if ltr.exists() else None
+    row_vectors = index = all_vectors = None
+    job_vectors = {}
+    cutoffs = {}
+    if vector_index.exists("candidates"):
+        index = vector_index.load("candidates")
+        row_vectors = _row_vectors(table, index, universe)
+        if features is not None and features["vectors"] is not None:
+            for i, jid in enumerate(features["job_ids"]):
+                if jid in jobs:
+                    job_vectors[jid] = features["vectors"][i]
+                    cutoffs[jid] = features["cutoffs"][i]
+        missing = [jid for jid in jobs if jid not in job_vectors]
+        if missing:
+            texts = [vector_index.index_text(jobs[jid]) for jid in missing]
+            job_vectors.update(zip(missing, vector_index.embed(index, texts)))
+
+    def score(block: list, rows):
+        profiles = [job_profiles.get(jobs[jid])["fit"] for jid in block]
+        relevance = None
+        if row_vectors is not None:
+            vectors = np.stack([job_vectors[jid] for jid in block])
+            # 順位の基準（全候補者の上位の類似度）は求人ごとに1回だけ計算する
+            new = [j for j, jid in enumerate(block) if jid not in cutoffs]
+            if new:
+                nonlocal all_vectors
+                if all_vectors is None:
+                    all_vectors = live_vectors(index)[1]
+                _, top = fit.similarity_top(vectors[new] @ all_vectors.T)
+                cutoffs.update({block[j]: c for j, c in zip(new, top)})
+            positions = np.searchsorted(universe, rows)
+            relevance = semantic_relevance(
+                vectors, row_vectors[positions], [cutoffs[jid] for jid in block]
+            )
+        return _score_block(table, profiles, rows, relevance, model)
+
+    return score
+
+
+def _ranked(table: dict, rows, total, breakdown, k: int) -> list:
+    """1求人の上位K名 [{"id", "row", "total", "parts"}, ...]（同じ候補者の行は最高点の1行）"""
+    entries = []
+    seen = set()
+    ids = np.asarray(table["ids"])
+    for pos in np.argsort(-total, kind="stable"):
+        if len(entries) >= k:
+            break
+        rid = str(ids[rows[pos]])
+        if rid in seen:
+            continue
+        seen.add(rid)
+        entries.append(
+            {
+                "id": rid,
+                "row": int(rows[pos]),
+                "total": round(float(total[pos]), 4),
+                "parts": {
+                    name: round(float(values[pos]), 3)
+                    for name, values in breakdown.items()
+                },
+            }
+        )
+    return entries
+
+
+def _blocks(items: list, size: int = JOB_BLOCK):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def compute(table: dict, jobs: dict, score=None) -> dict:
+    """求人ごとに全候補者を採点して上位 SHORTLIST_K 名を返す {求人ID: [{"id", "row", "total", "parts"}, ...]}
+
+    score: scorer() の戻り値（省略時は jobs で作る）
+    """
+    score = score or scorer(table, jobs)
+    all_rows = np.arange(table["size"])
+    results = {}
+    for block in _blocks(list(jobs)):
+        total, breakdown = score(block, all_rows)
+        for j, jid in enumerate(block):
+            parts = {n: v[j] for n, v in breakdown.items()}
+            results[jid] = _ranked(table, all_rows, total[j], parts, SHORTLIST_K)
+    return results
+
+
+def refresh(
+    full: bool = False, shortlists_dir: Path = SHORTLISTS_DIR, features=None
+) -> int:
+    """求人ごとの上位候補者を更新する（Returns: 計算し直した求人数）
+
+    features: jobs_for.load() の戻り値（求人ベクトルと関連度の順位の基準を作り直さずに使う）
+    """
+    if not columnar.exists("candidates"):
+        print("  ⚠️ 計算済み候補者リスト: 列ファイルがないためスキップ")
+        return 0
+    start = time.perf_counter()
+    table = columnar.attach("candidates")
+    current = versions(table)
+    hashes = load_snapshot().get("candidates", {}).get("hashes", {})
+    jobs = active_jobs()
+    job_hashes = {jid: job_profiles.record_hash(job) for jid, job in jobs.items()}
+
+    state = _read_json(shortlists_dir / STATE_FILE) or {}
+    old_hashes = _read_json(shortlists_dir / HASHES_FILE)
+    full_on = state.get("full_built_on", "")
+    full = (
+        full
+        or old_hashes is None
+        or state.get("ltr") != current["ltr"]
+        or state.get("vectors") != current["vectors"]
+        or state.get("relevance") != current["relevance"]
+        or state.get("numeric") != current["numeric"]
+        or not full_on
+        or (date.today() - date.fromisoformat(full_on)).days >= SHORTLIST_FULL_DAYS
+    )
+    if full:
+        upserts, deletes = set(hashes), set()
+        full_jobs = list(jobs)
+        partial_jobs = []
+    else:
+        upserts, deletes = diff(old_hashes, hashes)
+        deletes = set(deletes)
+        full_jobs = [
+            jid for jid in jobs if state.get("jobs", {}).get(jid) != job_hashes[jid]
+        ]
+        partial_jobs = [jid for jid in jobs if jid not in full_jobs]
+        # 候補者が変わらず列ファイルも同じなら、保存済みの上位はそのまま使える
+        if not upserts and not deletes and state.get("columns") == table["path"]:
+            partial_jobs = []
+    if not full_jobs and not partial_jobs and set(state.get("jobs", {})) == set(jobs):
+        print("  ✨ 計算済み候補者リスト: 変更なし")
+        return 0
+
+    score = scorer(table, jobs, features=features)
+
+    def save(jid: str, entries: list):
+        _write_json(
+            _path(jid, shortlists_dir),
+            {"job_id": jid, "hash": job_hashes[jid], "entries": entries},
+        )
+
+    # 変更されていない求人: 追加・変更された候補者と保存済みの上位だけを採点し直す
+    changed = np.isin(table["ids"], list(upserts))
+    retry = []
+    for block in _blocks(partial_jobs):
+        saved = {
+            jid: (_read_json(_path(jid, shortlists_dir)) or {}).get("entries", [])
+            for jid in block
+        }
+        kept_ids = {e["id"] for entries in saved.values() for e in entries}
+        rows = np.flatnonzero(changed | np.isin(table["ids"], list(kept_ids)))
+        total, breakdown = score(block, rows)
+        for j, jid in enumerate(block):
+            kept = {
+                e["id"]
+                for e in saved[jid]
+                if e["id"] not in upserts and e["id"] not in deletes
+            }
+            parts = {n: v[j] for n, v in breakdown.items()}
+            ranked = _ranked(table, rows, total[j], parts, SHORTLIST_K)
+            kept_totals = [e["total"] for e in ranked if e["id"] in kept]
+            if len(saved[jid]) >= SHORTLIST_K and len(kept_totals) == len(kept):
+                # 保存済みの上位の最下位より上だけが確実（それより下は採点していない候補者がいる）
+                floor = min(kept_totals, default=np.inf)
+                ranked = [e for e in ranked if e["total"] >= floor]
+            if len(ranked) < fit.LLM_CANDIDATES:
+                retry.append(jid)
+            else:
+                save(jid, ranked)
+
+    # 変更された求人・入れ替えで件数が足りなくなった求人: 全候補者を採点する
+    for jid, entries in compute(
+        table, {jid: jobs[jid] for jid in full_jobs + retry}, score
+    ).items():
+        save(jid, entries)
+
+    for path in shortlists_dir.glob("*.json"):
+        if path.name not in (STATE_FILE, HASHES_FILE) and path.stem not in jobs:
+            path.unlink()
+    _write_json(shortlists_dir / HASHES_FILE, hashes)
+    _write_json(
+        shortlists_dir / STATE_FILE,
+        {
+            **current,
+            "full_built_on": date.today().isoformat() if full else full_on,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "jobs": job_hashes,
+        },
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"  🗂️ 計算済み候補者リスト: 全件 {len(full_jobs) + len(retry)}求人 / 差分 {len(partial_jobs) - len(retry)}求人"
+        f"（候補者の追加・変更 {len(upserts)}名、{elapsed:.1f}秒）"
+    )
+    return len(full_jobs) + len(partial_jobs)
+
+
+def load(job: dict, table: dict, shortlists_dir: Path = SHORTLISTS_DIR):
+    """保存済みの上位候補者（ないか、求人・列ファイル・モデルが変わっていれば None）"""
+    state = _read_json(shortlists_dir / STATE_FILE)
+    if not state or any(state.get(k) != v for k, v in versions(table).items()):
+        return None
+    data = _read_json(_path(record_id(job, "jobs"), shortlists_dir))
+    if not data or data.get("hash") != job_profiles.record_hash(job):
+        return None
+    return data["entries"]
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="求人ごとの上位候補者の事前計算")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="差分で更新（初回は全件）")
+    build_parser.add_argument("--full", action="store_true", help="全件で計算し直す")
+    show_parser = sub.add_parser("show", help="求人の上位候補者を表示")
+    show_parser.add_argument("job_id")
+    show_parser.add_argument("--top", type=int, default=20, help="表示件数")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🗂️ 計算済み候補者リストを更新中...")
+        refresh(args.full)
+        return
+
+    job = find_record("jobs", args.job_id)
+    if job is None:
+        print(f"❌ 求人が見つかりません: {args.job_id}")
+        sys.exit(1)
+    entries = load(job, columnar.attach("candidates"))
+    if entries is None:
+        print("⚠️ 計算済みのリストがないか、データが変わっています（build で更新）")
+        sys.exit(1)
+    for entry in entries[: args.top]:
+        detail = " ".join(f"{k}={v}" for k, v in entry["parts"].items())
+        print(f"{entry['id']}\t{entry['total']}\t{detail}")
+
+
+if __name__ == "__main__":
+    main()
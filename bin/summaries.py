@@ -0,0 +1,351 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+Candidate Profile Summaries
+
+候補者ごとに、長い自由記述（職務経歴・CAメモなど）を含むレコードを
+200文字程度の構造化サマリー（スキル・経験年数・希望年収・希望勤務地・転職意向）にまとめておく。
+取り込みの後にバッチで実行し（bot.py が download.py の成功後に別プロセスで起動する）、マッチングでは長いフィールドの代わりにサマリーを LLM に渡す。
+
+- 内容ハッシュが変わった（新規・変更された）候補者だけを処理する
+- OpenCode を同時 SUMMARY_CONCURRENCY 件・毎分 SUMMARY_RPM 回までに制限して呼び出す
+- 1バッチ終わるごとに workspace/index/summaries/candidates.ndjson に追記する（チェックポイント）。
+  途中で止まっても、次回は終わっていない候補者から再開する
+- 1回の実行は SUMMARY_MAX_BATCHES バッチまで（最終更新日の新しい候補者から。残りは次回）
+- 実行中はロックを取り、前回の実行が終わっていなければ何もしない
+
+Usage:
+    uv run bin/summaries.py run
+    uv run bin/summaries.py run --max-batches 10
+    uv run bin/summaries.py status
+    uv run bin/summaries.py show 003P00000000000
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from records import (
+    INDEX_DIR,
+    WORKSPACE_DIR,
+    iter_records,
+    record_id,
+    record_updated_at,
+    write_ndjson,
+)
+
+SUMMARIES_DIR = INDEX_DIR / "summaries"
+SUMMARIES_PATH = SUMMARIES_DIR / "candidates.ndjson"
+WORK_DIR = SUMMARIES_DIR / "work"
+LOCK_PATH = SUMMARIES_DIR / "run.lock"
+
+# 1回の OpenCode 呼び出しでまとめる候補者数
+SUMMARY_BATCH_SIZE = 25
+
+# 同時に実行する OpenCode の数・1分あたりの呼び出し回数
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_RPM = int(os.environ.get("SUMMARY_RPM", "20"))
+
+# 1回の実行で処理するバッチ数の上限（残りは次回に回す）
+SUMMARY_MAX_BATCHES = int(os.environ.get("SUMMARY_MAX_BATCHES", "200"))
+
+# 1回の呼び出しの制限時間（秒）
+SUMMARY_TIMEOUT_SEC = 600
+
+# サマリー文の最大文字数
+SUMMARY_CHARS = 200
+
+# マッチングでサマリーに置き換える長いフィールドの文字数
+LONG_FIELD_CHARS = 80
+
+# 選考ごとに行が分かれるカラム（候補者自身の内容ではないのでハッシュ・要約に含めない）
+ROW_FIELD_KEYWORDS = ("選考", "求人", "応募")
+
+# サマリーの項目（表示名）
+SUMMARY_FIELDS = {
+    "skills": "スキル",
+    "years": "経験",
+    "salary": "希望年収",
+    "location": "希望勤務地",
+    "intent": "意向",
+}
+
+
+def source(record: dict) -> dict:
+    """要約の元になる候補者自身のフィールド"""
+    return {
+        key: value
+        for key, value in record.items()
+        if value not in (None, "")
+        and not key.startswith("_")
+        and not any(k in key for k in ROW_FIELD_KEYWORDS)
+    }
+
+
+def source_hash(record: dict) -> str:
+    data = json.dumps(source(record), ensure_ascii=False, sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+def summary_text(summary: dict) -> str:
+    """サマリーを1行の文章にする（最大 SUMMARY_CHARS 文字）"""
+    parts = []
+    for key, label in SUMMARY_FIELDS.items():
+        value = summary.get(key)
+        if isinstance(value, list):
+            value = "、".join(str(v) for v in value if v)
+        if value not in (None, ""):
+            parts.append(f"{label}: {value}")
+    text = " / ".join(parts)
+    return text[:SUMMARY_CHARS] + "…" if len(text) > SUMMARY_CHARS else text
+
+
+def load(path: Path = SUMMARIES_PATH, ids=None) -> dict:
+    """候補者ID → {"hash", "text", ...}（同じIDは後の行が優先）"""
+    if not path.exists():
+        return {}
+    wanted = set(ids) if ids is not None else None
+    summaries = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if wanted is None or entry["id"] in wanted:
+                summaries[entry["id"]] = entry
+    return summaries
+
+
+def apply(records: list, path: Path = SUMMARIES_PATH) -> int:
+    """内容が変わっていない候補者の長いフィールドをサマリー（_summary）に置き換える
+
+    Returns: 置き換えた件数
+    """
+    summaries = load(path, [record_id(r, "candidates") for r in records])
+    replaced = 0
+    for i, record in enumerate(records):
+        entry = summaries.get(record_id(record, "candidates"))
+        if entry is None or entry["hash"] != source_hash(record):
+            continue
+        short = {
+            key: value
+            for key, value in record.items()
+            if key.startswith("_")
+            or not isinstance(value, str)
+            or len(value) <= LONG_FIELD_CHARS
+        }
+        records[i] = {**short, "_summary": entry["text"]}
+        replaced += 1
+    return replaced
+
+
+def pending(path: Path = SUMMARIES_PATH) -> list:
+    """サマリーがないか、内容が変わった候補者 [(ID, ハッシュ, 要約元), ...]（更新日の新しい順）"""
+    done = {rid: entry["hash"] for rid, entry in load(path).items()}
+    todo = {}
+    for record in iter_records("candidates"):
+        rid = record_id(record, "candidates")
+        if rid in todo:
+            continue
+        h = source_hash(record)
+        if done.get(rid) != h:
+            todo[rid] = (h, source(record), record_updated_at(record))
+    return [
+        (rid, h, fields)
+        for rid, (h, fields, _) in sorted(
+            todo.items(), key=lambda item: item[1][2] or datetime.min, reverse=True
+        )
+    ]
+
+
+def _throttle(rpm: int):
+    """呼び出しの間隔を 60/rpm 秒以上あける関数を返す（スレッド間で共有）"""
+    lock = threading.Lock()
+    next_at = [0.0]
+
+    def wait():
+        with lock:
+            now = time.monotonic()
+            at = max(now, next_at[0])
+            next_at[0] = at + 60 / max(rpm, 1)
+        time.sleep(max(at - now, 0))
+
+    return wait
+
+
+def batch_prompt(source_path: Path, result_path: Path) -> str:
+    """1バッチの要約のプロンプト（workspace/ から実行）"""
+    source_file = source_path.relative_to(WORKSPACE_DIR)
+    result_file = result_path.relative_to(WORKSPACE_DIR)
+    return f"""`{source_file}` の候補者（1行1名）をそれぞれ短く要約してください。
+
+次の形式のJSON配列を `{result_file}` にWriteツールで保存すること（全員分、他のファイルは作らない）。
+
+```json
+[{{"id": "個人ユーザーID", "skills": ["主なスキル（最大5つ）"], "years": "経験年数（例: 8年）",
+  "salary": "希望年収（例: 650万円）", "location": "希望勤務地・働き方", "intent": "転職意向・志向（20字以内）"}}]
+```
+
+- データに書かれている事実だけを使う。不明な項目は空文字にする
+- `data/` の他のファイルは読まないこと
+"""
+
+
+def _run_batch(batch: list, index: int, opencode_cmd: list, wait, write_lock, path):
+    """1バッチを要約してチェックポイントに追記する（Returns: 書き込んだ件数）"""
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    source_path = WORK_DIR / f"batch_{index:04d}.ndjson"
+    result_path = WORK_DIR / f"batch_{index:04d}_result.json"
+    write_ndjson(
+        [{"id": rid, **fields} for rid, _, fields in batch],
+        source_path,
+    )
+    result_path.unlink(missing_ok=True)
+
+    wait()
+    try:
+        subprocess.run(
+            [*opencode_cmd, batch_prompt(source_path, result_path)],
+            cwd=WORKSPACE_DIR,
+            check=False,
+            timeout=SUMMARY_TIMEOUT_SEC,
+            capture_output=True,
+        )
+        items = json.loads(result_path.read_text(encoding="utf-8"))
+    except (subprocess.TimeoutExpired, FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+    hashes = {rid: h for rid, h, _ in batch}
+    entries = []
+    for item in items if isinstance(items, list) else []:
+        rid = str(item.get("id", "")) if isinstance(item, dict) else ""
+        if rid not in hashes:
+            continue
+        summary = {key: item.get(key, "") for key in SUMMARY_FIELDS}
+        entries.append(
+            {
+                "id": rid,
+                "hash": hashes.pop(rid),
+                **summary,
+                "text": summary_text(summary),
+            }
+        )
+
+    with write_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    source_path.unlink(missing_ok=True)
+    result_path.unlink(missing_ok=True)
+    return len(entries)
+
+
+def compact(path: Path = SUMMARIES_PATH) -> int:
+    """追記で重複した行と、いなくなった候補者の行を除いて書き直す"""
+    if not path.exists():
+        return 0
+    current = {record_id(r, "candidates") for r in iter_records("candidates")}
+    summaries = {rid: e for rid, e in load(path).items() if rid in current}
+    tmp_path = path.with_suffix(".tmp")
+    write_ndjson(summaries.values(), tmp_path)
+    tmp_path.replace(path)
+    return len(summaries)
+
+
+def run(max_batches: int = SUMMARY_MAX_BATCHES, path: Path = SUMMARIES_PATH) -> int:
+    """新規・変更された候補者を要約する（Returns: 要約した件数）"""
+    if max_batches <= 0:
+        return 0
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("  ⏳ 候補者サマリー: 前回の作成が実行中のためスキップ")
+            return 0
+        return _run(max_batches, path)
+
+
+def _run(max_batches: int, path: Path) -> int:
+    todo = pending(path)
+    if not todo:
+        print("  ✨ 候補者サマリー: 変更なし")
+        return 0
+
+    batches = [
+        todo[i : i + SUMMARY_BATCH_SIZE]
+        for i in range(0, len(todo), SUMMARY_BATCH_SIZE)
+    ][:max_batches]
+    model = os.getenv("OPENCODE_MODEL", "opencode/grok-code")
+    opencode_cmd = ["opencode", "run", "--model", model]
+    print(
+        f"  📝 候補者サマリー: 対象 {len(todo)}名 → 今回 {len(batches)}バッチ"
+        f"（同時{SUMMARY_CONCURRENCY}件・毎分{SUMMARY_RPM}回まで）"
+    )
+
+    wait = _throttle(SUMMARY_RPM)
+    write_lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_CONCURRENCY)) as pool:
+        counts = list(
+            pool.map(
+                lambda args: _run_batch(*args, opencode_cmd, wait, write_lock, path),
+                [(batch, i) for i, batch in enumerate(batches, 1)],
+            )
+        )
+
+    done = sum(counts)
+    failed = sum(1 for c in counts if c == 0)
+    total = compact(path)
+    print(
+        f"  ✅ 候補者サマリー: {done}名を要約（失敗 {failed}バッチ、"
+        f"残り {len(todo) - done}名は次回）/ 保存済み {total}名"
+    )
+    return done
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="候補者サマリーのバッチ作成")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="新規・変更された候補者を要約")
+    run_parser.add_argument(
+        "--max-batches", type=int, default=SUMMARY_MAX_BATCHES, help="バッチ数の上限"
+    )
+    sub.add_parser("status", help="未処理の件数")
+    show_parser = sub.add_parser("show", help="候補者のサマリーを表示")
+    show_parser.add_argument("candidate_id")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print("📝 候補者サマリー作成中...")
+        run(args.max_batches)
+        return
+
+    if args.command == "status":
+        total = len(load())
+        todo = len(pending())
+        print(f"保存済み: {total}名 / 未処理（新規・変更）: {todo}名")
+        return
+
+    entry = load(ids=[args.candidate_id]).get(args.candidate_id)
+    if entry is None:
+        print(f"❌ サマリーがありません: {args.candidate_id}")
+        sys.exit(1)
+    print(entry["text"])
+
+
+if __name__ == "__main__":
+    main()
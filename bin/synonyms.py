@@ -0,0 +1,321 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = []
+# ///
+"""
+Synonym Dictionary
+
+技術・職種・働き方などの日本語/英語の類義語辞書で、検索クエリを
+ripgrep 用のキーワードパターンにローカルで展開する（LLM不使用・1ms未満・毎回同じ結果）。
+クエリの語ごとに類義語の OR をとり、語どうしは AND で組み合わせる。
+
+辞書は同梱の定義（DICTIONARY_VERSION）に、過去のセッション（workspace/output/*/）で
+LLM が作ったパターンから学習した類義語（workspace/index/synonyms.json）を加えたもの。
+同じ語の言い換えが LEARN_MIN_SESSIONS 回以上のセッションに現れたら辞書に加える。
+
+Usage:
+    uv run bin/synonyms.py expand "Pythonエンジニア フルリモート"
+    uv run bin/synonyms.py expand "SaaS系スタートアップ" --kind companies
+    uv run bin/synonyms.py learn
+    uv run bin/synonyms.py show
+"""
+
+import json
+import re
+import shlex
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from records import INDEX_DIR, WORKSPACE_DIR, query_terms
+
+# 同梱辞書のバージョン（定義を変えたら上げる）
+DICTIONARY_VERSION = 1
+
+LEARNED_PATH = INDEX_DIR / "synonyms.json"
+OUTPUT_DIR = WORKSPACE_DIR / "output"
+
+# 学習に必要なセッション数（1回だけの言い換えはノイズとして採用しない）
+LEARN_MIN_SESSIONS = 2
+
+# 部分一致で誤ヒットが多い短い英字（ml → html など）は類義語にしない
+MIN_ASCII_LENGTH = 3
+
+# 類義語グループ（すべて小文字。レコード本文への部分一致で使う）
+SYNONYM_GROUPS = [
+    # 言語・技術
+    ("python", "パイソン"),
+    ("javascript", "ジャバスクリプト"),
+    ("typescript", "タイプスクリプト"),
+    ("golang", "go言語"),
+    ("rails", "ruby on rails", "ルビーオンレイルズ"),
+    ("php", "ピーエイチピー"),
+    ("kotlin", "コトリン"),
+    ("swift", "スウィフト"),
+    ("react", "リアクト"),
+    ("vue", "ビュー.js"),
+    ("kubernetes", "k8s", "クバネティス"),
+    ("docker", "ドッカー", "コンテナ"),
+    ("aws", "amazon web services"),
+    ("gcp", "google cloud"),
+    ("azure", "アジュール"),
+    ("terraform", "iac", "infrastructure as code"),
+    ("機械学習", "machine learning", "ディープラーニング", "deep learning"),
+    ("生成ai", "llm", "大規模言語モデル", "generative ai"),
+    ("データ分析", "データアナリスト", "data analyst", "アナリティクス"),
+    # 職種
+    ("sre", "site reliability", "サイトリライアビリティ"),
+    (
+        "インフラエンジニア",
+        "基盤エンジニア",
+        "infrastructure engineer",
+        "クラウドエンジニア",
+    ),
+    ("フロントエンド", "frontend", "front-end", "フロントエンジニア"),
+    ("バックエンド", "backend", "back-end", "サーバーサイド", "server-side"),
+    ("フルスタック", "fullstack", "full stack", "full-stack"),
+    ("データサイエンティスト", "data scientist"),
+    ("データエンジニア", "data engineer"),
+    ("機械学習エンジニア", "mlエンジニア", "ml engineer", "aiエンジニア"),
+    ("モバイルエンジニア", "アプリエンジニア", "iosエンジニア", "androidエンジニア"),
+    ("qaエンジニア", "品質保証", "テストエンジニア"),
+    ("セキュリティエンジニア", "security engineer", "情報セキュリティ"),
+    ("プロダクトマネージャー", "product manager", "pdm", "プロダクトマネジャー"),
+    ("プロジェクトマネージャー", "project manager", "プロジェクトマネジャー"),
+    ("エンジニアリングマネージャー", "engineering manager"),
+    ("最高技術責任者", "技術責任者"),
+    ("テックリード", "tech lead", "リードエンジニア"),
+    ("デザイナー", "designer", "uiデザイナー", "uxデザイナー"),
+    ("営業", "セールス", "sales"),
+    ("カスタマーサクセス", "customer success"),
+    ("マーケティング", "マーケター", "marketing"),
+    ("人事", "採用担当", "リクルーター", "recruiter"),
+    ("コンサルタント", "consultant", "コンサル"),
+    # 働き方
+    ("フルリモート", "完全リモート", "フルリモ", "full remote", "完全在宅"),
+    ("リモート", "在宅", "テレワーク", "remote"),
+    ("フレックス", "flex", "フレックスタイム"),
+    ("副業", "複業", "兼業"),
+    ("時短", "短時間勤務"),
+    # 企業
+    ("スタートアップ", "startup", "ベンチャー"),
+    ("saas", "サース"),
+    ("フィンテック", "fintech"),
+    ("ヘルスケア", "healthcare", "医療"),
+    ("hr tech", "hrtech", "hrテック"),
+    ("外資", "外資系", "グローバル企業"),
+    ("上場", "ipo", "プライム市場"),
+]
+
+# ripgrep（Rust regex）でエスケープが必要な文字
+_RG_META_RE = re.compile(r"([\\.+*?()|\[\]{}^$])")
+# 学習に使うパターンの1要素（正規表現の構文を含まない言い換え）
+_LITERAL_RE = re.compile(r"^[^\\.+*?()|\[\]{}^$]+$")
+
+# 語 → 類義語グループ（読み込み後にキャッシュ）
+_lookup = None
+_version = None
+
+
+def _usable(term: str) -> bool:
+    return bool(term) and (not term.isascii() or len(term) >= MIN_ASCII_LENGTH)
+
+
+def _merge(lookup: dict, terms):
+    """terms を1つのグループにまとめる（既存グループとも合流）"""
+    group = set()
+    for term in terms:
+        group |= lookup.get(term, {term})
+    for term in group:
+        lookup[term] = group
+
+
+def load_learned(path: Path = LEARNED_PATH) -> dict:
+    if not path.exists():
+        return {"version": 0, "learned": {}}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load(path: Path = LEARNED_PATH) -> dict:
+    """同梱辞書と学習済みの類義語から 語 → グループ の表を作る"""
+    global _lookup, _version
+    learned = load_learned(path)
+    lookup = {}
+    for group in SYNONYM_GROUPS:
+        _merge(lookup, group)
+    for term, alternatives in learned["learned"].items():
+        _merge(lookup, [term, *alternatives])
+    _lookup = {term: sorted(group) for term, group in lookup.items()}
+    _version = f"{DICTIONARY_VERSION}.{learned['version']}"
+    return _lookup
+
+
+def dictionary_version() -> str:
+    """辞書のバージョン（同梱定義.学習回数）"""
+    if _version is None:
+        load()
+    return _version
+
+
+def expand(query: str) -> list:
+    """クエリを語ごとの類義語グループに展開する（語どうしは AND、グループ内は OR）
+
+    先頭はクエリ中の語そのもの。
+    """
+    if _lookup is None:
+        load()
+    groups = []
+    for term in query_terms(query):
+        alternatives = [a for a in _lookup.get(term, ()) if a != term]
+        groups.append([term, *alternatives])
+    return groups
+
+
+def rg_pattern(group) -> str:
+    """類義語グループを ripgrep の OR パターンにする"""
+    return "|".join(_RG_META_RE.sub(r"\\\1", term) for term in group)
+
+
+def rg_command(kind: str, query: str) -> str:
+    """クエリに一致する行を数える ripgrep のパイプライン（workspace/ から実行）"""
+    groups = expand(query)
+    if not groups:
+        return ""
+    first, *rest = groups
+    command = f"rg -i {shlex.quote(rg_pattern(first))} data/{kind}_*.ndjson"
+    for group in rest:
+        command += f" | rg -i {shlex.quote(rg_pattern(group))}"
+    return command + " | wc -l"
+
+
+def _pattern_alternatives(pattern: str) -> list:
+    """ripgrep パターンの OR をばらして、正規表現の構文を含まない言い換えだけ返す"""
+    pattern = re.sub(r"^\(\?i\)", "", pattern.strip())
+    if pattern.startswith("(") and pattern.endswith(")"):
+        pattern = pattern[1:-1].removeprefix("?:")
+    alternatives = []
+    for part in pattern.split("|"):
+        part = part.strip().replace("\\b", "").lower()
+        if _LITERAL_RE.match(part) and _usable(part):
+            alternatives.append(part)
+    return alternatives
+
+
+def _session_patterns(session_dir: Path):
+    """セッションで LLM が作ったパターン（query, [pattern, ...]）
+
+    - patterns.json: {"query": ..., "patterns": [...]}（辞書にない言い換えを LLM が記録）
+    - choices.json: LLM が作った提案の pattern（ファセットの提案は除く）
+    """
+    patterns_file = session_dir / "patterns.json"
+    if patterns_file.exists():
+        data = json.loads(patterns_file.read_text(encoding="utf-8"))
+        yield data.get("query", ""), data.get("patterns", [])
+
+    choices_file = session_dir / "choices.json"
+    if choices_file.exists():
+        data = json.loads(choices_file.read_text(encoding="utf-8"))
+        yield (
+            data.get("query", ""),
+            [
+                s["pattern"]
+                for s in data.get("suggestions", [])
+                if s.get("pattern") and "facet" not in s
+            ],
+        )
+
+
+def learn(output_dir: Path = OUTPUT_DIR, path: Path = LEARNED_PATH) -> dict:
+    """過去のセッションのパターンから、クエリの語の言い換えを学習する
+
+    パターンの OR にクエリの語が含まれていれば、残りの要素をその語の言い換えとみなす。
+    """
+    seen = defaultdict(Counter)
+    n_sessions = 0
+    for session_dir in sorted(p for p in Path(output_dir).glob("*") if p.is_dir()):
+        found = defaultdict(set)
+        try:
+            for query, patterns in _session_patterns(session_dir):
+                terms = set(query_terms(query))
+                for pattern in patterns:
+                    alternatives = _pattern_alternatives(str(pattern))
+                    for term in terms.intersection(alternatives):
+                        found[term].update(a for a in alternatives if a != term)
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            continue
+        if found:
+            n_sessions += 1
+        for term, alternatives in found.items():
+            seen[term].update(alternatives)
+
+    learned = {
+        term: sorted(a for a, c in counter.items() if c >= LEARN_MIN_SESSIONS)
+        for term, counter in sorted(seen.items())
+    }
+    learned = {term: alts for term, alts in learned.items() if alts}
+
+    previous = load_learned(path)
+    data = {
+        "version": previous["version"],
+        "learned": learned,
+        "sessions": n_sessions,
+    }
+    if learned != previous["learned"]:
+        data["version"] += 1
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    load(path)
+
+    n_terms = sum(len(a) for a in learned.values())
+    print(
+        f"  📚 synonyms: v{dictionary_version()}（学習 {len(learned)}語 / {n_terms}件、"
+        f"{n_sessions}セッションから）"
+    )
+    return data
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="類義語辞書")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    expand_parser = sub.add_parser("expand", help="クエリを検索パターンに展開")
+    expand_parser.add_argument("query")
+    expand_parser.add_argument(
+        "--kind", default="jobs", choices=("candidates", "jobs", "companies")
+    )
+    sub.add_parser("learn", help="過去のセッションから類義語を学習")
+    sub.add_parser("show", help="学習済みの類義語を表示")
+
+    args = parser.parse_args()
+
+    if args.command == "learn":
+        print("📚 類義語を学習中...")
+        learn()
+        print("✅ 学習完了")
+        return
+
+    if args.command == "show":
+        learned = load_learned()
+        print(f"辞書バージョン: {dictionary_version()}")
+        for term, alternatives in learned["learned"].items():
+            print(f"  {term}: {' / '.join(alternatives)}")
+        return
+
+    load()
+    start = time.perf_counter()
+    groups = expand(args.query)
+    command = rg_command(args.kind, args.query)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    for group in groups:
+        print(f"  {group[0]}: {rg_pattern(group)}")
+    print(command)
+    print(f"⏱️  {elapsed_us:.0f}µs（辞書 v{dictionary_version()}）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,7 +29,32 @@ def update_from_github(
         "bin/candidate.py",
         "bin/download.py",
         "bin/models.py",
+        "bin/records.py",
+        "bin/ranking.py",
+        "bin/vector_index.py",
+        "bin/facets.py",
+        "bin/segments.py",
+        "bin/incremental.py",
+        "bin/lsh_index.py",
+        "bin/graph_index.py",
+        "bin/columnar.py",
+        "bin/scan.py",
+        "bin/planner.py",
+        "bin/synonyms.py",
+        "bin/mcp_server.py",
+        "bin/fit.py",
+        "bin/ltr.py",
+        "bin/mapreduce.py",
+        "bin/render.py",
+        "bin/job_profiles.py",
+        "bin/summaries.py",
+        "bin/result_cache.py",
+        "bin/shortlists.py",
+        "bin/alerts.py",
+        "bin/jobs_for.py",
+        "bin/preflight.py",
         "workspace/AGENTS.md",
+        "workspace/opencode.json",
         "README.md",
     ]
 
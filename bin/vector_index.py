@@ -0,0 +1,324 @@
+#!/usr/bin/env -S uv run
+# /// script
+# dependencies = ["numpy", "scikit-learn"]
+# ///
+"""
+Semantic Vector Index
+
+文字n-gram TF-IDF を Truncated SVD で圧縮した float32 ベクトルで
+候補者・求人・企業を意味的に検索する（CPUのみ・オフライン）。
+インデックスは download.py の取り込み時に workspace/index/vectors/<kind>/ に作成し、
+以降は変更レコードだけを差分セグメントとして追記する（segments.py）。
+
+Usage:
+    uv run bin/vector_index.py build
+    uv run bin/vector_index.py compact
+    uv run bin/vector_index.py search jobs "SRE" --top 20
+"""
+
+import json
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import segments
+from records import (
+    INDEX_DIR,
+    KINDS,
+    iter_records,
+    record_id,
+    record_text,
+    select_records,
+)
+
+VECTOR_DIR = INDEX_DIR / "vectors"
+
+# 圧縮後の次元数
+VECTOR_DIM = int(os.environ.get("VECTOR_DIM", "256"))
+
+# 1レコードあたりのテキスト上限（長いメモで語彙が膨らむのを防ぐ）
+MAX_TEXT_CHARS = 4000
+
+# 検索時の行列積のバッチサイズ（行数）
+SEARCH_BATCH_ROWS = 8192
+
+
+def _kind_dir(kind: str, vector_dir: Path = VECTOR_DIR) -> Path:
+    return vector_dir / kind
+
+
+def _model_path(kind: str, vector_dir: Path = VECTOR_DIR) -> Path:
+    return _kind_dir(kind, vector_dir) / "model.pkl"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def index_text(record: dict) -> str:
+    """ベクトル化するテキスト"""
+    return record_text(record)[:MAX_TEXT_CHARS]
+
+
+def _write_segment(kind_dir: Path, segment: str, vectors: np.ndarray, ids: list):
+    np.save(segments.segment_path(kind_dir, segment, ".npy"), vectors)
+    segments.segment_path(kind_dir, segment, "_ids.json").write_text(
+        json.dumps(ids, ensure_ascii=False), encoding="utf-8"
+    )
+
+
+def _read_segment(kind_dir: Path, segment: str):
+    vectors = np.load(segments.segment_path(kind_dir, segment, ".npy"), mmap_mode="r")
+    ids = json.loads(
+        segments.segment_path(kind_dir, segment, "_ids.json").read_text(
+            encoding="utf-8"
+        )
+    )
+    return vectors, ids
+
+
+def build(kind: str, records, vector_dir: Path = VECTOR_DIR) -> int:
+    """ベクトル化モデルを学習し、ベースセグメントを作成して保存"""
+    ids = []
+    texts = []
+    for record in records:
+        ids.append(record_id(record, kind))
+        texts.append(index_text(record))
+
+    if not texts:
+        print(f"  ⚠️ {kind}: レコードがありません（スキップ）")
+        return 0
+
+    vectorizer = TfidfVectorizer(
+        analyzer="char_wb",
+        ngram_range=(2, 3),
+        min_df=2 if len(texts) > 1 else 1,
+        max_features=200000,
+        sublinear_tf=True,
+        dtype=np.float32,
+    )
+    tfidf = vectorizer.fit_transform(texts)
+
+    n_components = max(1, min(VECTOR_DIM, tfidf.shape[0] - 1, tfidf.shape[1] - 1))
+    svd = TruncatedSVD(n_components=n_components, random_state=0)
+    vectors = _normalize(svd.fit_transform(tfidf))
+
+    kind_dir = _kind_dir(kind, vector_dir)
+    kind_dir.mkdir(parents=True, exist_ok=True)
+    manifest = segments.reset(kind_dir)
+    segment = segments.next_segment(manifest)
+    _write_segment(kind_dir, segment, vectors, ids)
+    segments.add_segment(manifest, segment, ids)
+    with open(_model_path(kind, vector_dir), "wb") as f:
+        pickle.dump({"vectorizer": vectorizer, "svd": svd}, f)
+    segments.save_manifest(kind_dir, manifest)
+
+    print(f"  🧭 {kind}: {len(ids)}件 × {n_components}次元")
+    return len(ids)
+
+
+def build_all(vector_dir: Path = VECTOR_DIR):
+    """全種別のベクトルインデックスを作成"""
+    for kind in KINDS:
+        build(kind, iter_records(kind), vector_dir)
+
+
+def apply_delta(kind: str, records, deleted_ids=(), vector_dir: Path = VECTOR_DIR):
+    """変更レコードを既存モデルでベクトル化し、差分セグメントとして追記する
+
+    古い行と deleted_ids の行は墓標になる（検索時に除外）。
+    """
+    kind_dir = _kind_dir(kind, vector_dir)
+    with open(_model_path(kind, vector_dir), "rb") as f:
+        model = pickle.load(f)
+    manifest = segments.load_manifest(kind_dir)
+
+    records = list(records)
+    ids = [record_id(r, kind) for r in records]
+    segment = segments.next_segment(manifest)
+    if records:
+        vectors = embed(model, [index_text(r) for r in records])
+        _write_segment(kind_dir, segment, vectors, ids)
+    segments.add_segment(manifest, segment, ids, deleted_ids)
+    segments.save_manifest(kind_dir, manifest)
+    return manifest
+
+
+def compact(kind: str, force: bool = False, vector_dir: Path = VECTOR_DIR) -> bool:
+    """墓標を除いた有効行を1セグメントにまとめる
+
+    Returns: コンパクションしたかどうか
+    """
+    kind_dir = _kind_dir(kind, vector_dir)
+    manifest = segments.load_manifest(kind_dir)
+    if not manifest["segments"]:
+        return False
+    if not (force or segments.needs_compaction(manifest)):
+        return False
+
+    blocks = []
+    live_ids = []
+    for segment in manifest["segments"]:
+        vectors, ids = _read_segment(kind_dir, segment)
+        mask = segments.live_mask(manifest, segment, ids)
+        blocks.append(np.asarray(vectors)[mask])
+        live_ids.extend(rid for rid, live in zip(ids, mask) if live)
+
+    segment = segments.next_segment(manifest)
+    _write_segment(kind_dir, segment, np.concatenate(blocks), live_ids)
+    segments.replace_all(kind_dir, manifest, segment, live_ids)
+    segments.save_manifest(kind_dir, manifest)
+    print(f"  🧹 {kind}: ベクトル {len(live_ids)}件に圧縮")
+    return True
+
+
+def exists(kind: str, vector_dir: Path = VECTOR_DIR) -> bool:
+    kind_dir = _kind_dir(kind, vector_dir)
+    return (
+        _model_path(kind, vector_dir).exists()
+        and segments.manifest_path(kind_dir).exists()
+    )
+
+
+def load(kind: str, vector_dir: Path = VECTOR_DIR) -> dict:
+    """インデックスを読み込む（ベクトルはmmapで読み込み）"""
+    kind_dir = _kind_dir(kind, vector_dir)
+    with open(_model_path(kind, vector_dir), "rb") as f:
+        model = pickle.load(f)
+    manifest = segments.load_manifest(kind_dir)
+
+    loaded = []
+    for segment in manifest["segments"]:
+        vectors, ids = _read_segment(kind_dir, segment)
+        loaded.append(
+            {
+                "vectors": vectors,
+                "ids": ids,
+                "live": segments.live_mask(manifest, segment, ids),
+            }
+        )
+    return {"segments": loaded, **model}
+
+
+def embed(index: dict, texts) -> np.ndarray:
+    """テキストをインデックスと同じ空間のベクトルに変換"""
+    texts = [t[:MAX_TEXT_CHARS] for t in texts]
+    tfidf = index["vectorizer"].transform(texts)
+    return _normalize(index["svd"].transform(tfidf))
+
+
+def search_vectors(index: dict, queries: np.ndarray, top_k: int = 50) -> list:
+    """クエリベクトル（複数可）に対するコサイン類似度上位K件
+
+    セグメントを順にバッチで走査し、墓標の行は除外する。
+    Returns: クエリごとの [(id, score), ...]
+    """
+    n_live = sum(int(seg["live"].sum()) for seg in index["segments"])
+    top_k = min(top_k, n_live)
+    if top_k == 0:
+        return [[] for _ in range(len(queries))]
+
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=object)
+
+    for seg in index["segments"]:
+        vectors = seg["vectors"]
+        ids = np.asarray(seg["ids"], dtype=object)
+        for start in range(0, vectors.shape[0], SEARCH_BATCH_ROWS):
+            block = np.asarray(vectors[start : start + SEARCH_BATCH_ROWS])
+            scores = queries @ block.T
+            scores[:, ~seg["live"][start : start + SEARCH_BATCH_ROWS]] = -np.inf
+            k = min(top_k, scores.shape[1])
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            part_scores = np.take_along_axis(scores, part, axis=1)
+
+            best_scores = np.concatenate([best_scores, part_scores], axis=1)
+            best_ids = np.concatenate([best_ids, ids[part + start]], axis=1)
+            if best_scores.shape[1] > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1, axis=1)[:, :top_k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+
+    results = []
+    for row_scores, row_ids in zip(best_scores, best_ids):
+        order = np.argsort(-row_scores)
+        results.append(
+            [
+                (row_ids[i], float(row_scores[i]))
+                for i in order
+                if np.isfinite(row_scores[i])
+            ]
+        )
+    return results
+
+
+def search(kind: str, texts, top_k: int = 50, index: dict = None) -> list:
+    """テキスト（複数可）で検索"""
+    if isinstance(texts, str):
+        texts = [texts]
+    index = index or load(kind)
+    return search_vectors(index, embed(index, texts), top_k)
+
+
+def search_records(kind: str, text: str, top_k: int = 50) -> list:
+    """テキストで検索し、レコード本体を返す [(score, record), ...]"""
+    hits = search(kind, text, top_k)[0]
+    scores = dict(hits)
+    records = select_records(kind, [rid for rid, _ in hits])
+    return [(scores[record_id(r, kind)], r) for r in records]
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="意味ベクトル検索インデックス")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("build", help="インデックス作成")
+    sub.add_parser("compact", help="差分セグメントを1つにまとめる")
+
+    search_parser = sub.add_parser("search", help="検索")
+    search_parser.add_argument("kind", choices=KINDS)
+    search_parser.add_argument("query", help="検索クエリ")
+    search_parser.add_argument("--top", type=int, default=20, help="上位件数")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print("🧭 ベクトルインデックス作成中...")
+        build_all()
+        print("✅ 作成完了")
+        return
+
+    if args.command == "compact":
+        for kind in KINDS:
+            if exists(kind):
+                compact(kind, force=True)
+        print("✅ 圧縮完了")
+        return
+
+    if not exists(args.kind):
+        print(f"❌ インデックスがありません: {args.kind}")
+        print("   uv run bin/vector_index.py build を実行してください")
+        sys.exit(1)
+
+    start = time.time()
+    results = search(args.kind, args.query, args.top)[0]
+    elapsed_ms = (time.time() - start) * 1000
+
+    for rid, score in results:
+        print(f"{score:.4f}\t{rid}")
+    print(f"⏱️  {elapsed_ms:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()